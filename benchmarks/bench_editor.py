@@ -0,0 +1,155 @@
+"""Editor frame-time benchmark.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_editor                       # 20k notes, 40 frames
+    python -m benchmarks.bench_editor --sizes 5k 50k -f 80
+
+Each frame does what CairoEditorWidget.paintEvent does for the content
+layer: a fresh DrawUtil, Editor.draw_all and render_to_cairo of the visible
+clip, at evenly spaced scroll positions through the score. Every score is
+rendered with DrawUtil.batch_paths off ("before") and on ("after"). Results
+are written as JSON next to the engraver benchmark results.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cairo
+
+from benchmarks.bench_engrave import RESULTS_DIR, _git_revision
+from benchmarks.synthetic_scores import BENCH_SIZES, make_score
+from ui.widgets.draw_util import DrawUtil
+
+
+class _NoToolManager:
+    """The editor only reports tool changes to its manager; nothing to show here."""
+
+    def set_tool(self, tool) -> None:
+        pass
+
+
+def _make_editor(score_dict: dict):
+    # Drawers measure text through QFontDatabase, which needs a GUI application.
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6 import QtGui
+    app = QtGui.QGuiApplication.instance() or QtGui.QGuiApplication([])
+    from editor.editor import Editor
+    from file_model.SCORE import SCORE
+    editor = Editor(_NoToolManager())
+    editor.set_score(SCORE.from_dict(score_dict))
+    return app, editor
+
+
+def _frame(editor, page_w_mm: float, px_per_mm: float, vis_w_px: int, vis_h_px: int,
+           clip_y_mm: float) -> tuple[float, float, int]:
+    """Build and rasterize one content frame; returns (draw_all s, render s, items)."""
+    clip_h_mm = vis_h_px / px_per_mm
+    editor.set_view_metrics(px_per_mm, px_per_mm, 1.0)
+    editor.set_view_offset_mm(clip_y_mm)
+    editor.set_viewport_height_mm(clip_h_mm)
+    t0 = time.perf_counter()
+    du = DrawUtil()
+    du.set_current_page_size_mm(page_w_mm, float(editor.editor_height))
+    editor.draw_all(du)
+    draw_s = time.perf_counter() - t0
+
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, vis_w_px, vis_h_px)
+    ctx = cairo.Context(surface)
+    t0 = time.perf_counter()
+    du.render_to_cairo(ctx, du.current_page_index(), px_per_mm, (0.0, clip_y_mm, page_w_mm, clip_h_mm))
+    surface.flush()
+    render_s = time.perf_counter() - t0
+    surface.finish()
+    return draw_s, render_s, len(du._pages[0].items)
+
+
+def bench_score(name: str, score: dict, frames: int, vis_w_px: int, vis_h_px: int) -> dict:
+    _app, editor = _make_editor(score)
+    page_w_mm = 210.0
+    editor._calculate_layout(page_w_mm)
+    px_per_mm = vis_w_px / page_w_mm
+    height_mm = float(editor.editor_height)
+    span = max(0.0, height_mm - vis_h_px / px_per_mm)
+    offsets = [span * i / max(1, frames - 1) for i in range(frames)]
+
+    result: dict = {'name': name, 'notes': len(score.get('events', {}).get('note', []) or []),
+                    'editor_height_mm': height_mm, 'frames': frames}
+    for label, batch in (('before', False), ('after', True)):
+        DrawUtil.batch_paths = batch
+        # Untimed frame so font and glyph caches are warm for both passes.
+        _frame(editor, page_w_mm, px_per_mm, vis_w_px, vis_h_px, offsets[0])
+        draw_s = []
+        render_s = []
+        items = []
+        for clip_y_mm in offsets:
+            d, r, n = _frame(editor, page_w_mm, px_per_mm, vis_w_px, vis_h_px, clip_y_mm)
+            draw_s.append(d)
+            render_s.append(r)
+            items.append(n)
+        frame_s = sorted(d + r for d, r in zip(draw_s, render_s))
+        result[label] = {
+            'draw_all_ms': 1000.0 * sum(draw_s) / len(draw_s),
+            'render_ms': 1000.0 * sum(render_s) / len(render_s),
+            'frame_ms': 1000.0 * sum(frame_s) / len(frame_s),
+            'frame_p95_ms': 1000.0 * frame_s[min(len(frame_s) - 1, int(0.95 * len(frame_s)))],
+            'items_per_frame': sum(items) / len(items),
+        }
+    DrawUtil.batch_paths = True
+    return result
+
+
+def run(sizes: list[str], frames: int, width: int, height: int) -> dict:
+    if not hasattr(cairo, 'cairo_version'):
+        # A stand-in module without real rasterization times only Python overhead.
+        print("warning: this cairo module is not pycairo; render times do not include rasterization")
+    results = []
+    for name in sizes:
+        note_count, density = BENCH_SIZES[name]
+        res = bench_score(name, make_score(note_count, density), frames, width, height)
+        results.append(res)
+        before, after = res['before'], res['after']
+        print(f"{name:>5}  {res['notes']:7d} notes  {before['items_per_frame']:7.0f} items/frame  "
+              f"render {before['render_ms']:7.2f} -> {after['render_ms']:7.2f} ms  "
+              f"frame {before['frame_ms']:7.2f} -> {after['frame_ms']:7.2f} ms")
+    return {
+        'revision': _git_revision(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cairo': getattr(cairo, 'version', 'unknown'),
+        'platform': platform.platform(),
+        'viewport_px': [width, height],
+        'results': results,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark editor frames on synthetic scores.")
+    parser.add_argument("--sizes", nargs="+", choices=list(BENCH_SIZES), default=["20k"])
+    parser.add_argument("-f", "--frames", type=int, default=40, help="Frames (scroll positions) per score.")
+    parser.add_argument("--width", type=int, default=1200, help="Viewport width in device pixels.")
+    parser.add_argument("--height", type=int, default=900, help="Viewport height in device pixels.")
+    parser.add_argument("-o", "--output", default=None, help="Result file (default: benchmarks/results/).")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    report = run(args.sizes, max(1, args.frames), args.width, args.height)
+    if args.output:
+        out = Path(args.output)
+    else:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = RESULTS_DIR / f"editor-{stamp}-{report['revision']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Engraver scaling benchmark.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_engrave                      # all sizes
+    python -m benchmarks.bench_engrave --sizes 1k 5k -r 3   # best of 3
+    python -m benchmarks.bench_engrave --compare old.json new.json
+
+Each score is timed through the layout phase, the per-page draw phase,
+render_to_cairo per page and save_pdf per page. Results are written as JSON
+(one file per run) so runs from different commits can be compared.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cairo
+
+from benchmarks.synthetic_scores import BENCH_SIZES, make_score, write_scores
+from engraver.engraver import engrave_layout
+from ui.widgets.draw_util import DrawUtil
+from utils.CONSTANT import ENGRAVER_LAYERING
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent, check=False)
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def _count_primitives(du: DrawUtil) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for page in du._pages:
+        for item in page.items:
+            name = type(item).__name__
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def bench_score(name: str, score: dict, dpi: float = 100.0) -> dict:
+    """Time one score through layout, draw, raster and PDF output."""
+    notes = len(score.get('events', {}).get('note', []) or [])
+
+    t0 = time.perf_counter()
+    layout = engrave_layout(score, profile=True)
+    layout_s = time.perf_counter() - t0
+
+    du = DrawUtil()
+    draw_page_s = []
+    for page_index in range(layout.page_count):
+        t0 = time.perf_counter()
+        layout.draw_page(du, page_index, pdf_export=True)
+        draw_page_s.append(time.perf_counter() - t0)
+
+    px_per_mm = float(dpi) / 25.4
+    render_page_s = []
+    for page_index in range(du.page_count()):
+        page = du._pages[page_index]
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, max(1, int(page.width_mm * px_per_mm)),
+                                     max(1, int(page.height_mm * px_per_mm)))
+        ctx = cairo.Context(surface)
+        t0 = time.perf_counter()
+        du.render_to_cairo(ctx, page_index, px_per_mm, layering=ENGRAVER_LAYERING)
+        surface.flush()
+        render_page_s.append(time.perf_counter() - t0)
+        surface.finish()
+
+    save_pdf_page_s: list[float] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        marks = [time.perf_counter()]
+        du.save_pdf(os.path.join(tmp, f"{name}.pdf"), layering=ENGRAVER_LAYERING,
+                    progress_cb=lambda done, total: marks.append(time.perf_counter()))
+        save_pdf_s = time.perf_counter() - marks[0]
+        save_pdf_page_s = [b - a for a, b in zip(marks, marks[1:])]
+
+    return {
+        'name': name,
+        'notes': notes,
+        'pages': layout.page_count,
+        'layout_s': layout_s,
+        'layout_phase_ms': dict(layout.analysis._phase_ms),
+        'draw_s': sum(draw_page_s),
+        'draw_page_s': draw_page_s,
+        'render_s': sum(render_page_s),
+        'render_page_s': render_page_s,
+        'save_pdf_s': save_pdf_s,
+        'save_pdf_page_s': save_pdf_page_s,
+        'primitives': _count_primitives(du),
+    }
+
+
+def _best_of(runs: list[dict]) -> dict:
+    """Keep the fastest run per timed key (lists are compared by their sum)."""
+    best = dict(runs[0])
+    for run in runs[1:]:
+        for key, value in run.items():
+            if key.endswith('_s') and isinstance(value, float) and value < best[key]:
+                best[key] = value
+                list_key = key[:-2] + '_page_s'
+                if list_key in run:
+                    best[list_key] = run[list_key]
+    return best
+
+
+def run(sizes: list[str], repeat: int, dpi: float) -> dict:
+    results = []
+    for name in sizes:
+        note_count, density = BENCH_SIZES[name]
+        score = make_score(note_count, density)
+        runs = [bench_score(name, score, dpi) for _ in range(max(1, repeat))]
+        best = _best_of(runs)
+        results.append(best)
+        print(f"{name:>5}  {best['notes']:7d} notes  {best['pages']:4d} pages  "
+              f"layout {best['layout_s']:7.3f}s  draw {best['draw_s']:7.3f}s  "
+              f"render {best['render_s']:7.3f}s  pdf {best['save_pdf_s']:7.3f}s")
+    return {
+        'revision': _git_revision(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cairo': getattr(cairo, 'version', 'unknown'),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'dpi': dpi,
+        'results': results,
+    }
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """Print new/old ratios of the summed timings per score."""
+    old = {r['name']: r for r in json.load(open(old_path, encoding='utf-8'))['results']}
+    new = {r['name']: r for r in json.load(open(new_path, encoding='utf-8'))['results']}
+    keys = ('layout_s', 'draw_s', 'render_s', 'save_pdf_s')
+    print("score  " + "  ".join(f"{k[:-2]:>10}" for k in keys) + "   (new/old, <1 is faster)")
+    for name in new:
+        if name not in old:
+            continue
+        cells = []
+        for k in keys:
+            before = old[name].get(k) or 0.0
+            cells.append(f"{new[name].get(k, 0.0) / before:10.2f}" if before > 0 else f"{'n/a':>10}")
+        print(f"{name:>5}  " + "  ".join(cells))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark engraving on synthetic scores.")
+    parser.add_argument("--sizes", nargs="+", choices=list(BENCH_SIZES), default=list(BENCH_SIZES))
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="Runs per score; the fastest is kept.")
+    parser.add_argument("--dpi", type=float, default=100.0, help="Raster resolution for render_to_cairo.")
+    parser.add_argument("-o", "--output", default=None, help="Result file (default: benchmarks/results/).")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit.")
+    parser.add_argument("--write-scores", metavar="DIR", help="Only write the synthetic .piano files to DIR.")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    if args.write_scores:
+        for path in write_scores(args.write_scores, args.sizes):
+            print(path)
+        return 0
+    report = run(args.sizes, args.repeat, args.dpi)
+    if args.output:
+        out = Path(args.output)
+    else:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = RESULTS_DIR / f"{stamp}-{report['revision']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
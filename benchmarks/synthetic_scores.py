@@ -0,0 +1,99 @@
+"""Deterministic synthetic .piano scores for engraver benchmarks.
+
+Scores mix chords, black/white clusters, grace notes, beams, slurs, texts,
+count lines, two time signatures and frequent line breaks, so every engraver
+phase gets work proportional to the note count.
+"""
+from __future__ import annotations
+import json
+import random
+from pathlib import Path
+
+from file_model.SCORE import SCORE
+from file_model.base_grid import BaseGrid
+
+# name -> (note count, average notes per chord)
+BENCH_SIZES: dict[str, tuple[int, float]] = {
+    "1k": (1_000, 1.75),
+    "5k": (5_000, 1.75),
+    "20k": (20_000, 2.5),
+    "50k": (50_000, 2.5),
+    "200k": (200_000, 3.5),
+}
+
+_QUARTER = 256.0
+
+
+def make_score(note_count: int, chord_density: float = 1.75, seed: int = 1,
+               measures_per_line: int = 4) -> dict:
+    """Build a score dict with roughly `note_count` notes.
+
+    chord_density is the average number of notes per hand per onset; larger
+    values give denser chords and more stem/collision work per line.
+    """
+    rng = random.Random(seed)
+    sc = SCORE().new()
+    sc.events.note = []
+    sc.events.line_break = []
+    durations = (64.0, 128.0, 128.0, _QUARTER)
+    # Average onsets per 4/4 measure for the duration mix above, two hands.
+    notes_per_measure = max(1.0, 2.0 * chord_density * (4 * _QUARTER) / (sum(durations) / len(durations)))
+    measures = max(2, int(round(note_count / notes_per_measure)))
+    sc.base_grid[0].measure_amount = measures - measures // 4
+    sc.base_grid.append(BaseGrid(numerator=7, denominator=8, beat_grouping=[1, 2, 3, 1, 2, 3, 4],
+                                 measure_amount=measures // 4))
+
+    bounds: list[tuple[float, float]] = []
+    cur = 0.0
+    for bg in sc.base_grid:
+        length = bg.numerator * (4.0 / bg.denominator) * _QUARTER
+        for _ in range(bg.measure_amount):
+            bounds.append((cur, cur + length))
+            cur += length
+
+    placed = 0
+    for m_index, (start, end) in enumerate(bounds):
+        t = start
+        while t < end and placed < note_count:
+            d = rng.choice(durations)
+            for hand, low in (('>', 44), ('<', 20)):
+                size = max(1, min(6, int(round(rng.gauss(chord_density, 0.75)))))
+                pitches: set[int] = set()
+                while len(pitches) < size:
+                    pitches.add(low + rng.randint(0, 24))
+                if rng.random() < 0.1:
+                    # Adjacent semitones exercise the black-note stem rules.
+                    pitches.add(min(88, max(pitches) + 1))
+                for p in pitches:
+                    sc.new_note(pitch=p, time=t, duration=d * rng.choice((1, 1, 1, 2)), hand=hand)
+                placed += len(pitches)
+            if rng.random() < 0.04:
+                sc.new_grace_note(pitch=rng.randint(30, 60), time=t)
+            t += d
+        if rng.random() < 0.3:
+            sc.new_beam(time=start, duration=_QUARTER, hand=rng.choice(('<', '>')))
+        if rng.random() < 0.2:
+            sc.new_slur(y1_time=start, y2_time=start + 50, y3_time=start + 150, y4_time=start + _QUARTER,
+                        x1_rpitch=2, x4_rpitch=5)
+        if rng.random() < 0.15:
+            sc.new_text(time=start + 10, text=rng.choice(('dolce', 'cresc.', 'rit.', 'a tempo')),
+                        x_rpitch=rng.randint(-5, 5))
+        if rng.random() < 0.2:
+            sc.new_count_line(time=start + 128)
+        if m_index % measures_per_line == 0:
+            sc.new_line_break(time=start)
+    return sc.get_dict()
+
+
+def write_scores(out_dir: str | Path, names: list[str] | None = None) -> list[Path]:
+    """Write the named BENCH_SIZES scores to out_dir and return their paths."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name in names or list(BENCH_SIZES):
+        note_count, density = BENCH_SIZES[name]
+        path = out / f"synthetic_{name}.piano"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(make_score(note_count, density), f, separators=(",", ":"))
+        paths.append(path)
+    return paths
@@ -0,0 +1,258 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import traceback
+from pathlib import Path
+
+from ui.widgets.draw_pack import PackedDocument, pack_pages, _FORMAT_VERSION
+from ui.widgets.draw_util import DrawUtil, Page
+from utils.CONSTANT import ENGRAVER_VERSION, UTILS_SAVE_DIR
+
+# On-disk engrave cache
+# ---------------------
+# Problem solved: reopening (or switching back to) a large score re-engraved
+# it from scratch before the print view showed anything. The worker stores
+# every page it draws in the packed format of draw_pack, keyed by a hash of
+# the score content; the UI shows a hit right away while a fresh engrave
+# replaces it in the background.
+#
+# Only the states a document is opened or saved in are cached: the UI hashes
+# the score then (off the UI thread) and hands the key to the worker, which
+# writes the drawn pages of that layout once it is idle. Edits in between
+# are never written, and a new key of a document replaces its previous one.
+#
+# One directory per key holds index.json (page count and size, drawn pages,
+# document) and one packed file per drawn page. The index mtime is the last
+# use; the least recently used entries are removed once the total size
+# exceeds the limit.
+
+ENGRAVE_CACHE_DIR: Path = Path(UTILS_SAVE_DIR) / "engrave_cache"
+DEFAULT_MAX_BYTES: int = 256 * 1024 * 1024
+_INDEX_NAME = "index.json"
+_INDEX_VERSION = 1
+
+# Score parts that never change the engraved result (timestamps, UI state,
+# the analysis written back after each engrave).
+_IGNORED_KEYS = ('analysis', 'app_state')
+
+
+# Measured in every text font of a score for the font fingerprint.
+_FONT_PROBE_TEXT = "AaBbGgQqWwXy 0123456789 ({[.,;:!?]})"
+
+
+def _text_fonts(score: dict) -> set[tuple[str, bool, bool]]:
+    """(family, italic, bold) of every font the layout or a text event names."""
+    fonts: set[tuple[str, bool, bool]] = {('Edwin', False, False)}
+
+    def _add(fnt) -> None:
+        if isinstance(fnt, dict) and fnt.get('family'):
+            fonts.add((str(fnt['family']), bool(fnt.get('italic', False)), bool(fnt.get('bold', False))))
+
+    layout = (score or {}).get('layout', {}) or {}
+    if isinstance(layout, dict):
+        for value in layout.values():
+            _add(value)
+    events = (score or {}).get('events', {}) or {}
+    for tx in (events.get('text', []) if isinstance(events, dict) else []) or []:
+        if isinstance(tx, dict):
+            _add(tx.get('font'))
+    return fonts
+
+
+def _font_fingerprint(score: dict) -> list:
+    """Cairo text extents of a probe string in each of the score's text fonts.
+
+    The engraver sizes text background boxes from these extents, and they
+    depend on the font fontconfig picks for a family, so installing or
+    removing a font changes them.
+    """
+    du = DrawUtil()
+    fingerprint = []
+    for family, italic, bold in sorted(_text_fonts(score)):
+        try:
+            extents = du._get_text_extents_mm(_FONT_PROBE_TEXT, family, 10.0, italic, bold)
+            extents = [round(float(v), 4) for v in extents]
+        except Exception:
+            extents = None
+        fingerprint.append((family, italic, bold, extents))
+    return fingerprint
+
+
+def cache_relevant_content(score: dict) -> dict:
+    """The parts of score that the engraved pages depend on."""
+    data = {k: v for k, v in (score or {}).items() if k not in _IGNORED_KEYS}
+    meta = dict(data.get('meta_data', {}) or {})
+    meta.pop('modification_timestamp', None)
+    data['meta_data'] = meta
+    return data
+
+
+def score_cache_key(score: dict) -> str:
+    """Hash everything the engraved pages depend on.
+
+    Besides the score content this includes the engraver version, the
+    packed format version and a font fingerprint. Text background boxes are
+    sized from cairo font extents, which depend on the fonts installed, so
+    the measured extents of every text font in the score are part of the key.
+
+    Serializing a large score takes a while; call this off the UI thread
+    and only when a document is opened or saved.
+    """
+    data = cache_relevant_content(score)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((ENGRAVER_VERSION, _FORMAT_VERSION)).encode('utf-8'))
+    h.update(repr(_font_fingerprint(score)).encode('utf-8'))
+    h.update(json.dumps(data, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _page_name(page_index: int) -> str:
+    return f"page-{int(page_index):04d}.dupk"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class EngraveCache:
+    """Packed engraved pages per score key, with LRU eviction by total size."""
+
+    def __init__(self, root: str | Path = ENGRAVE_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _read_index(self, key: str) -> dict | None:
+        try:
+            with open(self.root / key / _INDEX_NAME, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except Exception:
+            return None
+        if not isinstance(index, dict) or index.get('version') != _INDEX_VERSION:
+            return None
+        return index
+
+    def load(self, key: str, pageno: int = 0) -> tuple[list, int, set[int]] | None:
+        """Return (pages, current index, drawn page indices) for a cached key.
+
+        Pages that were never drawn come back as blank paper. Returns None
+        when the key is unknown or page `pageno` itself is not cached, since
+        showing a blank page first would not help.
+        """
+        if not self.enabled:
+            return None
+        index = self._read_index(key)
+        if index is None:
+            return None
+        try:
+            page_count = int(index['page_count'])
+            width_mm, height_mm = float(index['page_w_mm']), float(index['page_h_mm'])
+            target = max(0, min(page_count - 1, int(pageno)))
+            drawn = {int(i) for i in index.get('pages', [])}
+            if target not in drawn:
+                return None
+            pages: list = [Page(width_mm=width_mm, height_mm=height_mm) for _ in range(page_count)]
+            loaded: set[int] = set()
+            for page_index in sorted(drawn):
+                if not (0 <= page_index < page_count):
+                    continue
+                try:
+                    doc = PackedDocument.from_bytes((self.root / key / _page_name(page_index)).read_bytes())
+                except Exception:
+                    continue
+                if doc.pages:
+                    pages[page_index] = doc.pages[0]
+                    loaded.add(page_index)
+            if target not in loaded:
+                return None
+            os.utime(self.root / key / _INDEX_NAME)
+            return pages, target, loaded
+        except Exception:
+            traceback.print_exc()
+            return None
+
+    def store_pages(self, key: str, page_count: int, page_size_mm: tuple[float, float],
+                    pages: dict[int, Page], document: str | None = None) -> None:
+        """Add drawn pages to the entry for `key`, then enforce the size limit.
+
+        Page files are written before the index that lists them, both via
+        rename, so a reader in another process never sees a partial entry.
+        Other entries of the same `document` are outdated states of it and
+        are removed.
+        """
+        if not self.enabled or not pages:
+            return
+        try:
+            entry = self.root / key
+            entry.mkdir(parents=True, exist_ok=True)
+            index = self._read_index(key)
+            if index is None or int(index.get('page_count', -1)) != int(page_count):
+                index = {'version': _INDEX_VERSION, 'page_count': int(page_count), 'pages': []}
+            if document:
+                index['document'] = str(document)
+            index['page_w_mm'] = float(page_size_mm[0])
+            index['page_h_mm'] = float(page_size_mm[1])
+            drawn = {int(i) for i in index['pages']}
+            for page_index, page in pages.items():
+                _write_atomic(entry / _page_name(page_index), pack_pages([page], 0))
+                drawn.add(int(page_index))
+            index['pages'] = sorted(drawn)
+            _write_atomic(entry / _INDEX_NAME, json.dumps(index).encode('utf-8'))
+            if document:
+                self.drop_document(str(document), keep=key)
+            self.evict(keep=key)
+        except Exception:
+            traceback.print_exc()
+
+    def drop_document(self, document: str, keep: str | None = None) -> None:
+        """Remove every entry of `document` except `keep`."""
+        try:
+            entries = [entry for entry in self.root.iterdir() if entry.is_dir() and entry.name != keep]
+        except FileNotFoundError:
+            return
+        except Exception:
+            traceback.print_exc()
+            return
+        for entry in entries:
+            index = self._read_index(entry.name)
+            if index is not None and index.get('document') == document:
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def evict(self, keep: str | None = None) -> None:
+        """Remove least recently used entries until the cache fits max_bytes."""
+        try:
+            entries = []
+            total = 0
+            for entry in self.root.iterdir():
+                if not entry.is_dir():
+                    continue
+                size = sum(p.stat().st_size for p in entry.iterdir() if p.is_file())
+                try:
+                    last_used = (entry / _INDEX_NAME).stat().st_mtime
+                except OSError:
+                    last_used = 0.0
+                entries.append((last_used, entry, size))
+                total += size
+        except FileNotFoundError:
+            return
+        except Exception:
+            traceback.print_exc()
+            return
+        for _last_used, entry, size in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
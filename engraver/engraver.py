@@ -1,9 +1,17 @@
-from PySide6 import QtCore
 from datetime import datetime
-import bisect, math
+import bisect, hashlib, math
 import multiprocessing as mp
 import queue
+import sys
+import time
+import traceback
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Callable
+import numpy as np
 from ui.widgets.draw_util import DrawUtil
+from ui.widgets.draw_pack import pack_to_shared_memory
+from engraver.engrave_cache import EngraveCache
 from utils.CONSTANT import BE_KEYS, QUARTER_NOTE_UNIT, PIANO_KEY_AMOUNT, SHORTEST_DURATION, hex_to_rgba, BLACK_KEYS, ENGRAVER_FRACTIONAL_SCALE_CORRECTION
 from utils.tiny_tool import key_class_filter
 from utils.operator import Operator
@@ -13,13 +21,202 @@ from file_model.analysis import Analysis
 
 _MP_CONTEXT = mp.get_context("spawn")
 
-def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = False) -> None:
-    """Compute a full print layout and draw commands into DrawUtil.
+
+class EngraveCancelled(Exception):
+    """Raised by do_engrave when its cancel_check reports the request is stale."""
+
+
+class PhaseTimer:
+    """Accumulates milliseconds per named engrave phase.
+
+    Problem solved: the print view can lag in several phases and a profiler
+    is too heavy to leave running. Timers are read a few times per line at
+    most; a disabled timer only costs a branch per call.
+    """
+
+    __slots__ = ('enabled', 'ms')
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = bool(enabled)
+        self.ms: dict[str, float] = {}
+
+    def start(self) -> float:
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, phase: str, started: float) -> None:
+        if self.enabled:
+            self.ms[phase] = self.ms.get(phase, 0.0) + (time.perf_counter() - started) * 1000.0
+
+
+class SpanIndex:
+    """Overlap queries over (start, end, payload) time spans.
+
+    Problem solved: collision checks asked every note of a line whether it
+    overlaps a small time window. Spans are bucketed by length (powers of
+    two) and sorted by start; a query bisects each bucket to the starts that
+    can reach the window, so it touches the overlapping spans and a few
+    neighbours only. `candidates` may return extra spans near the window
+    edges; callers apply their exact (threshold) test to the result.
+    """
+
+    __slots__ = ('_levels',)
+
+    def __init__(self, spans: list[tuple[float, float, object]]) -> None:
+        buckets: dict[int, list[tuple[float, float, object]]] = {}
+        for span in spans:
+            length = max(0.0, float(span[1]) - float(span[0]))
+            level = 0
+            while float(1 << level) < length:
+                level += 1
+            buckets.setdefault(level, []).append(span)
+        self._levels: list[tuple[float, list[float], list[tuple[float, float, object]]]] = []
+        for level in sorted(buckets):
+            items = sorted(buckets[level], key=lambda sp: sp[0])
+            self._levels.append((float(1 << level), [sp[0] for sp in items], items))
+
+    def candidates(self, lo: float, hi: float) -> list[tuple[float, float, object]]:
+        """Spans with start <= hi and end >= lo."""
+        found = []
+        for reach, starts, items in self._levels:
+            for k in range(bisect.bisect_left(starts, lo - reach), bisect.bisect_right(starts, hi)):
+                span = items[k]
+                if span[1] >= lo:
+                    found.append(span)
+        return found
+
+
+class NoteColumns:
+    """Columnar (structured NumPy) copy of the normalized notes, in score order.
+
+    Problem solved: window queries (line slicing, pitch ranges, rest gaps)
+    looped over per-note dicts with float/int coercion on every pass. The
+    columns answer them with vectorized masks and sorted searches. Masks
+    repeat Operator's threshold arithmetic, so results match the scalar
+    comparisons exactly.
+    """
+
+    DTYPE = np.dtype([('time', 'f8'), ('end', 'f8'), ('pitch', 'i8'), ('hand', 'u1'), ('idx', 'i8')])
+
+    def __init__(self, norm_notes: list[dict], threshold: float) -> None:
+        self.threshold = float(threshold)
+        cols = np.zeros(len(norm_notes), dtype=self.DTYPE)
+        if norm_notes:
+            cols['time'] = [n['time'] for n in norm_notes]
+            cols['end'] = [n['end'] for n in norm_notes]
+            cols['pitch'] = [n['pitch'] for n in norm_notes]
+            cols['hand'] = [0 if n['hand'] == '<' else 1 for n in norm_notes]
+            cols['idx'] = [n['idx'] for n in norm_notes]
+        self.cols = cols
+        self.in_range = (cols['pitch'] >= 1) & (cols['pitch'] <= PIANO_KEY_AMOUNT)
+        # Rows of each hand sorted by onset (stable, so score order breaks ties).
+        self.by_hand = {
+            hand: rows[np.argsort(cols['time'][rows], kind='stable')]
+            for hand, rows in ((0, np.flatnonzero(cols['hand'] == 0)), (1, np.flatnonzero(cols['hand'] == 1)))
+        }
+
+    def line_mask(self, t_start: float, t_end: float) -> np.ndarray:
+        """Rows not excluded by op_time.ge(time, t_end) or op_time.le(end, t_start)."""
+        th = self.threshold
+        return (self.cols['time'] < t_end - th) & (self.cols['end'] > t_start + th)
+
+    def window_mask(self, t0: float, t1: float) -> np.ndarray:
+        """Rows with op_time.lt(time, t1) and op_time.gt(end, t0)."""
+        th = self.threshold
+        return ((t1 - self.cols['time']) > th) & ((self.cols['end'] - t0) > th)
+
+    def pitch_stats(self, mask: np.ndarray) -> tuple[int, int | None, int | None]:
+        """Count and pitch bounds of the in-range rows selected by mask."""
+        pitches = self.cols['pitch'][mask & self.in_range]
+        if not len(pitches):
+            return 0, None, None
+        return int(len(pitches)), int(pitches.min()), int(pitches.max())
+
+    def followed_rest_flags(self) -> np.ndarray:
+        """Per row: True when no note of the same hand starts at (or within the
+        threshold of) the note's end, i.e. a stop sign follows the note."""
+        th = self.threshold
+        flags = np.ones(len(self.cols), dtype=bool)
+        for order in self.by_hand.values():
+            n = len(order)
+            if not n:
+                continue
+            starts = self.cols['time'][order]
+            ends = self.cols['end'][order]
+            # A note at score index 0 is never skipped as "itself" (legacy idx check).
+            own = np.where(self.cols['idx'][order] != 0, order, -1)
+            j = np.searchsorted(starts, ends - th, side='left')
+            # First later note of the hand that is not the note itself and starts
+            # no earlier than `th` before its end.
+            while True:
+                open_ = j < n
+                jj = np.minimum(j, n - 1)
+                skip = open_ & ((order[jj] == own) | ((starts[jj] - ends) < -th))
+                if not skip.any():
+                    break
+                j = j + skip
+            found = j < n
+            jj = np.minimum(j, n - 1)
+            flags[order] = ~found | ((starts[jj] - ends) > th)
+        return flags
+
+
+class LineCache:
+    """LRU of drawn line output keyed by a digest of everything a line reads.
+
+    Problem solved: most edits touch a single line, yet every engrave redrew
+    all lines of the page. A line whose inputs (its events, layout, grid and
+    position on the page) are unchanged reuses its recorded DrawUtil items.
+    """
+
+    def __init__(self, max_lines: int = 512) -> None:
+        self._max_lines = max(1, int(max_lines))
+        self._entries: OrderedDict[bytes, list] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> list | None:
+        items = self._entries.get(key)
+        if items is not None:
+            self._entries.move_to_end(key)
+        return items
+
+    def put(self, key: bytes, items: list) -> None:
+        self._entries[key] = items
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_lines:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def engrave_layout(score: SCORE, cancel_check: Callable[[], bool] | None = None,
+                   profile: bool = False, headless_fonts: bool = False,
+                   page_geometry: list[list[dict]] | None = None) -> 'EngraveLayout':
+    """Run the layout phase: line windows, stave ranges, widths and pagination.
 
     Problem solved: the engraver must be deterministic and thread-safe.
     It converts the score model into page/line geometry without any Qt
-    rendering calls, then records only DrawUtil primitives.
+    rendering calls; the returned EngraveLayout records only DrawUtil
+    primitives when a page is drawn.
+
+    cancel_check is polled once per line; when it returns True the layout
+    stops with EngraveCancelled. With profile=True the layout and draw
+    phases are timed and reported on the Analysis (_phase_ms).
+
+    headless_fonts=True never consults the font registry (QFontDatabase),
+    also in the GUI process; PDF exports use it so fonts resolve the same
+    on any thread and in any process, like in the engrave worker.
+
+    page_geometry is EngraveLayout.pages of an earlier layout of the same
+    score; line building and pagination are then skipped.
     """
+
+    def _check_cancel() -> None:
+        if cancel_check is not None and cancel_check():
+            raise EngraveCancelled()
+
     score: SCORE = score or {}
     meta_data = (score.get('meta_data', {}) or {})
     layout = (score.get('layout', {}) or {})
@@ -36,6 +233,9 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
     slurs = list(events.get('slur', []) or [])
     texts = list(events.get('text', []) or [])
 
+    op_time = Operator(SHORTEST_DURATION)
+    layout_timer = PhaseTimer(profile)
+    phase_t0 = layout_timer.start()
     # Problem solved: beam markers are organized per hand for fast grouping later.
     beam_by_hand: dict[str, list[dict]] = {'l': [], 'r': []}
     for b in beam_markers:
@@ -51,8 +251,6 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
 
     # Problem solved: normalize notes once to avoid repeated dict parsing in loops.
     norm_notes: list[dict] = []
-    notes_by_hand: dict[str, list[dict]] = {'<': [], '>': []}
-    starts_by_hand: dict[str, list[float]] = {'<': [], '>': []}
     for idx, n in enumerate(notes):
         if not isinstance(n, dict):
             continue
@@ -73,13 +271,36 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
             'raw': n,
         }
         norm_notes.append(item)
-        notes_by_hand[hand_key].append(item)
-        starts_by_hand[hand_key].append(n_t)
-
-    for hk in notes_by_hand:
-        notes_by_hand[hk] = sorted(notes_by_hand[hk], key=lambda m: float(m.get('time', 0.0) or 0.0))
-    for hk in starts_by_hand:
-        starts_by_hand[hk] = sorted(starts_by_hand[hk])
+    note_cols = NoteColumns(norm_notes, op_time.threshold)
+    # Problem solved: stop-signs should mark a gap in the same hand, not simply
+    # the end of a note; decided once per note, keyed by score index.
+    rest_after = {
+        item['idx']: bool(flag) for item, flag in zip(norm_notes, note_cols.followed_rest_flags())
+    }
+
+    # Problem solved: stem rules need the notes sounding together with a note.
+    # Buckets are one op_time threshold wide, so onsets equal within the
+    # threshold land in the same or an adjacent bucket.
+    onset_bucket_w = op_time.threshold if op_time.threshold > 0.0 else 1.0
+    chord_index: dict[str, dict[int, list[dict]]] = {'<': {}, '>': {}}
+    for item in norm_notes:
+        bucket = int(math.floor(item['time'] / onset_bucket_w))
+        chord_index[item['hand']].setdefault(bucket, []).append(item)
+
+    def _chord_neighbours(item: dict, same_hand: bool) -> list[dict]:
+        """Notes whose onset equals item's within op_time (item included), in score order."""
+        t0 = float(item.get('time', 0.0) or 0.0)
+        bucket = int(math.floor(t0 / onset_bucket_w))
+        hands = (str(item.get('hand', '<') or '<'),) if same_hand else ('<', '>')
+        found = []
+        for hk in hands:
+            buckets = chord_index.get(hk, {})
+            for b in (bucket - 1, bucket, bucket + 1):
+                for m in buckets.get(b, ()):
+                    if op_time.eq(m['time'], t0):
+                        found.append(m)
+        found.sort(key=lambda m: m['idx'])
+        return found
 
     # Normalize grace notes (time + pitch only)
     norm_grace: list[dict] = []
@@ -133,6 +354,7 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
         })
     if norm_texts:
         norm_texts = sorted(norm_texts, key=lambda m: float(m.get('time', 0.0) or 0.0))
+    layout_timer.stop('normalize', phase_t0)
 
     # Problem solved: materialize layout values early to keep math predictable.
     page_w = float(layout.get('page_width_mm', 210.0) or 210.0)
@@ -147,7 +369,6 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
     clef_dash = list(layout.get('stave_clef_line_dash_pattern_mm', []) or [])
     if clef_dash:
         clef_dash = [float(v) * scale for v in clef_dash]
-    op_time = Operator(SHORTEST_DURATION)
     barline_positions: list[float] = []
     cur_bar = 0.0
     for bg in base_grid:
@@ -197,6 +418,9 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
             measure_windows.append({'start': float(cur_m), 'end': float(cur_m + measure_len), 'number': int(m_idx)})
             m_idx += 1
             cur_m += measure_len
+    # Windows are laid end to end, so both edges are sorted; lines bisect into them.
+    measure_starts = [float(mw['start']) for mw in measure_windows]
+    measure_ends = [float(mw['end']) for mw in measure_windows]
 
     def _normalize_hex_color(value: str | None) -> str | None:
         """Normalize hex color strings and allow special hand markers."""
@@ -228,7 +452,15 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
 
     def _allow_font_registry() -> bool:
         """Return True when it is safe to access QFontDatabase (GUI process only)."""
-        return mp.current_process().name == "MainProcess"
+        if headless_fonts or mp.current_process().name != "MainProcess":
+            return False
+        # Headless callers (batch CLI, servers) have no QGuiApplication; checking
+        # sys.modules avoids importing Qt just to find that out.
+        qtgui = sys.modules.get('PySide6.QtGui')
+        try:
+            return qtgui is not None and qtgui.QGuiApplication.instance() is not None
+        except Exception:
+            return False
 
     def _resolve_font_family(family: str) -> str:
         """Resolve a font family name with the font registry if available."""
@@ -408,77 +640,34 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
         groups = _assign_groups(notes_sorted, windows) if notes_sorted else []
         return groups, windows
 
-    def _black_note_above_stem(item: dict, rule: str, notes: list[dict], op: Operator) -> bool:
+    def _black_note_above_stem(item: dict, rule: str, line_idx: set[int]) -> bool:
+        """Decide the black-note head position; neighbours must be notes of the
+        current line (line_idx holds their 'idx')."""
         if rule == 'above_stem':
             return True
         p0 = int(item.get('pitch', 0) or 0)
-        t0 = float(item.get('time', 0.0) or 0.0)
         idx0 = int(item.get('idx', -1) or -1)
         if rule in ('above_stem_if_collision', 'only_above_stem_if_collision'):
-            for m in notes:
-                if int(m.get('idx', -2) or -2) == idx0:
-                    continue
-                if not op.eq(float(m.get('time', 0.0) or 0.0), t0):
+            for m in _chord_neighbours(item, same_hand=False):
+                if m['idx'] == idx0 or m['idx'] not in line_idx:
                     continue
-                if abs(int(m.get('pitch', 0) or 0) - p0) == 1:
+                if abs(m['pitch'] - p0) == 1:
                     return True
             return False
         if rule == 'above_stem_if_chord_and_white_note':
-            for m in notes:
-                if int(m.get('idx', -2) or -2) == idx0:
-                    continue
-                if not op.eq(float(m.get('time', 0.0) or 0.0), t0):
-                    continue
-                mp = int(m.get('pitch', 0) or 0)
-                if mp not in BLACK_KEYS and mp != p0:
-                    return True
-            return False
-        if rule != 'above_stem_if_chord_and_white_note_same_hand':
+            same_hand = False
+        elif rule == 'above_stem_if_chord_and_white_note_same_hand':
+            same_hand = True
+        else:
             return False
-        hand0 = str(item.get('hand', '<') or '<')
-        for m in notes:
-            if int(m.get('idx', -2) or -2) == idx0:
-                continue
-            if not op.eq(float(m.get('time', 0.0) or 0.0), t0):
-                continue
-            if str(m.get('hand', '<') or '<') != hand0:
+        for m in _chord_neighbours(item, same_hand=same_hand):
+            if m['idx'] == idx0 or m['idx'] not in line_idx:
                 continue
-            mp = int(m.get('pitch', 0) or 0)
+            mp = m['pitch']
             if mp not in BLACK_KEYS and mp != p0:
                 return True
         return False
 
-    def _has_followed_rest(item: dict) -> bool:
-        """Return True when a note has no immediate following note in its hand.
-
-        Problem solved: stop-signs should mark a gap in the same hand, not
-        simply the end of a note.
-        """
-        hand_key = str(item.get('hand', '<') or '<')
-        hand_list = notes_by_hand.get(hand_key, [])
-        starts = starts_by_hand.get(hand_key, [])
-        if not hand_list or not starts:
-            return True
-        end = float(item.get('end', 0.0) or 0.0)
-        thr = float(op_time.threshold)
-        idx = bisect.bisect_left(starts, float(end - thr))
-        min_delta = None
-        for j in range(idx, len(hand_list)):
-            m = hand_list[j]
-            if int(m.get('idx', -1) or -1) == int(item.get('idx', -2) or -2):
-                continue
-            delta = float(m.get('time', 0.0) or 0.0) - end
-            if delta >= -thr:
-                min_delta = delta
-                break
-        if min_delta is None:
-            return True
-        return op_time.gt(float(min_delta), 0.0)
-
-    # Problem solved: reset DrawUtil pages so the engrave output is fresh.
-    du._pages = []
-    du._current_index = -1
-
     def _total_score_ticks() -> float:
         """Compute total score duration in ticks from base grid segments."""
         total = 0.0
@@ -613,18 +802,7 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
 
         Problem solved: auto range must reflect actual notes in the window.
         """
-        lo = None
-        hi = None
-        for n in notes:
-            n_t = float(n.get('time', 0.0) or 0.0)
-            n_d = float(n.get('duration', 0.0) or 0.0)
-            n_end = n_t + n_d
-            p = int(n.get('pitch', 0) or 0)
-            if op_time.lt(n_t, t1) and op_time.gt(n_end, t0):
-                if p < 1 or p > PIANO_KEY_AMOUNT:
-                    continue
-                lo = p if lo is None else min(lo, p)
-                hi = p if hi is None else max(hi, p)
+        _count, lo, hi = note_cols.pitch_stats(note_cols.window_mask(float(t0), float(t1)))
         return lo, hi
 
     def _visible_line_groups_for_range(lo: int, hi: int, include_clef: bool = True) -> list[dict]:
@@ -673,19 +851,7 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
 
     def _notes_in_window_stats(t0: float, t1: float) -> tuple[int, int | None, int | None]:
         """Return note count and pitch bounds overlapping a time window."""
-        count = 0
-        lo = None
-        hi = None
-        for n in notes:
-            n_t = float(n.get('time', 0.0) or 0.0)
-            n_d = float(n.get('duration', 0.0) or 0.0)
-            n_end = n_t + n_d
-            p = int(n.get('pitch', 0) or 0)
-            if op_time.lt(n_t, t1) and op_time.gt(n_end, t0) and 1 <= p <= PIANO_KEY_AMOUNT:
-                count += 1
-                lo = p if lo is None else min(lo, p)
-                hi = p if hi is None else max(hi, p)
-        return count, lo, hi
+        return note_cols.pitch_stats(note_cols.window_mask(float(t0), float(t1)))
 
     def _build_key_positions(start_key: int, end_key: int, semitone_mm: float) -> dict[int, float]:
         """Build x positions for keys, adding extra spacing after B/E.
@@ -704,6 +870,7 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
             prev = key
         return positions
 
+    phase_t0 = layout_timer.start()
     total_ticks = _total_score_ticks()
     if total_ticks <= 0.0:
         total_ticks = float(QUARTER_NOTE_UNIT) * 4.0
@@ -711,162 +878,202 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
         line_breaks = [_line_break_defaults()]
 
     line_breaks = sorted(line_breaks, key=lambda lb: float(lb.get('time', 0.0) or 0.0))
-
-    # Problem solved: convert line break events into contiguous line windows.
-    lines = []
-    for i, lb in enumerate(line_breaks):
-        lb_time = float(lb.get('time', 0.0) or 0.0)
-        next_time = float(line_breaks[i + 1].get('time', total_ticks) or total_ticks) if i + 1 < len(line_breaks) else total_ticks
-        if next_time < lb_time:
-            next_time = lb_time
-        margin_mm = list(lb.get('margin_mm', [10.0, 10.0]) or [10.0, 10.0])
-        if len(margin_mm) < 2:
-            margin_mm = [margin_mm[0] if margin_mm else 10.0, 10.0]
-        stave_range = lb.get('stave_range', 'auto')
-        if stave_range is True:
-            stave_range = 'auto'
-        if isinstance(stave_range, list) and len(stave_range) >= 2:
-            r0 = int(stave_range[0])
-            r1 = int(stave_range[1])
-            if (r0 == 0 and r1 == 0) or (r0 == 1 and r1 == 1):
-                stave_range = 'auto'
-        line = {
-            'time_start': lb_time,
-            'time_end': next_time,
-            'margin_left': float(margin_mm[0]),
-            'margin_right': float(margin_mm[1]),
-            'stave_range': stave_range,
-            'page_break': bool(lb.get('page_break', False)),
-        }
-        lines.append(line)
-
-
-    # Problem solved: compute per-line horizontal geometry (margins, ranges).
     semitone_mm = 2.5 * scale
     key_positions = _build_key_positions(1, PIANO_KEY_AMOUNT, semitone_mm)
-    for line in lines:
-        if line['stave_range'] == 'auto':
-            groups, keys, bound_left, bound_right, empty, pattern = _auto_line_keys_and_bounds(line['time_start'], line['time_end'])
-            line['visible_keys'] = keys
-            line['pattern'] = pattern
-            if empty:
-                count, lo, hi = _notes_in_window_stats(line['time_start'], line['time_end'])
-        else:
-            manual = _sanitize_range(line['stave_range'])
-            groups = _visible_line_groups_for_range(manual[0], manual[1], include_clef=False)
-            if not groups:
-                grp = line_groups[clef_group_index]
-                groups = [grp]
-            keys: list[int] = []
-            patterns: list[str] = []
-            for grp in groups:
-                keys.extend(grp['keys'])
-                patterns.append(str(grp.get('pattern', '')))
-            bound_left = int(keys[0])
-            bound_right = int(keys[-1])
-            line['visible_keys'] = keys
-            line['pattern'] = ' '.join(patterns)
-        # Problem solved: avoid clipping A#0 ledger by forcing left edge to key 2.
-        low_key_present = False
-        for item in norm_notes:
-            n_t = float(item.get('time', 0.0) or 0.0)
-            n_end = float(item.get('end', 0.0) or 0.0)
-            p = int(item.get('pitch', 0) or 0)
-            if op_time.ge(n_t, float(line['time_end'])) or op_time.le(n_end, float(line['time_start'])):
-                continue
-            if p in (1, 2, 3):
-                low_key_present = True
-                break
-        if low_key_present:
-            bound_left = 2
-        line['low_key_left'] = bool(low_key_present)
-        line['range'] = [int(bound_left), int(bound_right)]
-        min_pos = key_positions.get(bound_left, 0.0)
-        max_pos = key_positions.get(bound_right, min_pos)
-        stave_width = max(0.0, max_pos - min_pos)
-        line['stave_width'] = float(stave_width)
-        base_margin_left = float(line.get('margin_left', 0.0) or 0.0)
-        ts_lane_width = 0.0
-        ts_lane_right_offset = 0.0
-        # Problem solved: if time-signature indicators would collide with notes,
-        # expand left margin to reserve a lane.
-        ts_segments_in_line = [
-            seg
-            for seg in ts_segments
-            if bool(seg.get('indicator_enabled', True))
-            and op_time.ge(float(seg.get('start', 0.0) or 0.0), float(line['time_start']))
-            and op_time.lt(float(seg.get('start', 0.0) or 0.0), float(line['time_end']))
-        ]
-        if ts_segments_in_line:
-            ts_lane_width = float(layout.get('time_signature_indicator_lane_width_mm', 22.0) or 22.0)
-            min_pitch = None
-            for seg in ts_segments_in_line:
-                win_start = float(seg.get('start', 0.0) or 0.0)
-                win_end = win_start + float(seg.get('measure_len', 0.0) or 0.0)
-                for item in norm_notes:
-                    n_t = float(item.get('time', 0.0) or 0.0)
-                    n_end = float(item.get('end', 0.0) or 0.0)
-                    if op_time.ge(n_t, float(line['time_end'])) or op_time.le(n_end, float(line['time_start'])):
-                        continue
-                    if op_time.lt(n_t, win_end) and op_time.gt(n_end, win_start):
-                        p = int(item.get('pitch', 0) or 0)
-                        if 1 <= p <= PIANO_KEY_AMOUNT:
-                            min_pitch = p if min_pitch is None else min(min_pitch, p)
-            if min_pitch is not None:
-                stem_len_units = float(layout.get('note_stem_length_semitone', 3) or 3)
-                stem_len_mm = stem_len_units * semitone_mm
-                origin = float(key_positions.get(bound_left, 0.0))
-                note_offset = float(key_positions.get(min_pitch, origin)) - origin
-                offset_left = note_offset - stem_len_mm
-                ts_lane_gap_mm = 1.0
-                ts_lane_right_offset = min(0.0, float(offset_left - ts_lane_gap_mm))
-            extra_left = max(0.0, -ts_lane_right_offset)
-            lane_margin = ts_lane_width + extra_left
-            line['margin_left'] = max(base_margin_left, lane_margin)
-        line['base_margin_left'] = base_margin_left
-        line['ts_lane_width'] = ts_lane_width
-        line['ts_lane_right_offset'] = ts_lane_right_offset
-        line['total_width'] = float(line['margin_left'] + stave_width + line['margin_right'])
-        line['bound_left'] = int(bound_left)
-        line['bound_right'] = int(bound_right)
-
-    # Problem solved: paginate lines to fit available width with explicit breaks.
     available_width = max(1e-6, page_w - page_left - page_right)
-    pages: list[list[dict]] = []
-    cur_page: list[dict] = []
-    cur_width = 0.0
-    for line in lines:
-        if line.get('page_break', False):
-            if cur_page:
+
+    def _build_lines() -> list[dict]:
+        """Line windows from the line breaks, with stave ranges and widths."""
+        # Problem solved: convert line break events into contiguous line windows.
+        lines = []
+        for i, lb in enumerate(line_breaks):
+            lb_time = float(lb.get('time', 0.0) or 0.0)
+            next_time = float(line_breaks[i + 1].get('time', total_ticks) or total_ticks) if i + 1 < len(line_breaks) else total_ticks
+            if next_time < lb_time:
+                next_time = lb_time
+            margin_mm = list(lb.get('margin_mm', [10.0, 10.0]) or [10.0, 10.0])
+            if len(margin_mm) < 2:
+                margin_mm = [margin_mm[0] if margin_mm else 10.0, 10.0]
+            stave_range = lb.get('stave_range', 'auto')
+            if stave_range is True:
+                stave_range = 'auto'
+            if isinstance(stave_range, list) and len(stave_range) >= 2:
+                r0 = int(stave_range[0])
+                r1 = int(stave_range[1])
+                if (r0 == 0 and r1 == 0) or (r0 == 1 and r1 == 1):
+                    stave_range = 'auto'
+            line = {
+                'time_start': lb_time,
+                'time_end': next_time,
+                'margin_left': float(margin_mm[0]),
+                'margin_right': float(margin_mm[1]),
+                'stave_range': stave_range,
+                'page_break': bool(lb.get('page_break', False)),
+            }
+            lines.append(line)
+
+        # Problem solved: compute per-line horizontal geometry (margins, ranges).
+        for line in lines:
+            _check_cancel()
+            if line['stave_range'] == 'auto':
+                groups, keys, bound_left, bound_right, empty, pattern = _auto_line_keys_and_bounds(line['time_start'], line['time_end'])
+                line['visible_keys'] = keys
+                line['pattern'] = pattern
+                if empty:
+                    count, lo, hi = _notes_in_window_stats(line['time_start'], line['time_end'])
+            else:
+                manual = _sanitize_range(line['stave_range'])
+                groups = _visible_line_groups_for_range(manual[0], manual[1], include_clef=False)
+                if not groups:
+                    grp = line_groups[clef_group_index]
+                    groups = [grp]
+                keys: list[int] = []
+                patterns: list[str] = []
+                for grp in groups:
+                    keys.extend(grp['keys'])
+                    patterns.append(str(grp.get('pattern', '')))
+                bound_left = int(keys[0])
+                bound_right = int(keys[-1])
+                line['visible_keys'] = keys
+                line['pattern'] = ' '.join(patterns)
+            # Problem solved: avoid clipping A#0 ledger by forcing left edge to key 2.
+            in_line = note_cols.line_mask(float(line['time_start']), float(line['time_end']))
+            low_key_present = bool(np.any(in_line & (note_cols.cols['pitch'] >= 1) & (note_cols.cols['pitch'] <= 3)))
+            if low_key_present:
+                bound_left = 2
+            line['low_key_left'] = bool(low_key_present)
+            line['range'] = [int(bound_left), int(bound_right)]
+            min_pos = key_positions.get(bound_left, 0.0)
+            max_pos = key_positions.get(bound_right, min_pos)
+            stave_width = max(0.0, max_pos - min_pos)
+            line['stave_width'] = float(stave_width)
+            base_margin_left = float(line.get('margin_left', 0.0) or 0.0)
+            ts_lane_width = 0.0
+            ts_lane_right_offset = 0.0
+            # Problem solved: if time-signature indicators would collide with notes,
+            # expand left margin to reserve a lane.
+            ts_segments_in_line = [
+                seg
+                for seg in ts_segments
+                if bool(seg.get('indicator_enabled', True))
+                and op_time.ge(float(seg.get('start', 0.0) or 0.0), float(line['time_start']))
+                and op_time.lt(float(seg.get('start', 0.0) or 0.0), float(line['time_end']))
+            ]
+            if ts_segments_in_line:
+                ts_lane_width = float(layout.get('time_signature_indicator_lane_width_mm', 22.0) or 22.0)
+                min_pitch = None
+                for seg in ts_segments_in_line:
+                    win_start = float(seg.get('start', 0.0) or 0.0)
+                    win_end = win_start + float(seg.get('measure_len', 0.0) or 0.0)
+                    _count, seg_lo, _hi = note_cols.pitch_stats(in_line & note_cols.window_mask(win_start, win_end))
+                    if seg_lo is not None:
+                        min_pitch = seg_lo if min_pitch is None else min(min_pitch, seg_lo)
+                if min_pitch is not None:
+                    stem_len_units = float(layout.get('note_stem_length_semitone', 3) or 3)
+                    stem_len_mm = stem_len_units * semitone_mm
+                    origin = float(key_positions.get(bound_left, 0.0))
+                    note_offset = float(key_positions.get(min_pitch, origin)) - origin
+                    offset_left = note_offset - stem_len_mm
+                    ts_lane_gap_mm = 1.0
+                    ts_lane_right_offset = min(0.0, float(offset_left - ts_lane_gap_mm))
+                extra_left = max(0.0, -ts_lane_right_offset)
+                lane_margin = ts_lane_width + extra_left
+                line['margin_left'] = max(base_margin_left, lane_margin)
+            line['base_margin_left'] = base_margin_left
+            line['ts_lane_width'] = ts_lane_width
+            line['ts_lane_right_offset'] = ts_lane_right_offset
+            line['total_width'] = float(line['margin_left'] + stave_width + line['margin_right'])
+            line['bound_left'] = int(bound_left)
+            line['bound_right'] = int(bound_right)
+        return lines
+
+    def _paginate(lines: list[dict]) -> list[list[dict]]:
+        pages: list[list[dict]] = []
+        cur_page: list[dict] = []
+        cur_width = 0.0
+        for line in lines:
+            if line.get('page_break', False):
+                if cur_page:
+                    pages.append(cur_page)
+                elif not pages:
+                    pages.append([])
+                cur_page = []
+                cur_width = 0.0
+            if cur_page and (cur_width + float(line['total_width'])) > available_width:
                 pages.append(cur_page)
-            elif not pages:
-                pages.append([])
-            cur_page = []
-            cur_width = 0.0
-        if cur_page and (cur_width + float(line['total_width'])) > available_width:
+                cur_page = []
+                cur_width = 0.0
+            cur_page.append(line)
+            cur_width += float(line['total_width'])
+        if cur_page:
             pages.append(cur_page)
-            cur_page = []
-            cur_width = 0.0
-        cur_page.append(line)
-        cur_width += float(line['total_width'])
-    if cur_page:
-        pages.append(cur_page)
 
-    # Problem solved: render each page with header/footer and justified spacing.
-    if not pages:
-        pages = [[]]
+        # Problem solved: always provide at least one (empty) page.
+        if not pages:
+            pages = [[]]
+        return pages
+
+    if page_geometry is not None:
+        # Problem solved: a layout sent to another process (see
+        # EngraveLayout.__reduce__) brings its lines and pages along, so
+        # only the per-note tables above are rebuilt there.
+        pages = [list(page) for page in page_geometry]
+        lines = [line for page in pages for line in page]
+    else:
+        lines = _build_lines()
+        layout_timer.stop('line_building', phase_t0)
+
+        # Problem solved: paginate lines to fit available width with explicit breaks.
+        phase_t0 = layout_timer.start()
+        pages = _paginate(lines)
+        layout_timer.stop('page_packing', phase_t0)
 
     analysis_snapshot = Analysis.compute(score, lines_count=len(lines), pages_count=len(pages))
-    setattr(du, 'analysis', analysis_snapshot)
-    target_page_index = 0
-    if not pdf_export and pages:
-        try:
-            target_page_index = int(pageno)
-        except Exception:
-            target_page_index = 0
-        target_page_index = max(0, min(len(pages) - 1, target_page_index))
+    analysis_snapshot._phase_ms = dict(layout_timer.ms)
+
+    # Inputs shared by every line; hashed once per layout.
+    line_cache_base = hashlib.blake2b(
+        repr((layout, base_grid, total_ticks, page_w, _allow_font_registry())).encode('utf-8'),
+        digest_size=16,
+    ).digest()
+
+    def _line_cache_key(line: dict, x_start: float, y_top: float, y_bottom: float,
+                        line_notes: list[dict], rest_flags: dict[int, bool], line_grace: list[dict],
+                        line_slurs: list[dict], line_texts: list[dict]) -> bytes:
+        t_start = float(line['time_start'])
+        t_end = float(line['time_end'])
+        # Beam markers reach notes that started before the line; widen the window.
+        t_first = min([t_start] + [float(n.get('time', 0.0) or 0.0) for n in line_notes])
+        thr = float(op_time.threshold)
+        markers = [
+            (hk, float(b.get('time', 0.0) or 0.0), float(b.get('duration', 0.0) or 0.0))
+            for hk, lst in beam_by_hand.items()
+            for b in lst
+            if float(b.get('time', 0.0) or 0.0) <= t_end + thr
+            and float(b.get('time', 0.0) or 0.0) + max(0.0, float(b.get('duration', 0.0) or 0.0)) >= t_first - thr
+        ]
+        counts = [
+            (ev.get('time'), ev.get('pitch1'), ev.get('pitch2'), ev.get('_id'))
+            for ev in count_lines
+            if not (op_time.lt(float(ev.get('time', 0.0) or 0.0), t_start) or op_time.gt(float(ev.get('time', 0.0) or 0.0), t_end))
+        ]
+        line_sig = sorted((k, v) for k, v in line.items() if k not in ('y_top', 'y_bottom'))
+        # 'idx' is a score-wide list position; it only matters as identity
+        # within the line, so it is left out to survive inserts elsewhere.
+        payload = (
+            line_sig, x_start, y_top, y_bottom,
+            [(n.get('time'), n.get('end'), n.get('pitch'), n.get('hand'), n.get('id'),
+              n.get('raw'), rest_flags.get(int(n.get('idx', -1)))) for n in line_notes],
+            [(g.get('time'), g.get('pitch'), g.get('id')) for g in line_grace],
+            [[(k, v) for k, v in sl.items() if k != 'idx'] for sl in line_slurs],
+            [[(k, v) for k, v in tx.items() if k != 'idx'] for tx in line_texts],
+            markers, counts,
+        )
+        h = hashlib.blake2b(line_cache_base, digest_size=16)
+        h.update(repr(payload).encode('utf-8'))
+        return h.digest()
 
-    for page_index, page in enumerate(pages):
+    def _new_page(du: DrawUtil, pdf_export: bool) -> None:
         du.new_page(page_w, page_h)
         if not pdf_export:
             edge_thickness = .5
@@ -896,8 +1103,11 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                 id=0,
                 tags=['paper_edge_guide', 'paper_edge_guide_bottom'],
             )
-        if not pdf_export and page_index != target_page_index:
-            continue
+
+    def _draw_page(du: DrawUtil, page_index: int, pageno: int, check_cancel: Callable[[], None],
+                   line_cache: LineCache | None, stats: dict[str, int], timer: PhaseTimer) -> None:
+        # Problem solved: render each page with header/footer and justified spacing.
+        page = pages[page_index]
         footer_height = float(layout.get('footer_height_mm', 0.0) or 0.0)
         footer_height = max(0.0, footer_height)
         if page_index == 0:
@@ -998,12 +1208,13 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                     anchor='se',
                 )
         if not page:
-            continue
+            return
         used_width = sum(float(l['total_width']) for l in page)
         leftover = max(0.0, available_width - used_width)
         gap = leftover / float(len(page) + 1)
         x_cursor = page_left + gap
         for line in page:
+            check_cancel()
             line_x_start = x_cursor + float(line['margin_left'])
             line_x_end = line_x_start + float(line['stave_width'])
             header_offset = 0.0
@@ -1016,6 +1227,61 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
             line['y_top'] = y1
             line['y_bottom'] = y2
 
+            # Problem solved: pre-filter notes once per line for later passes.
+            line_rows = np.flatnonzero(
+                note_cols.line_mask(float(line['time_start']), float(line['time_end'])) & note_cols.in_range
+            )
+            line_notes: list[dict] = [norm_notes[r] for r in line_rows]
+
+            # Grace notes: time-only, so check time window and key range.
+            line_grace: list[dict] = []
+            for item in norm_grace:
+                g_t = float(item.get('time', 0.0) or 0.0)
+                p = int(item.get('pitch', 0) or 0)
+                if op_time.lt(g_t, float(line['time_start'])) or op_time.ge(g_t, float(line['time_end'])):
+                    continue
+                if p < 1 or p > PIANO_KEY_AMOUNT:
+                    continue
+                line_grace.append(item)
+
+            line_slurs: list[dict] = []
+            if norm_slurs:
+                line_start = float(line.get('time_start', 0.0) or 0.0)
+                line_end = float(line.get('time_end', 0.0) or 0.0)
+                for sl in norm_slurs:
+                    anchor_t = float(sl.get('y1_time', 0.0) or 0.0)
+                    if op_time.lt(anchor_t, float(line_start)) or op_time.ge(anchor_t, float(line_end)):
+                        continue
+                    line_slurs.append(sl)
+
+            line_texts: list[dict] = []
+            if norm_texts:
+                line_start = float(line.get('time_start', 0.0) or 0.0)
+                line_end = float(line.get('time_end', 0.0) or 0.0)
+                for tx in norm_texts:
+                    t_time = float(tx.get('time', 0.0) or 0.0)
+                    if op_time.lt(t_time, float(line_start)) or op_time.ge(t_time, float(line_end)):
+                        continue
+                    line_texts.append(tx)
+
+            # Problem solved: reuse the drawn items of an unchanged line. The key
+            # holds the line's own events plus its absolute placement, so cached
+            # items can be replayed as-is.
+            rest_flags = {item['idx']: rest_after[item['idx']] for item in line_notes}
+            line_key = None
+            if line_cache is not None:
+                line_key = _line_cache_key(line, line_x_start, y1, y2, line_notes, rest_flags,
+                                           line_grace, line_slurs, line_texts)
+                cached_items = line_cache.get(line_key)
+                if cached_items is not None:
+                    du._pages[du._current_index].items.extend(cached_items)
+                    stats['lines_reused'] += 1
+                    x_cursor = x_cursor + float(line['total_width']) + gap
+                    continue
+            stats['lines_rebuilt'] += 1
+            line_item_start = len(du._pages[du._current_index].items)
+
+
             bound_left = int(line.get('bound_left', line['range'][0]))
             bound_right = int(line.get('bound_right', line['range'][1]))
             origin = float(key_positions.get(bound_left, 0.0))
@@ -1363,49 +1629,6 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                         tags=['count_line'],
                     )
 
-            # Problem solved: pre-filter notes once per line for later passes.
-            line_notes: list[dict] = []
-            for item in norm_notes:
-                n_t = float(item.get('time', 0.0) or 0.0)
-                n_end = float(item.get('end', 0.0) or 0.0)
-                p = int(item.get('pitch', 0) or 0)
-                if op_time.ge(n_t, float(line['time_end'])) or op_time.le(n_end, float(line['time_start'])):
-                    continue
-                if p < 1 or p > PIANO_KEY_AMOUNT:
-                    continue
-                line_notes.append(item)
-
-            # Grace notes: time-only, so check time window and key range.
-            line_grace: list[dict] = []
-            for item in norm_grace:
-                g_t = float(item.get('time', 0.0) or 0.0)
-                p = int(item.get('pitch', 0) or 0)
-                if op_time.lt(g_t, float(line['time_start'])) or op_time.ge(g_t, float(line['time_end'])):
-                    continue
-                if p < 1 or p > PIANO_KEY_AMOUNT:
-                    continue
-                line_grace.append(item)
-
-            line_slurs: list[dict] = []
-            if norm_slurs:
-                line_start = float(line.get('time_start', 0.0) or 0.0)
-                line_end = float(line.get('time_end', 0.0) or 0.0)
-                for sl in norm_slurs:
-                    anchor_t = float(sl.get('y1_time', 0.0) or 0.0)
-                    if op_time.lt(anchor_t, float(line_start)) or op_time.ge(anchor_t, float(line_end)):
-                        continue
-                    line_slurs.append(sl)
-
-            line_texts: list[dict] = []
-            if norm_texts:
-                line_start = float(line.get('time_start', 0.0) or 0.0)
-                line_end = float(line.get('time_end', 0.0) or 0.0)
-                for tx in norm_texts:
-                    t_time = float(tx.get('time', 0.0) or 0.0)
-                    if op_time.lt(t_time, float(line_start)) or op_time.ge(t_time, float(line_end)):
-                        continue
-                    line_texts.append(tx)
-
             notes_by_hand_line: dict[str, list[dict]] = {'l': [], 'r': []}
             for item in line_notes:
                 hk = str(item.get('hand', '<') or '<')
@@ -1423,13 +1646,16 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                 end_t = float(note_dict.get('end', 0.0) or 0.0)
                 return op_time.gt(float(line_start), start_t) and op_time.gt(end_t, float(line_start))
             
+            phase_t0 = timer.start()
             for hand_norm in ('r', 'l'):
                 notes_for_hand = notes_by_hand_line.get(hand_norm, [])
                 markers_for_hand = beam_by_hand.get(hand_norm, [])
                 groups, windows = _group_by_beam_markers(notes_for_hand, markers_for_hand, line_start, line_end)
                 beam_groups_by_hand[hand_norm] = (groups, windows)
+            timer.stop('beam_grouping', phase_t0)
 
             # Problem solved: measure numbers must avoid colliding with notes/beams.
+            phase_t0 = timer.start()
             mn_family, mn_size, mn_bold, mn_italic = _layout_font('measure_numbering_font', 'Edwin', 10.0)
             size_pt = mn_size * scale
             mm_per_pt = 25.4 / 72.0
@@ -1452,51 +1678,54 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                     x_max = x + max(w, stem_len_mm + beam_ext)
                 return (x_min, x_max)
 
+            # Problem solved: every measure queried all line notes; index the note
+            # spans (with their x extents) once per line instead.
+            note_spans = SpanIndex([
+                (float(it.get('time', 0.0) or 0.0), float(it.get('end', 0.0) or 0.0), _note_x_range(it))
+                for it in line_notes
+            ])
+            beam_spans: list[tuple[float, float, float]] = []
+            for hand_norm, payload in beam_groups_by_hand.items():
+                groups, windows = payload
+                for idx, grp in enumerate(groups):
+                    if not grp or idx >= len(windows):
+                        continue
+                    w0, w1 = windows[idx]
+                    highest = max(grp, key=lambda n: int(n.get('pitch', 0) or 0))
+                    base_x = _key_to_x(int(highest.get('pitch', 0) or 0))
+                    beam_spans.append((float(w0), float(w1), base_x + (stem_len_mm if hand_norm == 'r' else semitone_mm)))
+            beam_index = SpanIndex(beam_spans)
+            threshold = op_time.threshold
+
             def _right_extent(t0: float, t1: float) -> float:
                 max_x = grid_right
-                for it in line_notes:
-                    nt = float(it.get('time', 0.0) or 0.0)
-                    ne = float(it.get('end', 0.0) or 0.0)
+                for nt, ne, (_x0, x1) in note_spans.candidates(float(t0), float(t1)):
                     if op_time.ge(nt, float(t1)) or op_time.le(ne, float(t0)):
                         continue
-                    _x0, x1 = _note_x_range(it)
                     if x1 > max_x:
                         max_x = x1
                 return max_x
 
             def _beam_group_right_extent(t0: float) -> float | None:
                 max_x = None
-                for hand_norm, payload in beam_groups_by_hand.items():
-                    groups, windows = payload
-                    for idx, grp in enumerate(groups):
-                        if not grp or idx >= len(windows):
-                            continue
-                        w0, w1 = windows[idx]
-                        if op_time.ge(float(t0), float(w1)) or op_time.lt(float(t0), float(w0)):
-                            continue
-                        highest = max(grp, key=lambda n: int(n.get('pitch', 0) or 0))
-                        p = int(highest.get('pitch', 0) or 0)
-                        base_x = _key_to_x(p)
-                        if hand_norm == 'r':
-                            x = base_x + stem_len_mm
-                        else:
-                            x = base_x + semitone_mm
-                        if max_x is None or x > max_x:
-                            max_x = x
+                for w0, w1, x in beam_index.candidates(float(t0), float(t0) + 2.0 * threshold):
+                    if op_time.ge(float(t0), w1) or op_time.lt(float(t0), w0):
+                        continue
+                    if max_x is None or x > max_x:
+                        max_x = x
                 return max_x
 
             def _collides(x0: float, x1: float, t0: float, t1: float) -> bool:
-                for it in line_notes:
-                    nt = float(it.get('time', 0.0) or 0.0)
-                    ne = float(it.get('end', 0.0) or 0.0)
+                for nt, ne, (nx0, nx1) in note_spans.candidates(float(t0), float(t1)):
                     if op_time.ge(nt, float(t1)) or op_time.le(ne, float(t0)):
                         continue
-                    nx0, nx1 = _note_x_range(it)
                     if (nx1 >= x0) and (nx0 <= x1):
                         return True
                 return False
 
-            for mw in measure_windows:
+            first_mw = bisect.bisect_left(measure_ends, float(line['time_start']))
+            last_mw = bisect.bisect_right(measure_starts, float(line['time_end']))
+            for mw in measure_windows[first_mw:last_mw]:
                 m_start = float(mw.get('start', 0.0))
                 m_end = float(mw.get('end', 0.0))
                 if op_time.ge(m_start, float(line['time_end'])) or op_time.le(m_end, float(line['time_start'])):
@@ -1550,6 +1779,7 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                     bold=mn_bold,
                     italic=mn_italic,
                 )
+            timer.stop('measure_numbers', phase_t0)
 
             visible_keys = list(line.get('visible_keys', []))
             if not visible_keys:
@@ -1605,7 +1835,9 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                 for hand_norm in ('r', 'l'):
                     notes_for_hand = notes_by_hand_line.get(hand_norm, [])
                     markers_for_hand = beam_by_hand.get(hand_norm, [])
+                    phase_t0 = timer.start()
                     groups, windows = _group_by_beam_markers(notes_for_hand, markers_for_hand, line_start, line_end)
+                    timer.stop('beam_grouping', phase_t0)
                     for idx, grp in enumerate(groups):
                         if not grp:
                             continue
@@ -1729,6 +1961,7 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                         )
 
             # Problem solved: render notes after grid, using precomputed positions.
+            line_idx = {item['idx'] for item in line_notes}
             for item in line_notes:
                 n_t = float(item.get('time', 0.0) or 0.0)
                 n_end = float(item.get('end', 0.0) or 0.0)
@@ -1742,7 +1975,7 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                     y_start, y_end = y_end, y_start
                 w = semitone_mm
                 note_y = y_start
-                if p in BLACK_KEYS and _black_note_above_stem(item, black_rule, line_notes, op_time):
+                if p in BLACK_KEYS and _black_note_above_stem(item, black_rule, line_idx):
                     note_y = y_start - (w * 2.0)
                 # Problem solved: draw the note body with per-hand colors or overrides.
                 raw_color = n.get('color', None)
@@ -1962,10 +2195,8 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                 # Problem solved: draw a horizontal connector for same-time chords.
                 same_time = [
                     m
-                    for m in line_notes
-                    if str(m.get('hand', '<') or '<') == hand_key
-                    and op_time.eq(float(m.get('time', 0.0) or 0.0), n_t)
-                    and not _is_line_continuation(m)
+                    for m in _chord_neighbours(item, same_hand=True)
+                    if m['idx'] in line_idx and not _is_line_continuation(m)
                 ]
                 if len(same_time) >= 2:
                     lowest = min(same_time, key=lambda m: int(m.get('pitch', 0) or 0))
@@ -1985,7 +2216,7 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                         )
 
                 # Problem solved: stop sign marks a rest gap after a note.
-                if _has_followed_rest(item):
+                if rest_flags[int(item.get('idx', -1))]:
                     w_stop = w * 1.8
                     points = [
                         (x - w_stop / 2.0, y_end - w_stop),
@@ -2130,185 +2361,370 @@ def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = F
                             tags=['slur'],
                         )
 
+            if line_key is not None:
+                line_cache.put(line_key, du._pages[du._current_index].items[line_item_start:])
             x_cursor = x_cursor + float(line['total_width']) + gap
 
+    return EngraveLayout(page_w, page_h, len(pages), analysis_snapshot, _new_page, _draw_page, profile,
+                         score=score, pages=pages, headless_fonts=headless_fonts)
 
-    # Ensure a valid current page index
-    if du.page_count() > 0:
-        if pdf_export:
-            du.set_current_page(0)
-        else:
-            du.set_current_page(target_page_index)
 
+class EngraveLayout:
+    """Layout phase result for one score; draws pages on request.
 
-def _engrave_worker(score: dict, request_id: int, pageno: int, out_queue) -> None:
-    """Worker entry point to build DrawUtil in a separate process.
+    Problem solved: turning a page only needs the draw phase. Keeping the
+    layout lets a page be drawn without recomputing lines and pagination.
 
-    Problem solved: isolate heavy engraving work from the UI thread.
+    The draw functions are closures over the normalized score and cannot be
+    pickled; a pickled layout carries the score and its plain line/page
+    geometry (`pages`) instead. Unpickling rebuilds the per-note tables the
+    draw phase reads but not the lines and pages (see engrave_layout).
     """
-    local_du = DrawUtil()
-    do_engrave(score, local_du, pageno=pageno)
-    out_queue.put((int(request_id), local_du))
 
+    def __init__(self, page_w_mm: float, page_h_mm: float, page_count: int, analysis: Analysis,
+                 new_page: Callable, draw_page: Callable, profile: bool = False,
+                 score: dict | None = None, pages: list[list[dict]] | None = None,
+                 headless_fonts: bool = False) -> None:
+        self.page_w_mm = float(page_w_mm)
+        self.page_h_mm = float(page_h_mm)
+        self.page_count = int(page_count)
+        self.analysis = analysis
+        self.profile = bool(profile)
+        self.pages = pages
+        self.headless_fonts = bool(headless_fonts)
+        self._score = score
+        self._new_page = new_page
+        self._draw_page = draw_page
+
+    def __reduce__(self):
+        if self._score is None or self.pages is None:
+            raise TypeError("EngraveLayout without score and page geometry cannot be pickled")
+        return (_restore_layout, (self._score, self.pages, self.profile, self.headless_fonts))
+
+    def clamp_page(self, pageno) -> int:
+        try:
+            index = int(pageno)
+        except Exception:
+            index = 0
+        return max(0, min(self.page_count - 1, index))
+
+    @staticmethod
+    def _cancel_checker(cancel_check: Callable[[], bool] | None) -> Callable[[], None]:
+        def _check_cancel() -> None:
+            if cancel_check is not None and cancel_check():
+                raise EngraveCancelled()
+        return _check_cancel
+
+    def draw_page(self, du: DrawUtil, page_index: int, pdf_export: bool = False,
+                  cancel_check: Callable[[], bool] | None = None,
+                  line_cache: LineCache | None = None) -> dict[str, int]:
+        """Append page `page_index` to du and draw its content; returns line cache stats."""
+        stats = {'lines_reused': 0, 'lines_rebuilt': 0}
+        self._new_page(du, pdf_export)
+        self._draw_page(du, int(page_index), 0 if pdf_export else int(page_index),
+                        self._cancel_checker(cancel_check), line_cache, stats, PhaseTimer(False))
+        return stats
+
+    def render(self, du: DrawUtil, pageno: int = 0, pdf_export: bool = False,
+               cancel_check: Callable[[], bool] | None = None,
+               line_cache: LineCache | None = None) -> None:
+        """Fill du with all pages: every page for PDF export, otherwise only
+        page `pageno` gets content and the others just their paper edges."""
+        du._pages = []
+        du._current_index = -1
+        analysis = replace(self.analysis)
+        setattr(du, 'analysis', analysis)
+        target_page_index = 0 if pdf_export else self.clamp_page(pageno)
+        check_cancel = self._cancel_checker(cancel_check)
+        stats = {'lines_reused': 0, 'lines_rebuilt': 0}
+        timer = PhaseTimer(self.profile)
+        draw_t0 = timer.start()
+        for page_index in range(self.page_count):
+            self._new_page(du, pdf_export)
+            if pdf_export or page_index == target_page_index:
+                self._draw_page(du, page_index, pageno, check_cancel, line_cache, stats, timer)
+        timer.stop('draw', draw_t0)
+        analysis._lines_reused = stats['lines_reused']
+        analysis._lines_rebuilt = stats['lines_rebuilt']
+        if self.profile:
+            phase_ms = dict(self.analysis._phase_ms)
+            phase_ms.update(timer.ms)
+            # Drawing time not spent in the timed sub-phases: emitting primitives.
+            phase_ms['emission'] = max(0.0, phase_ms.get('draw', 0.0)
+                                       - phase_ms.get('beam_grouping', 0.0)
+                                       - phase_ms.get('measure_numbers', 0.0))
+            analysis._phase_ms = phase_ms
+            counts: dict[str, int] = {}
+            for page in du._pages:
+                for item in page.items:
+                    kind = type(item).__name__
+                    counts[kind] = counts.get(kind, 0) + 1
+            analysis._primitive_counts = counts
+        # Ensure a valid current page index
+        if du.page_count() > 0:
+            du.set_current_page(target_page_index)
 
-class Engraver(QtCore.QObject):
-    """Convenient engraver API ensuring single-run with latest-request semantics.
 
-    - Call engrave(score) to request an engraving.
-    - If one is running, stores the latest pending request and runs it next.
-    - Skips intermediate requests; never runs two tasks at the same time.
-    """
+def _restore_layout(score: dict, pages: list[list[dict]], profile: bool, headless_fonts: bool) -> EngraveLayout:
+    """Unpickle an EngraveLayout from its score and page geometry."""
+    return engrave_layout(score, profile=profile, headless_fonts=headless_fonts, page_geometry=pages)
 
-    engraved = QtCore.Signal()
-
-    def __init__(self, draw_util: DrawUtil, parent=None):
-        super().__init__(parent)
-        self._du = draw_util
-        self._mp_ctx = _MP_CONTEXT
-        self._result_queue = self._mp_ctx.Queue()
-        self._proc: mp.Process | None = None
-        self._poll_timer = QtCore.QTimer(self)
-        self._poll_timer.setInterval(50)
-        self._poll_timer.timeout.connect(self._poll_results)
-        self._running: bool = False
-        self._pending_score: dict | None = None
-        self._pending_pageno: int | None = None
-        self._pending_request_id: int | None = None
-        self._latest_request_id: int = 0
-        self._min_interval_ms: int = 500
-        self._last_start_ms: int = -500
-        self._elapsed = QtCore.QElapsedTimer()
-        self._elapsed.start()
-        self._delay_timer = QtCore.QTimer(self)
-        self._delay_timer.setSingleShot(True)
-        self._delay_timer.timeout.connect(self._maybe_start_pending)
-        self.analysis: Analysis | None = None
-
-    def engrave(self, score: dict, pageno: int | None = None) -> None:
-        """Request an engraving; coalesce to the most recent request.
-
-        Problem solved: avoid a backlog of obsolete renders during edits.
-        """
-        if pageno is None:
-            try:
-                pageno = int(self._du.current_page_index())
-            except Exception:
-                pageno = 0
-        self._latest_request_id += 1
-        req_id = int(self._latest_request_id)
-        # If currently running, just replace the pending request
-        if self._running:
-            self._pending_score = dict(score or {})
-            self._pending_pageno = int(pageno)
-            self._pending_request_id = req_id
-            return
-        self._pending_score = dict(score or {})
-        self._pending_pageno = int(pageno)
-        self._pending_request_id = req_id
-        self._maybe_start_pending()
 
-    def _maybe_start_pending(self) -> None:
-        """Start a pending request if throttling allows it.
+def do_engrave(score: SCORE, du: DrawUtil, pageno: int = 0, pdf_export: bool = False,
+               cancel_check: Callable[[], bool] | None = None,
+               line_cache: LineCache | None = None, profile: bool = False) -> None:
+    """Compute a full print layout and draw commands into DrawUtil.
 
-        Problem solved: rate-limit engraving so rapid edits do not spawn too
-        many processes.
-        """
-        if self._running:
-            return
-        if self._pending_score is None:
-            return
-        if self._pending_pageno is None:
-            return
-        if self._pending_request_id is None:
-            return
-        elapsed_ms = int(self._elapsed.elapsed())
-        since_last = elapsed_ms - int(self._last_start_ms)
-        if since_last >= self._min_interval_ms:
-            next_score = self._pending_score
-            next_pageno = int(self._pending_pageno)
-            next_req_id = int(self._pending_request_id)
-            self._pending_score = None
-            self._pending_pageno = None
-            self._pending_request_id = None
-            self._start_task(next_score, next_pageno, next_req_id)
+    Runs engrave_layout followed by EngraveLayout.render. cancel_check is
+    polled once per line; when it returns True the engrave stops with
+    EngraveCancelled and du must be considered incomplete. line_cache, when
+    given, is consulted per drawn line; reused and rebuilt line counts are
+    reported on the attached Analysis. profile=True adds phase timings
+    (_phase_ms) and primitive counts per type (_primitive_counts) to it.
+    """
+    engrave_layout(score, cancel_check, profile).render(du, pageno, pdf_export, cancel_check, line_cache)
+
+
+# Pages drawn ahead of a page turn, relative to the shown page and most
+# likely turn first. Page turns wrap around, so the offsets do too.
+_PREFETCH_OFFSETS: tuple[int, ...] = (1, -1, 2)
+
+
+def _prefetch_order(target: int, page_count: int) -> list[int]:
+    """Neighbours of page `target` in prefetch priority order."""
+    order: list[int] = []
+    for offset in _PREFETCH_OFFSETS:
+        neighbour = (int(target) + offset) % max(1, int(page_count))
+        if neighbour != target and neighbour not in order:
+            order.append(neighbour)
+    return order
+
+
+def _engrave_worker_loop(request_queue, result_queue, latest_request_id, cache_max_bytes: int = 0) -> None:
+    """Long-lived worker entry point serving engrave requests from a queue.
+
+    Problem solved: a fresh process per request pays interpreter start and
+    the full import chain every time. This loop stays warm, always engraves
+    only the newest queued request and aborts a running one cooperatively
+    once `latest_request_id` moves past it. A None request stops the loop.
+
+    Jobs are ('engrave', request_id, score, pageno) for a full layout plus
+    one drawn page, and ('page', request_id, layout_id, pageno) to draw one
+    page of the layout built by request `layout_id`. After either, the
+    neighbouring pages are prefetched while no newer job is waiting;
+    ('prefetch', request_id, layout_id, pageno) only does the latter, for a
+    page the UI already has. In an engrave job's score, an event list that
+    is None was not changed since the previous engrave job and is taken from
+    the events the worker already has; skipped jobs still update those.
+
+    Results travel as a packed shared-memory block (see draw_pack) instead
+    of a pickled DrawUtil; only its name and some metadata are queued. The
+    UI answers each delivered block with an ('ack', shm_name) control
+    message, after which the worker closes its handle.
+
+    ('cache', layout_id, key, document) is a control message, never
+    coalesced away: it names the engrave cache key (see engrave_cache) of
+    the layout built by request `layout_id`. The UI only sends it for the
+    states a document is opened or saved in, and the worker never hashes a
+    score itself. The drawn pages of a keyed layout are written to the
+    cache once the worker is idle and when it stops; cache_max_bytes=0
+    disables the cache.
+    """
+    # The receiver unlinks each block; keep every handle open until the UI
+    # acknowledges it has attached (Windows frees on last close), however
+    # many blocks one job and its prefetches emit before the UI polls.
+    sent_blocks: dict = {}
+    # Lives as long as the worker so unchanged lines survive between requests.
+    line_cache = LineCache()
+    current_layout: EngraveLayout | None = None
+    current_layout_id = -1
+    drawn_pages: set[int] = set()
+    cache = EngraveCache(max_bytes=cache_max_bytes)
+    # Cache key and document of the current layout, once the UI named them.
+    current_cache_key: str | None = None
+    current_document: str | None = None
+    # Pages of the current layout not yet written to the disk cache.
+    uncached_pages: dict = {}
+
+    def _store_in_cache() -> None:
+        if (not cache.enabled or not uncached_pages or current_layout is None
+                or current_cache_key is None):
             return
-        delay_ms = max(1, int(self._min_interval_ms - since_last))
-        if self._delay_timer.isActive():
-            self._delay_timer.stop()
-        self._delay_timer.start(delay_ms)
-
-    def _start_task(self, score: dict, pageno: int, request_id: int) -> None:
-        """Start a new process to engrave the given score.
+        cache.store_pages(current_cache_key, current_layout.page_count,
+                          (current_layout.page_w_mm, current_layout.page_h_mm), dict(uncached_pages),
+                          document=current_document)
+        uncached_pages.clear()
+
+    def _apply_control(job) -> bool:
+        """Handle a control message; returns False for None and real jobs."""
+        nonlocal current_cache_key, current_document
+        if job is None or job[0] not in ('cache', 'ack'):
+            return False
+        if job[0] == 'ack':
+            shm = sent_blocks.pop(job[1], None)
+            if shm is not None:
+                try:
+                    shm.close()
+                except Exception:
+                    pass
+            return True
+        _kind, layout_id, key, document = job
+        if int(layout_id) == current_layout_id:
+            current_cache_key = str(key)
+            current_document = document
+        return True
 
-        Problem solved: terminate stale workers before launching a new one.
-        """
-        self._running = True
-        self._last_start_ms = int(self._elapsed.elapsed())
-        if self._proc is not None:
-            if self._proc.is_alive():
-                self._proc.terminate()
-        self._proc = self._mp_ctx.Process(
-            target=_engrave_worker,
-            args=(score, request_id, pageno, self._result_queue),
-            daemon=True,
-        )
-        self._proc.start()
-        if not self._poll_timer.isActive():
-            self._poll_timer.start()
+    # A job read while looking past control messages; it is served next.
+    held_jobs: list = []
 
-    def _poll_results(self) -> None:
-        """Drain worker results and advance the queue.
+    def _no_job_waiting() -> bool:
+        """True when no job is queued; control messages read meanwhile are applied.
 
-        Problem solved: process can exit without a result; this keeps the
-        state machine moving and restarts pending work.
+        Acks arrive while the worker prefetches, so a plain empty() check
+        would stop every prefetch as soon as the UI attached a result.
         """
-        got_result = False
+        if held_jobs:
+            return False
         while True:
             try:
-                req_id, result_du = self._result_queue.get_nowait()
+                job = request_queue.get_nowait()
             except queue.Empty:
-                break
-            got_result = True
-            self._on_finished(req_id, result_du)
-
-        if self._proc is not None and not self._proc.is_alive():
-            self._proc.join(timeout=0)
-            self._proc = None
-            if self._running and not got_result:
-                self._running = False
-                if self._pending_score is not None:
-                    self._maybe_start_pending()
-            if not self._running:
-                self._poll_timer.stop()
-
-    def shutdown(self) -> None:
-        """Stop timers and terminate the worker process if it is still running.
-
-        Problem solved: prevent orphan processes on app shutdown.
-        """
-        if self._poll_timer.isActive():
-            self._poll_timer.stop()
-        if self._proc is not None:
-            if self._proc.is_alive():
-                self._proc.terminate()
-            self._proc.join(timeout=0.1)
-            self._proc = None
-
-    @QtCore.Slot(int, object)
-    def _on_finished(self, request_id: int, result_du: DrawUtil) -> None:
-        # Called on worker completion; schedule next or emit signal
-        self._running = False
-        if self._pending_score is not None:
-            # Grab and clear the latest pending, then run it
-            self._maybe_start_pending()
-            return
-        # No pending: notify listeners (e.g., to request render)
-        if int(request_id) == int(self._latest_request_id):
-            self._du._pages = list(result_du._pages)
-            self._du._current_index = int(result_du._current_index)
-            self.analysis = getattr(result_du, 'analysis', None)
+                return True
+            if not _apply_control(job):
+                held_jobs.append(job)
+                return False
+
+    def _stop() -> None:
+        _store_in_cache()
+        for shm in sent_blocks.values():
             try:
-                self._du.analysis = self.analysis
+                shm.close()
             except Exception:
                 pass
-            self.engraved.emit()
\ No newline at end of file
+
+    def _send_pages(request_id: int, pages: list, current_index: int, meta: dict) -> bool:
+        try:
+            shm = pack_to_shared_memory(pages, current_index)
+        except Exception:
+            traceback.print_exc()
+            return False
+        sent_blocks[shm.name] = shm
+        meta['shm_name'] = shm.name
+        result_queue.put((request_id, meta))
+        return True
+
+    def _draw_single(page_index: int, cancel_check) -> DrawUtil:
+        page_du = DrawUtil()
+        current_layout.draw_page(page_du, page_index, cancel_check=cancel_check, line_cache=line_cache)
+        return page_du
+
+    # Event lists of the last engrave job; later jobs only carry changed lists.
+    known_events: dict = {}
+
+    def _resolve_events(job):
+        if job is None or job[0] != 'engrave':
+            return job
+        kind, rid, score, pageno = job
+        events = dict((score or {}).get('events', {}) or {})
+        for name, items in events.items():
+            if items is None:
+                events[name] = known_events.get(name, [])
+        known_events.clear()
+        known_events.update(events)
+        return (kind, rid, dict(score or {}, events=events), pageno)
+
+    while True:
+        job = held_jobs.pop(0) if held_jobs else request_queue.get()
+        if _apply_control(job):
+            if _no_job_waiting():
+                _store_in_cache()
+            continue
+        job = _resolve_events(job)
+        if job is None:
+            _stop()
+            return
+        # Problem solved: requests queued while busy are obsolete except the last.
+        while True:
+            try:
+                newer = held_jobs.pop(0) if held_jobs else request_queue.get_nowait()
+            except queue.Empty:
+                break
+            if _apply_control(newer):
+                continue
+            newer = _resolve_events(newer)
+            if newer is None:
+                _stop()
+                return
+            job = newer
+        kind = job[0]
+        request_id = int(job[1])
+
+        def _is_stale() -> bool:
+            return int(latest_request_id.value) > request_id
+
+        sent = False
+        try:
+            if kind == 'engrave':
+                _kind, _rid, score, pageno = job
+                layout = engrave_layout(score, cancel_check=_is_stale, profile=True)
+                local_du = DrawUtil()
+                layout.render(local_du, pageno=pageno, cancel_check=_is_stale, line_cache=line_cache)
+                current_layout = layout
+                current_layout_id = request_id
+                target = layout.clamp_page(pageno)
+                drawn_pages = {target}
+                current_cache_key = None
+                current_document = None
+                uncached_pages.clear()
+                uncached_pages[target] = local_du._pages[target]
+                sent = _send_pages(request_id, local_du._pages, local_du._current_index, {
+                    'kind': 'engrave',
+                    'layout_id': request_id,
+                    'analysis': getattr(local_du, 'analysis', None),
+                })
+            elif current_layout is not None and int(job[2]) == current_layout_id:
+                target = current_layout.clamp_page(job[3])
+                if kind == 'prefetch':
+                    sent = True
+                else:
+                    page_du = _draw_single(target, _is_stale)
+                    drawn_pages.add(target)
+                    uncached_pages[target] = page_du._pages[0]
+                    sent = _send_pages(request_id, page_du._pages, 0, {
+                        'kind': 'page',
+                        'layout_id': current_layout_id,
+                        'page_index': target,
+                    })
+            # Otherwise the layout is gone (e.g. worker restarted); the UI re-engraves.
+        except EngraveCancelled:
+            pass
+        except Exception:
+            traceback.print_exc()
+        if not sent:
+            result_queue.put((request_id, None))
+        else:
+            # Problem solved: neighbours are likely the next page turn; draw
+            # them while idle so the turn needs no engrave round trip.
+            for neighbour in _prefetch_order(target, current_layout.page_count):
+                if _is_stale() or not _no_job_waiting():
+                    break
+                if neighbour in drawn_pages:
+                    continue
+                try:
+                    page_du = _draw_single(neighbour, _is_stale)
+                except EngraveCancelled:
+                    break
+                except Exception:
+                    traceback.print_exc()
+                    break
+                drawn_pages.add(neighbour)
+                uncached_pages[neighbour] = page_du._pages[0]
+                _send_pages(request_id, page_du._pages, 0, {
+                    'kind': 'prefetch',
+                    'layout_id': current_layout_id,
+                    'page_index': neighbour,
+                })
+        if not _is_stale() and _no_job_waiting():
+            _store_in_cache()
+        # Lets the UI stop polling once nothing more is coming for this job.
+        result_queue.put((request_id, {'kind': 'idle'}))
@@ -0,0 +1,612 @@
+from PySide6 import QtCore
+import multiprocessing as mp
+import queue
+import traceback
+from ui.widgets.draw_util import DrawUtil
+from ui.widgets.draw_pack import PackedDocument
+from file_model.analysis import Analysis
+from engraver.engraver import _MP_CONTEXT, _engrave_worker_loop, _prefetch_order
+from engraver.engrave_cache import EngraveCache, cache_relevant_content, score_cache_key
+
+# Adaptive throttling: the coalescing interval follows the measured engrave
+# cost of the score being edited (see Engraver._throttle_interval_ms).
+_FAST_ENGRAVE_MS: float = 50.0
+_INITIAL_INTERVAL_MS: int = 200
+_MIN_INTERVAL_MS: int = 50
+_MAX_INTERVAL_MS: int = 2000
+_COST_SMOOTHING: float = 0.3
+
+
+class CacheKeyEmitter(QtCore.QObject):
+    # (token, cache key, document, cache hit or None)
+    done = QtCore.Signal(int, str, object, object)
+
+
+class CacheKeyTask(QtCore.QRunnable):
+    """Hash a score for the engrave cache off the UI thread, optionally loading its entry."""
+
+    def __init__(self, cache: EngraveCache, score: dict, pageno: int, load: bool,
+                 token: int, emitter: CacheKeyEmitter):
+        super().__init__()
+        self.setAutoDelete(True)
+        self._cache = cache
+        self._score = score
+        self._pageno = int(pageno)
+        self._load = bool(load)
+        self._token = int(token)
+        self._emitter = emitter
+
+    def run(self) -> None:
+        try:
+            key = score_cache_key(self._score)
+            hit = self._cache.load(key, self._pageno) if self._load else None
+        except Exception:
+            traceback.print_exc()
+            return
+        try:
+            self._emitter.done.emit(self._token, key, _cost_key(self._score) or None, hit)
+        except RuntimeError:
+            # Emitter already deleted; ignore
+            pass
+
+
+class Engraver(QtCore.QObject):
+    """Convenient engraver API ensuring single-run with latest-request semantics.
+
+    - Call engrave(score) to request an engraving.
+    - If one is running, stores the latest pending request and runs it next;
+      the running one is told to stop early because its result is obsolete.
+    - Skips intermediate requests; never runs two tasks at the same time.
+    - Engraving runs in one persistent worker process that is only restarted
+      when it dies.
+    - Call request_page(pageno) for page turns: pages of the current layout
+      are drawn on demand (and neighbours prefetched) without re-engraving.
+    - Call show_cached(score) after opening a score to show pages from the
+      on-disk engrave cache until the fresh engrave arrives, and
+      cache_saved(score) after saving it; only these states are cached.
+    """
+
+    engraved = QtCore.Signal()
+
+    def __init__(self, draw_util: DrawUtil, parent=None):
+        super().__init__(parent)
+        self._du = draw_util
+        self._mp_ctx = _MP_CONTEXT
+        self._request_queue = None
+        self._result_queue = None
+        # Shared with the worker so it can notice stale work without a round trip.
+        self._latest_shared = self._mp_ctx.Value('q', 0)
+        self._proc: mp.Process | None = None
+        self._in_flight_request_id: int | None = None
+        self._poll_timer = QtCore.QTimer(self)
+        self._poll_timer.setInterval(50)
+        self._poll_timer.timeout.connect(self._poll_results)
+        self._running: bool = False
+        self._pending_score: dict | None = None
+        self._pending_pageno: int | None = None
+        self._pending_request_id: int | None = None
+        self._latest_request_id: int = 0
+        # Chosen by _throttle_interval_ms from the measured engrave cost.
+        self._min_interval_ms: int = _INITIAL_INTERVAL_MS
+        self._last_start_ms: int = -_MAX_INTERVAL_MS
+        self._last_request_ms: int = -_MAX_INTERVAL_MS
+        self._continuous_edit: bool = False
+        self._throttle_mode: str = 'initial'
+        # Moving average of engrave durations (ms) per score.
+        self._cost_ms: dict[str, float] = {}
+        self._score_key: str = ''
+        self._in_flight_score_key: str = ''
+        self._elapsed = QtCore.QElapsedTimer()
+        self._elapsed.start()
+        self._delay_timer = QtCore.QTimer(self)
+        self._delay_timer.setSingleShot(True)
+        self._delay_timer.timeout.connect(self._maybe_start_pending)
+        self.analysis: Analysis | None = None
+        self._in_flight_kind: str | None = None
+        # Worker may still send prefetched pages after the main result.
+        self._worker_busy: bool = False
+        self._last_sent_request_id: int = 0
+        # Layout currently shown in the DrawUtil (request id of its engrave)
+        # and which of its pages already carry content.
+        self._layout_id: int | None = None
+        self._drawn_pages: set[int] = set()
+        self._wanted_page: int = 0
+        self._last_score: dict | None = None
+        # Event lists of the last engrave job sent to the worker, by name.
+        self._sent_events: dict[str, list] = {}
+        self._cache = EngraveCache(max_bytes=_cache_max_bytes())
+        self._cache_emitter = CacheKeyEmitter()
+        self._cache_emitter.done.connect(self._on_cache_key)
+        self._cache_token: int = 0
+        self._cache_score: dict | None = None
+        # Cached pages may be shown until the first fresh engrave arrives.
+        self._cache_show_allowed: bool = False
+        # (key, document, score, request id floor) waiting for a layout of that content.
+        self._keyed: tuple | None = None
+        # Score of the engrave in flight and of the layout shown.
+        self._in_flight_score: dict | None = None
+        self._layout_score: dict | None = None
+        # Start the worker now so its startup overlaps with app startup.
+        try:
+            self._ensure_worker()
+        except Exception:
+            traceback.print_exc()
+
+    def engrave(self, score: dict, pageno: int | None = None) -> None:
+        """Request an engraving; coalesce to the most recent request.
+
+        Problem solved: avoid a backlog of obsolete renders during edits.
+        """
+        if pageno is None:
+            try:
+                pageno = int(self._du.current_page_index())
+            except Exception:
+                pageno = 0
+        self._latest_request_id += 1
+        req_id = int(self._latest_request_id)
+        self._latest_shared.value = req_id
+        self._wanted_page = int(pageno)
+        self._last_score = score
+        self._score_key = _cost_key(score)
+        now_ms = int(self._elapsed.elapsed())
+        # Requests closer together than one interval come from a drag,
+        # transpose or other continuous edit.
+        self._continuous_edit = now_ms - self._last_request_ms < self._throttle_interval_ms()
+        self._last_request_ms = now_ms
+        # If currently running, just replace the pending request
+        if self._running:
+            self._pending_score = dict(score or {})
+            self._pending_pageno = int(pageno)
+            self._pending_request_id = req_id
+            return
+        self._pending_score = dict(score or {})
+        self._pending_pageno = int(pageno)
+        self._pending_request_id = req_id
+        self._maybe_start_pending()
+
+    def show_cached(self, score: dict, pageno: int = 0) -> bool:
+        """Look up the cached engraving of `score` and show it on a hit.
+
+        Problem solved: reopening a large score showed nothing until a full
+        engrave finished. The cached pages are displayed as soon as the
+        lookup is done, unless a fresh engrave arrived first; callers still
+        request engrave() so a fresh result replaces them. The cached pages
+        do not count as a layout, so page turns engrave until then.
+
+        The score is hashed once here, off the UI thread, and the key is
+        handed to the worker with the layout of the opened score. Returns
+        False when the cache is disabled.
+        """
+        if not self._cache.enabled:
+            return False
+        self._cache_show_allowed = True
+        self._start_cache_key(score, pageno, load=True)
+        return True
+
+    def cache_saved(self, score: dict) -> None:
+        """Have the engraving of a just saved `score` written to the engrave cache."""
+        if self._cache.enabled:
+            self._start_cache_key(score, 0, load=False)
+
+    def _start_cache_key(self, score: dict, pageno: int, load: bool) -> None:
+        self._cache_token += 1
+        self._cache_score = score
+        self._keyed = None
+        QtCore.QThreadPool.globalInstance().start(CacheKeyTask(
+            self._cache, score, pageno, load, self._cache_token, self._cache_emitter))
+
+    @QtCore.Slot(int, str, object, object)
+    def _on_cache_key(self, token: int, key: str, document, hit) -> None:
+        if int(token) != self._cache_token:
+            return
+        self._keyed = (key, document, self._cache_score, int(self._latest_request_id))
+        self._offer_cache_key()
+        if hit is None or not self._cache_show_allowed:
+            return
+        self._cache_show_allowed = False
+        pages, current_index, drawn = hit
+        self._du._pages = pages
+        self._du._current_index = int(current_index)
+        self._layout_id = None
+        self._layout_score = None
+        self._drawn_pages = set(drawn)
+        self._wanted_page = int(current_index)
+        self.engraved.emit()
+
+    def _offer_cache_key(self) -> None:
+        """Name the cache key of the shown layout to the worker if it has the keyed content.
+
+        A layout requested after the key was computed but with other content
+        means the score was edited meanwhile; the key is dropped then.
+        """
+        if self._keyed is None or self._layout_id is None or self._layout_score is None:
+            return
+        key, document, score, floor = self._keyed
+        try:
+            same = cache_relevant_content(score) == cache_relevant_content(self._layout_score)
+        except Exception:
+            same = False
+        if same:
+            self._keyed = None
+            self._ensure_worker()
+            self._request_queue.put(('cache', int(self._layout_id), key, document))
+        elif int(self._layout_id) > floor:
+            self._keyed = None
+
+    def _maybe_start_pending(self) -> None:
+        """Start a pending request if throttling allows it.
+
+        Problem solved: rate-limit engraving so rapid edits do not flood the
+        worker with requests that are obsolete before they finish.
+        """
+        if self._running:
+            return
+        if self._pending_score is None:
+            return
+        if self._pending_pageno is None:
+            return
+        if self._pending_request_id is None:
+            return
+        interval = self._throttle_interval_ms()
+        self._min_interval_ms = interval
+        elapsed_ms = int(self._elapsed.elapsed())
+        since_last = elapsed_ms - int(self._last_start_ms)
+        wait_ms = interval - since_last
+        if self._continuous_edit and interval > 0:
+            # Defer to idle: an engrave started mid-drag is cancelled by the
+            # next request anyway, so wait until the edit pauses for one interval.
+            self._throttle_mode = 'idle'
+            wait_ms = max(wait_ms, interval - (elapsed_ms - self._last_request_ms))
+        if wait_ms <= 0:
+            next_score = self._pending_score
+            next_pageno = int(self._pending_pageno)
+            next_req_id = int(self._pending_request_id)
+            self._pending_score = None
+            self._pending_pageno = None
+            self._pending_request_id = None
+            self._start_task(next_score, next_pageno, next_req_id)
+            return
+        delay_ms = max(1, int(wait_ms))
+        if self._delay_timer.isActive():
+            self._delay_timer.stop()
+        self._delay_timer.start(delay_ms)
+
+    def _throttle_interval_ms(self) -> int:
+        """Coalescing interval for the score being edited.
+
+        Problem solved: a fixed 500 ms made small scores feel sluggish while
+        huge scores still queued back-to-back engraves. Scores that engrave
+        in under 50 ms run right away; otherwise the interval is 1.5x the
+        moving average cost, so the worker is busy at most about two thirds
+        of the time during edits.
+        """
+        cost = self._cost_ms.get(self._score_key)
+        if cost is None:
+            self._throttle_mode = 'initial'
+            return _INITIAL_INTERVAL_MS
+        if cost < _FAST_ENGRAVE_MS:
+            self._throttle_mode = 'fast'
+            return 0
+        self._throttle_mode = 'adaptive'
+        return int(max(_MIN_INTERVAL_MS, min(_MAX_INTERVAL_MS, cost * 1.5)))
+
+    def _record_cost(self, score_key: str, duration_ms: float) -> None:
+        previous = self._cost_ms.get(score_key)
+        if previous is None:
+            self._cost_ms[score_key] = float(duration_ms)
+        else:
+            self._cost_ms[score_key] = previous + _COST_SMOOTHING * (float(duration_ms) - previous)
+
+    def throttle_status(self) -> dict:
+        """Current throttling state for debug displays."""
+        cost = self._cost_ms.get(self._score_key)
+        return {
+            'interval_ms': int(self._min_interval_ms),
+            'avg_engrave_ms': None if cost is None else float(cost),
+            'mode': self._throttle_mode,
+        }
+
+    def _ensure_worker(self) -> None:
+        """Start the persistent worker process if it is not running.
+
+        Problem solved: a crashed worker may leave its queues in an unknown
+        state, so a restart always comes with fresh queues.
+        """
+        if self._proc is not None and self._proc.is_alive():
+            return
+        if self._proc is not None:
+            self._proc.join(timeout=0)
+            self._proc = None
+        self._request_queue = self._mp_ctx.Queue()
+        self._result_queue = self._mp_ctx.Queue()
+        # A new worker knows no event lists yet.
+        self._sent_events = {}
+        self._proc = self._mp_ctx.Process(
+            target=_engrave_worker_loop,
+            args=(self._request_queue, self._result_queue, self._latest_shared, self._cache.max_bytes),
+            daemon=True,
+        )
+        self._proc.start()
+
+    def request_page(self, pageno: int) -> bool:
+        """Show page `pageno` of the current layout, drawing it on demand.
+
+        Problem solved: a page turn used to re-engrave the whole score. A page
+        that is already drawn is announced right away; otherwise only the draw
+        phase runs in the worker. Either way the pages around it are then
+        prefetched in the background so the next turn is instant.
+
+        While an engrave is pending or running, the turn only retargets it:
+        the visible page is drawn first once the layout exists. Returns False
+        when there is no usable layout (nothing engraved yet); callers then
+        fall back to engrave().
+        """
+        pageno = int(pageno)
+        if self._pending_score is not None:
+            self._pending_pageno = pageno
+            self._wanted_page = pageno
+            return True
+        if self._running and self._in_flight_kind == 'engrave':
+            self._wanted_page = pageno
+            return True
+        if self._layout_id is None:
+            return False
+        if not (0 <= pageno < self._du.page_count()):
+            return False
+        self._wanted_page = pageno
+        if pageno in self._drawn_pages:
+            self.engraved.emit()
+            self._prefetch_around(pageno)
+            return True
+        self._request_page_draw(pageno)
+        return True
+
+    def _request_page_draw(self, pageno: int) -> None:
+        self._latest_request_id += 1
+        req_id = int(self._latest_request_id)
+        # Also cancels a page draw or prefetch still running in the worker.
+        self._latest_shared.value = req_id
+        self._send_job(('page', req_id, int(self._layout_id), int(pageno)), 'page')
+
+    def _prefetch_around(self, pageno: int) -> None:
+        """Have the worker draw the undrawn neighbours of a shown page.
+
+        Problem solved: neighbours were only prefetched after a worker job,
+        so after turning to a prefetched page the following turn waited for
+        a draw again. The prefetch is background work: it does not block
+        engrave requests, and any newer request preempts it.
+        """
+        if self._layout_id is None or self._running:
+            return
+        if all(p in self._drawn_pages for p in _prefetch_order(pageno, self._du.page_count())):
+            return
+        self._latest_request_id += 1
+        req_id = int(self._latest_request_id)
+        self._latest_shared.value = req_id
+        self._ensure_worker()
+        self._worker_busy = True
+        self._last_sent_request_id = req_id
+        self._request_queue.put(('prefetch', req_id, int(self._layout_id), int(pageno)))
+        if not self._poll_timer.isActive():
+            self._poll_timer.start()
+
+    def _send_job(self, job: tuple, kind: str) -> None:
+        self._running = True
+        self._ensure_worker()
+        self._in_flight_request_id = int(job[1])
+        self._in_flight_kind = kind
+        self._worker_busy = True
+        self._last_sent_request_id = int(job[1])
+        self._request_queue.put(job)
+        # Results of fast scores would otherwise mostly wait for the poll.
+        self._poll_timer.setInterval(10 if self._throttle_mode == 'fast' else 50)
+        if not self._poll_timer.isActive():
+            self._poll_timer.start()
+
+    def _start_task(self, score: dict, pageno: int, request_id: int) -> None:
+        """Hand a request to the persistent worker process.
+
+        Problem solved: reuse the warm worker instead of spawning per request.
+        """
+        self._last_start_ms = int(self._elapsed.elapsed())
+        self._in_flight_score_key = self._score_key
+        self._in_flight_score = score
+        self._ensure_worker()
+        self._send_job(('engrave', int(request_id), self._events_delta(score), int(pageno)), 'engrave')
+
+    def _events_delta(self, score: dict) -> dict:
+        """Copy of score whose unchanged event lists are replaced by None.
+
+        Problem solved: pickling every event to the worker on each request
+        costs as much as building them. SCORE.get_dict() returns unchanged
+        event lists as the same objects, so an identity check against the
+        last sent lists finds what the worker already has.
+        """
+        events = score.get('events') if isinstance(score, dict) else None
+        if not isinstance(events, dict):
+            self._sent_events = {}
+            return score
+        delta = {name: (None if self._sent_events.get(name) is items else items)
+                 for name, items in events.items()}
+        self._sent_events = dict(events)
+        return dict(score, events=delta)
+
+    def _poll_results(self) -> None:
+        """Drain worker results and advance the queue.
+
+        Problem solved: the worker can die without a result; restart it and
+        keep the state machine moving so pending work still runs.
+        """
+        got_result = False
+        while self._result_queue is not None:
+            try:
+                req_id, result = self._result_queue.get_nowait()
+            except queue.Empty:
+                break
+            got_result = True
+            self._on_finished(req_id, result)
+
+        if self._proc is not None and not self._proc.is_alive():
+            self._proc.join(timeout=0)
+            self._proc = None
+            # A restarted worker has no layout to draw further pages from.
+            self._layout_id = None
+            self._worker_busy = False
+            if self._running and not got_result:
+                # The crashed request is not retried; it would likely crash again.
+                self._running = False
+                self._in_flight_request_id = None
+                self._in_flight_kind = None
+                self._ensure_worker()
+                if self._pending_score is not None:
+                    self._maybe_start_pending()
+        if not self._running and not self._worker_busy:
+            self._poll_timer.stop()
+
+    def shutdown(self) -> None:
+        """Stop timers and ask the worker process to exit, terminating it if needed.
+
+        Problem solved: prevent orphan processes on app shutdown.
+        """
+        if self._poll_timer.isActive():
+            self._poll_timer.stop()
+        if self._delay_timer.isActive():
+            self._delay_timer.stop()
+        if self._proc is not None:
+            if self._proc.is_alive():
+                try:
+                    self._latest_shared.value = int(self._latest_request_id) + 1
+                    self._request_queue.put(None)
+                except Exception:
+                    pass
+                self._proc.join(timeout=0.5)
+            if self._proc.is_alive():
+                self._proc.terminate()
+                self._proc.join(timeout=0.1)
+            self._proc = None
+
+    @QtCore.Slot(int, object)
+    def _on_finished(self, request_id: int, result: dict | None) -> None:
+        # Called on worker completion; schedule next or emit signal
+        request_id = int(request_id)
+        kind = result.get('kind') if result is not None else None
+        if kind == 'idle':
+            if request_id == self._last_sent_request_id:
+                self._worker_busy = False
+            return
+        in_flight_kind = None
+        if self._in_flight_request_id is not None and request_id == int(self._in_flight_request_id):
+            in_flight_kind = self._in_flight_kind
+            if in_flight_kind == 'engrave' and result is not None:
+                self._record_cost(self._in_flight_score_key, _engrave_cost_ms(
+                    result, int(self._elapsed.elapsed()) - int(self._last_start_ms)))
+            self._running = False
+            self._in_flight_request_id = None
+            self._in_flight_kind = None
+        # Attach every delivered block, stale or not, so it gets unlinked;
+        # the ack lets the worker close its handle.
+        doc: PackedDocument | None = None
+        if result is not None:
+            try:
+                doc = PackedDocument.attach_shared(result['shm_name'])
+            except Exception:
+                traceback.print_exc()
+                doc = None
+            self._ack_block(result.get('shm_name'))
+        if kind in ('page', 'prefetch'):
+            installed = doc is not None and self._install_page(doc, result)
+            if (kind == 'page' and installed and request_id == int(self._latest_request_id)
+                    and int(result.get('page_index', -1)) == self._wanted_page):
+                self.engraved.emit()
+            if self._pending_score is not None:
+                self._maybe_start_pending()
+            return
+        if self._pending_score is not None:
+            if doc is not None:
+                doc.close()
+            # Grab and clear the latest pending, then run it
+            self._maybe_start_pending()
+            return
+        # A None result means the request was cancelled or failed.
+        if doc is None:
+            if in_flight_kind == 'page' and request_id == int(self._latest_request_id):
+                # The worker lost the layout (e.g. it restarted); engrave again.
+                self._layout_id = None
+                if self._last_score is not None:
+                    self.engrave(self._last_score, self._wanted_page)
+            return
+        # No pending: notify listeners (e.g., to request render)
+        if request_id == int(self._latest_request_id):
+            self._du._pages = list(doc.pages)
+            self._du._current_index = int(doc.current_index)
+            self._layout_id = int(result.get('layout_id', request_id))
+            self._layout_score = self._in_flight_score
+            self._cache_show_allowed = False
+            self._drawn_pages = {int(doc.current_index)}
+            self.analysis = result.get('analysis')
+            try:
+                self._du.analysis = self.analysis
+            except Exception:
+                pass
+            self._offer_cache_key()
+            wanted = max(0, min(len(doc.pages) - 1, int(self._wanted_page)))
+            if wanted != int(doc.current_index):
+                # The page was turned during the engrave: draw the visible
+                # page before announcing the new layout.
+                self._wanted_page = wanted
+                self._du._current_index = wanted
+                self._request_page_draw(wanted)
+                return
+            self.engraved.emit()
+        else:
+            doc.close()
+
+    def _ack_block(self, shm_name) -> None:
+        """Tell the worker a result block is attached so it can close its handle."""
+        if shm_name is None or self._request_queue is None:
+            return
+        try:
+            self._request_queue.put(('ack', shm_name))
+        except Exception:
+            pass
+
+    def _install_page(self, doc: PackedDocument, result: dict) -> bool:
+        """Swap a single drawn page into the DrawUtil if it belongs to the shown layout."""
+        page_index = int(result.get('page_index', -1))
+        if (self._layout_id is None or int(result.get('layout_id', -1)) != int(self._layout_id)
+                or not doc.pages or not (0 <= page_index < len(self._du._pages))):
+            doc.close()
+            return False
+        self._du._pages[page_index] = doc.pages[0]
+        self._drawn_pages.add(page_index)
+        return True
+
+
+def _cost_key(score: dict) -> str:
+    """Cheap identity of a score for the engrave cost average."""
+    try:
+        return str((score.get('meta_data', {}) or {}).get('creation_timestamp', '') or '')
+    except Exception:
+        return ''
+
+
+def _engrave_cost_ms(result: dict, wall_ms: float) -> float:
+    """Worker time of an engrave from its phase timings.
+
+    The wall-clock round trip includes queue polling and process startup,
+    which would hide a fast score behind a constant overhead; it is only
+    used when the result carries no timings.
+    """
+    phase_ms = getattr(result.get('analysis'), '_phase_ms', None) or {}
+    if 'draw' not in phase_ms:
+        return float(wall_ms)
+    return float(sum(phase_ms.get(k, 0.0) for k in ('normalize', 'line_building', 'page_packing', 'draw')))
+
+
+def _cache_max_bytes() -> int:
+    """Size limit of the on-disk engrave cache from the preferences."""
+    try:
+        from settings_manager import get_preferences
+        return max(0, int(float(get_preferences().get('engrave_cache_max_mb', 256)) * 1024 * 1024))
+    except Exception:
+        return 0
@@ -0,0 +1,128 @@
+import multiprocessing as mp
+import os
+import pickle
+from typing import Callable, Sequence
+
+from engraver.engraver import _MP_CONTEXT, EngraveCancelled, engrave_layout
+from ui.widgets.draw_compact import CompactDrawUtil
+from ui.widgets.draw_pack import PackedDocument, pack_pages
+from ui.widgets.draw_util import DrawUtil, PdfPageWriter
+from utils.CONSTANT import ENGRAVER_LAYERING
+
+# Layout unpickled once per pool worker by _init_export_worker, or why it failed.
+_EXPORT_LAYOUT = None
+_EXPORT_LAYOUT_ERROR: str = ''
+# Seconds between cancel checks while waiting for a worker's page.
+_POLL_S = 0.1
+
+
+def _init_export_worker(layout_data: bytes) -> None:
+    """Pool initializer: unpickle the layout built by export_pdf.
+
+    The layout arrives as bytes and is unpickled here rather than by the
+    process bootstrap, so this never raises: the Pool would respawn a
+    worker whose initializer failed without end. The error is reported by
+    the first page task instead.
+    """
+    global _EXPORT_LAYOUT, _EXPORT_LAYOUT_ERROR
+    try:
+        _EXPORT_LAYOUT = pickle.loads(layout_data)
+    except Exception as e:
+        _EXPORT_LAYOUT = None
+        _EXPORT_LAYOUT_ERROR = str(e) or type(e).__name__
+
+
+def _draw_export_page(page_index: int) -> bytes:
+    """Draw one PDF page in a pool worker and return it packed.
+
+    A compact page already has the packed layout, so packing is a copy.
+    """
+    if _EXPORT_LAYOUT is None:
+        raise RuntimeError(f"Layout failed in export worker: {_EXPORT_LAYOUT_ERROR}")
+    du = CompactDrawUtil()
+    _EXPORT_LAYOUT.draw_page(du, page_index, pdf_export=True)
+    return pack_pages(du._pages)
+
+
+def export_pdf(score: dict, path: str, layering: Sequence[str] | None = None,
+               progress_cb: Callable[[int, int], None] | None = None,
+               cancel_check: Callable[[], bool] | None = None,
+               processes: int | None = None) -> int:
+    """Engrave `score` and write it to `path` as one PDF; returns the page count.
+
+    Problem solved: a long score was engraved and drawn page by page on the
+    UI thread. Pages are now drawn by a pool of processes and streamed into
+    the PDF in page order as they arrive. progress_cb(done, total) is called
+    after each written page. When cancel_check returns True the pool is
+    stopped, the partial file is removed and EngraveCancelled is raised.
+
+    The layout runs once here first, so layout errors surface directly and
+    the pool is never larger than the page count; a single page (or
+    processes=1) is drawn in this process. Fonts are always resolved
+    without the font registry (see engrave_layout), so the PDF does not
+    depend on the thread or process count it was drawn with.
+    """
+    if layering is None:
+        layering = ENGRAVER_LAYERING
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, int(processes))
+
+    def _check_cancel() -> None:
+        if cancel_check is not None and cancel_check():
+            raise EngraveCancelled()
+
+    layout = engrave_layout(score, cancel_check, headless_fonts=True)
+    total = int(layout.page_count)
+    processes = min(processes, max(1, total))
+
+    writer = PdfPageWriter(DrawUtil(), path, layering)
+    pool = None
+    try:
+        if processes == 1:
+            def _pages():
+                for page_index in range(total):
+                    du = CompactDrawUtil()
+                    layout.draw_page(du, page_index, pdf_export=True, cancel_check=cancel_check)
+                    yield du._pages[0]
+        else:
+            # Workers get the layout with its line and page geometry and only
+            # draw pages; line building and pagination are not repeated.
+            pool = _MP_CONTEXT.Pool(processes, initializer=_init_export_worker,
+                                    initargs=(pickle.dumps(layout),))
+
+            def _pages():
+                results = pool.imap(_draw_export_page, range(total))
+                for _page_index in range(total):
+                    while True:
+                        _check_cancel()
+                        try:
+                            data = results.next(timeout=_POLL_S)
+                            break
+                        except mp.TimeoutError:
+                            continue
+                    yield PackedDocument.from_bytes(data).pages[0]
+
+        for page_index, page in enumerate(_pages()):
+            _check_cancel()
+            writer.add_page(page)
+            if progress_cb is not None:
+                try:
+                    progress_cb(page_index + 1, total)
+                except Exception:
+                    pass
+        writer.close()
+        return writer.page_count
+    except BaseException:
+        started = writer.page_count > 0
+        writer.close()
+        try:
+            if started and os.path.exists(path):
+                os.remove(path)
+        except Exception:
+            pass
+        raise
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
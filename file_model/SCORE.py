@@ -19,6 +19,7 @@ from file_model.events.end_repeat import EndRepeat
 from file_model.events.count_line import CountLine
 from file_model.events.line_break import LineBreak
 from file_model.events.tempo import Tempo
+from file_model.events.tracked import write_count
 from file_model.layout import Layout, LayoutFont
 from file_model.info import Info
 from file_model.analysis import Analysis
@@ -47,6 +48,24 @@ class MetaData:
 	modification_timestamp: str = ''
 
 
+def _to_dict(obj):
+	"""Recursive dataclass to plain dict/list conversion; skips private fields."""
+	if isinstance(obj, list):
+		return [_to_dict(x) for x in obj]
+	if hasattr(obj, "__dataclass_fields__"):
+		out = {}
+		for k in obj.__dataclass_fields__.keys():
+			# Skip private/internal fields like _next_id
+			if k.startswith('_'):
+				continue
+			out[k] = _to_dict(getattr(obj, k))
+		return out
+	return obj
+
+
+_SCALAR_TYPES = (int, float, str, bool, type(None))
+
+
 @dataclass
 class Events:
 	note: List[Note] = field(default_factory=list)
@@ -61,6 +80,80 @@ class Events:
 	line_break: List[LineBreak] = field(default_factory=list)
 	tempo: List[Tempo] = field(default_factory=list)
 
+	def version(self, name: str) -> int:
+		"""Version of event list `name`; it increases each time its content changes."""
+		self._fragment(name)
+		return int(self.__dict__.get('_versions', {}).get(name, 0))
+
+	def get_dict(self) -> dict:
+		"""Dict form of all event lists, re-serializing only the changed ones.
+
+		Problem solved: converting every event on each engrave request ran at
+		edit rate on the UI thread. A list is reused while it holds the same
+		event objects in the same order and no event of its class had an
+		attribute written (see TrackedEvent). Lists whose events hold nested
+		values (text fonts, line break margins) are rebuilt and kept while they
+		compare equal. Unchanged lists are returned as the same list objects as
+		before, so consumers can compare them by identity; treat them as
+		read-only.
+		"""
+		return {name: self._fragment(name) for name in self.__dataclass_fields__ if not name.startswith('_')}
+
+	def _fragment(self, name: str) -> list:
+		items = getattr(self, name)
+		if not isinstance(items, list):
+			return _to_dict(items)
+		event_cls = _EVENT_CLASSES.get(name)
+		writes = write_count(event_cls) if event_cls is not None else -1
+		ids = list(map(id, items))
+		fragments = self.__dict__.setdefault('_fragments', {})
+		cached = fragments.get(name)
+		if cached is not None and not cached[4] and cached[0] == writes and cached[1] == ids:
+			return cached[3]
+		out = []
+		# Nested values (fonts, margin lists) can change without a write on the
+		# event itself, so such lists are rebuilt and compared to the cached one.
+		nested = event_cls is None
+		for obj in items:
+			if type(obj) is not event_cls:
+				nested = True
+				out.append(deepcopy(_to_dict(obj)))
+				continue
+			d = {}
+			for k in obj.__dataclass_fields__:
+				if k.startswith('_'):
+					continue
+				v = getattr(obj, k)
+				if type(v) not in _SCALAR_TYPES:
+					nested = True
+					# A copy, so a later in-place change shows up in the comparison.
+					v = deepcopy(_to_dict(v))
+				d[k] = v
+			out.append(d)
+		if nested and cached is not None and cached[3] == out:
+			fragments[name] = (writes, ids, list(items), cached[3], True)
+			return cached[3]
+		versions = self.__dict__.setdefault('_versions', {})
+		versions[name] = versions.get(name, 0) + 1
+		# Holding the events keeps their ids from being reused while cached.
+		fragments[name] = (writes, ids, list(items), out, nested)
+		return out
+
+
+_EVENT_CLASSES: dict[str, type] = {
+	'note': Note,
+	'grace_note': GraceNote,
+	'pedal': Pedal,
+	'text': Text,
+	'slur': Slur,
+	'beam': Beam,
+	'start_repeat': StartRepeat,
+	'end_repeat': EndRepeat,
+	'count_line': CountLine,
+	'line_break': LineBreak,
+	'tempo': Tempo,
+}
+
 
 @dataclass
 class SCORE:
@@ -194,19 +287,14 @@ class SCORE:
 
 	# ---- Dict conversion ----
 	def get_dict(self) -> dict:
-		def to_dict(obj):
-			if isinstance(obj, list):
-				return [to_dict(x) for x in obj]
-			if hasattr(obj, "__dataclass_fields__"):
-				out = {}
-				for k in obj.__dataclass_fields__.keys():
-					# Skip private/internal fields like _next_id
-					if k.startswith('_'):
-						continue
-					out[k] = to_dict(getattr(obj, k))
-				return out
-			return obj
-		return to_dict(self)
+		out = {}
+		for k in self.__dataclass_fields__.keys():
+			if k.startswith('_'):
+				continue
+			value = getattr(self, k)
+			# Events reuse the dicts of unchanged event lists (see Events.get_dict).
+			out[k] = value.get_dict() if isinstance(value, Events) else _to_dict(value)
+		return out
 
 	# ---- Persistence ----
 	def save(self, path: str) -> None:
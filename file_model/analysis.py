@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any
 
@@ -13,6 +13,12 @@ class Analysis:
     measures: int = 0
     lines: int = 0
     updated_at: str = ""
+    # Runtime-only engrave statistics ('_' keeps them out of saved files).
+    _lines_reused: int = 0
+    _lines_rebuilt: int = 0
+    # Milliseconds per engrave phase and drawn primitives per type (profiled engraves only).
+    _phase_ms: dict = field(default_factory=dict)
+    _primitive_counts: dict = field(default_factory=dict)
 
     @staticmethod
     def _list_from_events(events: Any, name: str) -> list:
@@ -1,9 +1,10 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import Literal
+from file_model.events.tracked import TrackedEvent
 
 @dataclass
-class Beam:
+class Beam(TrackedEvent):
     time: float = 0.0
     duration: float = 256.0
     hand: Literal['<', '>'] = '<'
@@ -1,8 +1,9 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from file_model.events.tracked import TrackedEvent
 
 @dataclass
-class CountLine:
+class CountLine(TrackedEvent):
     time: float = 0.0
     pitch1: int = 40
     pitch2: int = 44
@@ -1,7 +1,8 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from file_model.events.tracked import TrackedEvent
 
 @dataclass
-class EndRepeat:
+class EndRepeat(TrackedEvent):
     time: float = 0.0
     _id: int = 0
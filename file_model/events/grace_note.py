@@ -1,8 +1,9 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from file_model.events.tracked import TrackedEvent
 
 @dataclass
-class GraceNote:
+class GraceNote(TrackedEvent):
     pitch: int = 41
     time: float = 50.0
     _id: int = 0
@@ -1,9 +1,10 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import List, Literal
+from file_model.events.tracked import TrackedEvent
 
 @dataclass
-class LineBreak:
+class LineBreak(TrackedEvent):
     time: float = 0.0
     margin_mm: List[float] = field(default_factory=lambda: [10.0, 10.0]) # [left, right]
     # [lowest_key, highest_key] or 'auto' for automatic detection
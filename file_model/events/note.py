@@ -1,11 +1,12 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import Literal
+from file_model.events.tracked import TrackedEvent
 
 NoteColor = Literal['<', '>'] | str
 
 @dataclass
-class Note:
+class Note(TrackedEvent):
     pitch: int = 40
     time: float = 0.0
     duration: float = 100.0
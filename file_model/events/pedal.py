@@ -1,8 +1,9 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from file_model.events.tracked import TrackedEvent
 
 @dataclass
-class Pedal:
+class Pedal(TrackedEvent):
     type: str = 'v'  # 'v' = down, '^' = up
     time: float = 0.0
     _id: int = 0
@@ -1,8 +1,9 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from file_model.events.tracked import TrackedEvent
 
 @dataclass
-class Slur:
+class Slur(TrackedEvent):
     """
     Slur defined by 4 cubic Bezier control points.
     x coordinates use the relative amount of semitone distances from c4.
@@ -1,9 +1,10 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from file_model.events.tracked import TrackedEvent
 
 
 @dataclass
-class Tempo:
+class Tempo(TrackedEvent):
     time: float = 0.0       # start time in ticks
     duration: float = 0.0   # duration in ticks
     tempo: int = 60         # units per minute
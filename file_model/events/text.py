@@ -2,9 +2,10 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Literal
 from file_model.layout import LayoutFont
+from file_model.events.tracked import TrackedEvent
 
 @dataclass
-class Text:
+class Text(TrackedEvent):
     '''
         Represents a time bounded text element to be rendered on the score.
     '''
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+
+class TrackedEvent:
+    """Base of the event dataclasses: counts attribute writes per event class.
+
+    Problem solved: Events.get_dict() reuses the serialized list of an event
+    type while neither the list nor any of its events changed. Edits assign
+    event attributes directly, so every write bumps the counter of its class.
+    """
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        # A list so the hot path mutates it instead of rebinding a class attribute.
+        cls._write_count = [0]
+
+    def __setattr__(self, name: str, value) -> None:
+        self.__dict__[name] = value
+        self._write_count[0] += 1
+
+
+def write_count(cls: type) -> int:
+    """Attribute writes on instances of an event class so far."""
+    counter = getattr(cls, '_write_count', None)
+    return int(counter[0]) if counter else 0
@@ -0,0 +1,202 @@
+"""Headless batch engraving: .piano files to PDF (and optionally PNG pages).
+
+Runs without a QApplication, so it works on servers and in CI:
+
+    python keyTAB_batch.py scores/ extra.piano --png --out-dir out/
+"""
+import argparse
+import os
+import sys
+import time
+import multiprocessing as mp
+from pathlib import Path
+
+SCORE_SUFFIX = ".piano"
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Engrave .piano files to PDF/PNG without starting the GUI.",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Score files or directories (directories are searched recursively for *.piano).",
+    )
+    parser.add_argument(
+        "-o", "--out-dir",
+        default=None,
+        help="Output directory (default: next to each input file).",
+    )
+    parser.add_argument(
+        "--png",
+        action="store_true",
+        help="Also write one PNG per page.",
+    )
+    parser.add_argument(
+        "--no-pdf",
+        action="store_true",
+        help="Skip PDF output (use together with --png).",
+    )
+    parser.add_argument(
+        "--dpi",
+        type=float,
+        default=150.0,
+        help="Resolution of PNG pages (default: 150).",
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=0,
+        help="Worker processes (default: number of CPU cores).",
+    )
+    parser.add_argument(
+        "-f", "--force",
+        action="store_true",
+        help="Engrave even when the outputs are newer than the input.",
+    )
+    return parser.parse_args(argv)
+
+
+def collect_inputs(inputs: list[str], out_dir: str | None) -> list[tuple[Path, Path]]:
+    """Return (score path, output base path without suffix) pairs in a stable order."""
+    jobs: list[tuple[Path, Path]] = []
+    seen: set[Path] = set()
+    for raw in inputs:
+        path = Path(raw).expanduser()
+        if path.is_dir():
+            found = [(p, p.relative_to(path)) for p in sorted(path.rglob(f"*{SCORE_SUFFIX}"))]
+        elif path.is_file():
+            found = [(path, Path(path.name))]
+        else:
+            print(f"skip {raw}: not found", file=sys.stderr)
+            continue
+        for src, rel in found:
+            key = src.resolve()
+            if key in seen:
+                continue
+            seen.add(key)
+            if out_dir:
+                # Keep the directory structure below each input directory.
+                base = Path(out_dir).expanduser() / rel.with_suffix("")
+            else:
+                base = src.with_suffix("")
+            jobs.append((src, base))
+    return jobs
+
+
+def _is_up_to_date(src: Path, base: Path, pdf: bool, png: bool) -> bool:
+    """True when every requested output exists and is newer than the input."""
+    try:
+        src_mtime = src.stat().st_mtime
+        outputs = []
+        if pdf:
+            outputs.append(base.with_suffix(".pdf"))
+        if png:
+            outputs.append(_png_path(base, 1))
+        return bool(outputs) and all(p.exists() and p.stat().st_mtime >= src_mtime for p in outputs)
+    except Exception:
+        return False
+
+
+def _png_path(base: Path, pageno: int) -> Path:
+    return base.with_name(f"{base.name}-{pageno:03d}.png")
+
+
+def engrave_file(job: tuple[str, str, bool, bool, float]) -> tuple[str, int, float, str]:
+    """Engrave one score; returns (path, page count, seconds, error message)."""
+    src, base, pdf, png, dpi = job
+    t0 = time.perf_counter()
+    try:
+        import cairo
+        from engraver.engraver import do_engrave
+        from file_model.SCORE import SCORE
+        from ui.widgets.draw_compact import CompactDrawUtil
+        from utils.CONSTANT import ENGRAVER_LAYERING
+
+        score = SCORE().load(src).get_dict()
+        # A whole score stays in memory until written; keep it in typed arrays.
+        du = CompactDrawUtil()
+        do_engrave(score, du, pdf_export=True)
+        pages = du.page_count()
+        base_path = Path(base)
+        base_path.parent.mkdir(parents=True, exist_ok=True)
+        if pdf:
+            du.save_pdf(str(base_path.with_suffix(".pdf")), layering=ENGRAVER_LAYERING)
+        if png:
+            px_per_mm = float(dpi) / 25.4
+            for i in range(pages):
+                du.set_current_page(i)
+                w_mm, h_mm = du.current_page_size_mm()
+                surface = cairo.ImageSurface(
+                    cairo.FORMAT_RGB24,
+                    max(1, int(round(w_mm * px_per_mm))),
+                    max(1, int(round(h_mm * px_per_mm))),
+                )
+                ctx = cairo.Context(surface)
+                ctx.set_source_rgb(1, 1, 1)
+                ctx.paint()
+                du.render_to_cairo(ctx, i, px_per_mm, layering=ENGRAVER_LAYERING)
+                surface.write_to_png(str(_png_path(base_path, i + 1)))
+                surface.finish()
+        return src, pages, time.perf_counter() - t0, ""
+    except Exception as exc:
+        return src, 0, time.perf_counter() - t0, f"{type(exc).__name__}: {exc}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    args = parse_args(argv)
+    pdf = not args.no_pdf
+    png = bool(args.png)
+    if not pdf and not png:
+        print("Nothing to do: --no-pdf without --png.", file=sys.stderr)
+        return 2
+
+    jobs = []
+    skipped = 0
+    for src, base in collect_inputs(args.inputs, args.out_dir):
+        if not args.force and _is_up_to_date(src, base, pdf, png):
+            skipped += 1
+            print(f"up-to-date  {src}")
+            continue
+        jobs.append((str(src), str(base), pdf, png, float(args.dpi)))
+    if not jobs:
+        print(f"0 engraved, {skipped} up-to-date")
+        return 0
+
+    processes = max(1, min(len(jobs), args.jobs or os.cpu_count() or 1))
+    t0 = time.perf_counter()
+    failed = 0
+    total_pages = 0
+
+    def _report(result: tuple[str, int, float, str]) -> None:
+        nonlocal failed, total_pages
+        src, pages, seconds, error = result
+        if error:
+            failed += 1
+            print(f"FAILED      {src}  ({seconds:.2f}s)  {error}", file=sys.stderr)
+        else:
+            total_pages += pages
+            print(f"{seconds:7.2f}s  {pages:3d} page(s)  {src}")
+
+    if processes == 1:
+        for job in jobs:
+            _report(engrave_file(job))
+    else:
+        # Spawn keeps workers independent of the parent state (same as the GUI engraver).
+        with mp.get_context("spawn").Pool(processes) as pool:
+            for result in pool.imap_unordered(engrave_file, jobs):
+                _report(result)
+
+    print(
+        f"{len(jobs) - failed} engraved, {failed} failed, {skipped} up-to-date; "
+        f"{total_pages} page(s) in {time.perf_counter() - t0:.2f}s using {processes} process(es)"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    mp.freeze_support()
+    sys.exit(main())
@@ -291,6 +291,9 @@ def get_preferences_manager() -> PreferencesManager:
         pm.register("editor_fps_limit", 30, "Max mouse-move dispatch rate (FPS). Set 0 to disable throttling.")
         pm.register("audition_during_note_input", True, "Play a short note on input when placing notes.")
         pm.register("focus_on_playhead_during_playback", True, "Focus the editor view on the playhead during playback.")
+        pm.register("editor_tile_cache_mb", 96, "Memory (MB) for rasterized editor tiles reused while scrolling.")
+        pm.register("print_view_cache_mb", 128, "Memory (MB) for rendered print view pages, for instant page turns. Set 0 to disable.")
+        pm.register("engrave_cache_max_mb", 256, "Disk space (MB) for cached engraved pages of recently opened scores. Set 0 to disable.")
         # pm.register(
         #     "note_tool_mouse_gesture_hand_switching",
         #     True,
@@ -13,10 +13,11 @@ from ui.widgets.tool_selector import ToolSelectorDock
 from ui.widgets.snap_size_selector import SnapSizeDock
 from ui.widgets.draw_util import DrawUtil
 from ui.widgets.draw_view import DrawUtilView
+from ui.widgets.engrave_debug_dock import EngraveDebugDock
 from ui.about_dialog import AboutDialog
 from settings_manager import open_preferences, get_preferences_manager
 from appdata_manager import get_appdata_manager
-from engraver.engraver import Engraver
+from engraver.engraver_qt import Engraver
 from editor.tool_manager import ToolManager
 from editor.editor import Editor
 
@@ -135,7 +136,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 status_msg = "Restored unsaved session"
 
         # Provide initial score to engrave and update titlebar (delay first engrave)
-        self._refresh_views_from_score(delay_engrave_ms=1000)
+        self._refresh_views_from_score(delay_engrave_ms=1000, use_cache=True)
         # Show startup status on the status bar
         try:
             if status_msg:
@@ -588,6 +589,10 @@ class MainWindow(QtWidgets.QMainWindow):
         view_menu.addAction(zoom_in_act)
         view_menu.addAction(zoom_out_act)
         view_menu.addSeparator()
+        self._engrave_debug_act = QtGui.QAction("Engrave Debug Panel", self)
+        self._engrave_debug_act.setCheckable(True)
+        self._engrave_debug_act.toggled.connect(self._set_engrave_debug_visible)
+        view_menu.addAction(self._engrave_debug_act)
 
         # Wire up triggers
         new_act.triggered.connect(self._file_new)
@@ -1010,30 +1015,55 @@ class MainWindow(QtWidgets.QMainWindow):
                     adm.save()
             except Exception:
                 pass
-            try:
-                from utils.CONSTANT import ENGRAVER_LAYERING
-                from engraver.engraver import do_engrave
-                export_du = DrawUtil()
-                do_engrave(self._current_score_dict(), export_du, pdf_export=True)
-                total_pages = max(1, export_du.page_count())
-                progress = QtWidgets.QProgressDialog("Exporting PDF...", None, 0, total_pages, self)
-                progress.setWindowTitle("Export PDF")
-                progress.setWindowModality(QtCore.Qt.WindowModality.WindowModal)
-                progress.setMinimumDuration(0)
-                progress.setValue(0)
-                progress.show()
-
-                def _on_progress(done: int, total: int) -> None:
-                    if progress.maximum() != int(total):
-                        progress.setMaximum(int(total))
-                    progress.setValue(int(done))
-                    QtWidgets.QApplication.processEvents()
-
-                export_du.save_pdf(out_path, layering=ENGRAVER_LAYERING, progress_cb=_on_progress)
-                progress.setValue(total_pages)
+            self._start_pdf_export(str(out_path))
+
+    def _start_pdf_export(self, out_path: str) -> None:
+        """Export in the background; the window stays responsive and the
+        progress dialog's Cancel button stops the export between pages."""
+        if getattr(self, '_pdf_export_cancel', None) is not None:
+            self._status("A PDF export is already running.")
+            return
+        try:
+            import threading
+            from ui.pdf_export_task import PdfExportEmitter, PdfExportTask
+            cancel_event = threading.Event()
+            emitter = PdfExportEmitter(self)
+            progress = QtWidgets.QProgressDialog("Exporting PDF...", "Cancel", 0, 0, self)
+            progress.setWindowTitle("Export PDF")
+            progress.setWindowModality(QtCore.Qt.WindowModality.WindowModal)
+            progress.setMinimumDuration(0)
+            progress.setAutoClose(False)
+            progress.setAutoReset(False)
+            progress.canceled.connect(cancel_event.set)
+
+            def _on_progress(done: int, total: int) -> None:
+                if progress.maximum() != int(total):
+                    progress.setMaximum(int(total))
+                progress.setValue(int(done))
+
+            def _on_finished(pages: int, error: str) -> None:
+                self._pdf_export_cancel = None
                 progress.close()
-            except Exception as e:
-                QtWidgets.QMessageBox.critical(self, "Export PDF failed", str(e))
+                emitter.deleteLater()
+                if error:
+                    QtWidgets.QMessageBox.critical(self, "Export PDF failed", error)
+                elif pages < 0:
+                    self._status("PDF export cancelled.")
+                else:
+                    self._status(f"Exported {pages} page(s) to {os.path.basename(out_path)}.")
+
+            # Signals arrive from the pool thread; queue them onto the UI thread.
+            queued = QtCore.Qt.ConnectionType.QueuedConnection
+            emitter.progress.connect(_on_progress, queued)
+            emitter.finished.connect(_on_finished, queued)
+            self._pdf_export_cancel = cancel_event
+            progress.show()
+            QtCore.QThreadPool.globalInstance().start(
+                PdfExportTask(self._current_score_dict(), out_path, emitter, cancel_event)
+            )
+        except Exception as e:
+            self._pdf_export_cancel = None
+            QtWidgets.QMessageBox.critical(self, "Export PDF failed", str(e))
 
     def _status(self, message: str, timeout_ms: int = 3000) -> None:
         """Show a transient message on the status bar."""
@@ -1129,7 +1159,7 @@ class MainWindow(QtWidgets.QMainWindow):
             self._refresh_recent_files_menu()
         except Exception:
             pass
-        self._refresh_views_from_score()
+        self._refresh_views_from_score(use_cache=True)
         try:
             self.editor_controller.set_score(self.file_manager.current())
             self.editor_controller.reset_undo_stack()
@@ -1148,18 +1178,32 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def _file_save(self) -> None:
         if self.file_manager.save():
-            self._update_title()
+            self._after_project_saved()
 
     def _file_save_as(self) -> None:
         if self.file_manager.save_as():
-            self._update_title()
+            self._after_project_saved()
+
+    def _after_project_saved(self) -> None:
+        # The saved state is what the next open shows from the engrave cache.
+        try:
+            self.engraver.cache_saved(self._current_score_dict())
+        except Exception:
+            pass
+        self._update_title()
 
-    def _refresh_views_from_score(self, delay_engrave_ms: int = 0) -> None:
+    def _refresh_views_from_score(self, delay_engrave_ms: int = 0, use_cache: bool = False) -> None:
         try:
             sc_dict = self.file_manager.current().get_dict()
         except Exception:
             sc_dict = {}
         self.print_view.set_score(sc_dict)
+        if use_cache:
+            # Show the cached engraving of an opened score while it re-engraves.
+            try:
+                self.engraver.show_cached(sc_dict)
+            except Exception:
+                pass
         # Request engraving via Engraver; render happens on engraved signal
         if delay_engrave_ms and delay_engrave_ms > 0:
             def _delayed_engrave() -> None:
@@ -1609,11 +1653,35 @@ class MainWindow(QtWidgets.QMainWindow):
             self._update_analysis_from_engraver()
         except Exception:
             pass
+        try:
+            dock = getattr(self, 'engrave_debug_dock', None)
+            if dock is not None and dock.isVisible():
+                dock.update_analysis(getattr(self.engraver, 'analysis', None), self.engraver.throttle_status())
+        except Exception:
+            pass
         try:
             self.print_view.request_render()
         except Exception:
             pass
 
+    def _set_engrave_debug_visible(self, visible: bool) -> None:
+        """Show the engrave timing/primitive panel (created on first use)."""
+        dock = getattr(self, 'engrave_debug_dock', None)
+        if dock is None:
+            if not visible:
+                return
+            dock = EngraveDebugDock(self)
+            self.addDockWidget(QtCore.Qt.DockWidgetArea.RightDockWidgetArea, dock)
+            # Keep the menu check in sync when the dock is closed with its button
+            # (a tabbed-away dock is invisible but not hidden).
+            dock.visibilityChanged.connect(
+                lambda shown: self._engrave_debug_act.setChecked(False) if not shown and dock.isHidden() else None
+            )
+            self.engrave_debug_dock = dock
+        dock.setVisible(bool(visible))
+        if visible:
+            dock.update_analysis(getattr(self.engraver, 'analysis', None), self.engraver.throttle_status())
+
     def _update_analysis_from_engraver(self) -> None:
         analysis_obj = getattr(self.engraver, "analysis", None)
         if analysis_obj is None:
@@ -1666,7 +1734,9 @@ class MainWindow(QtWidgets.QMainWindow):
                 return
             self._page_counter = (self._page_counter + 1) % page_count
             self._set_page_index(self._page_counter)
-            self.engraver.engrave(self._current_score_dict(), pageno=self._page_counter)
+            # Draw from the current layout when possible; re-engrave otherwise.
+            if not self.engraver.request_page(self._page_counter):
+                self.engraver.engrave(self._current_score_dict(), pageno=self._page_counter)
         except Exception:
             pass
 
@@ -1677,7 +1747,9 @@ class MainWindow(QtWidgets.QMainWindow):
                 return
             self._page_counter = (self._page_counter - 1) % page_count
             self._set_page_index(self._page_counter)
-            self.engraver.engrave(self._current_score_dict(), pageno=self._page_counter)
+            # Draw from the current layout when possible; re-engrave otherwise.
+            if not self.engraver.request_page(self._page_counter):
+                self.engraver.engrave(self._current_score_dict(), pageno=self._page_counter)
         except Exception:
             pass
 
@@ -2099,6 +2171,11 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def closeEvent(self, ev: QtGui.QCloseEvent) -> None:
         # Unified close handling: save session and close without prompting.
+        try:
+            if getattr(self, '_pdf_export_cancel', None) is not None:
+                self._pdf_export_cancel.set()
+        except Exception:
+            pass
         try:
             self.file_manager.autosave_current()
         except Exception:
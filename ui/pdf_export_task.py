@@ -0,0 +1,39 @@
+from __future__ import annotations
+import threading
+from PySide6 import QtCore
+from engraver.engraver import EngraveCancelled
+from engraver.pdf_export import export_pdf
+from utils.CONSTANT import ENGRAVER_LAYERING
+
+
+class PdfExportEmitter(QtCore.QObject):
+    progress = QtCore.Signal(int, int)
+    # (page_count, error message); page_count is -1 when cancelled
+    finished = QtCore.Signal(int, str)
+
+
+class PdfExportTask(QtCore.QRunnable):
+    """Run export_pdf off the UI thread; setting cancel_event stops it between pages."""
+
+    def __init__(self, score: dict, path: str, emitter: PdfExportEmitter, cancel_event: threading.Event):
+        super().__init__()
+        self.setAutoDelete(True)
+        self._score = score
+        self._path = path
+        self._emitter = emitter
+        self._cancelled = cancel_event
+
+    def run(self) -> None:
+        try:
+            pages = export_pdf(
+                self._score,
+                self._path,
+                layering=ENGRAVER_LAYERING,
+                progress_cb=self._emitter.progress.emit,
+                cancel_check=self._cancelled.is_set,
+            )
+            self._emitter.finished.emit(int(pages), "")
+        except EngraveCancelled:
+            self._emitter.finished.emit(-1, "")
+        except Exception as e:
+            self._emitter.finished.emit(0, str(e) or type(e).__name__)
@@ -4,12 +4,136 @@ import os
 import sys
 import cairo
 import math
+from collections import OrderedDict
 from typing import Optional
 from editor.editor import Editor
-from ui.widgets.draw_util import DrawUtil, make_image_surface, finalize_image_surface
+from ui.widgets.draw_util import DrawUtil
+from ui.widgets.draw_util_qt import make_image_surface, finalize_image_surface
 from ui.style import Style
 from settings_manager import get_preferences
-# Stripped renderer, tile cache, and spatial index for static viewport simplicity
+
+# Editor tile cache
+# -----------------
+# Problem solved: every scroll step rebuilt the editor DrawUtil and rasterized
+# the whole viewport, even though most of it was on screen a frame earlier.
+# The content layer (everything Editor.draw_all produces; guides stay a
+# per-frame overlay) is now rasterized in full-width tiles of _TILE_H_PX
+# device pixels, keyed by (zoom, page width, tile row) and tagged with the
+# content version they were drawn from. Scrolling composites cached tiles and
+# renders only newly exposed rows.
+#
+# The content version is bumped by every CairoEditorWidget.update() call,
+# which is how the editor and main window report model changes; scrolling,
+# hover and guide refreshes repaint through _update_view() and keep it.
+#
+# Background rasterization
+# ------------------------
+# Problem solved: after an edit every visible tile was rasterized inside
+# paintEvent, so typing and dragging stalled on heavy scores. Editor.draw_all
+# still runs on the GUI thread (it reads the live model and registers the hit
+# rectangles), but tiles of an older version are re-rasterized by an
+# EditorRenderTask on the global QThreadPool, like RenderTask in the print
+# view. Until it lands, paintEvent composites the older tiles; at most one
+# task runs and only the newest request waits behind it (latest wins). Rows
+# with no tile at all are still rasterized synchronously.
+_TILE_H_PX: int = 256
+# Tiles cull with a margin so strokes and glyphs crossing a seam are painted on both sides
+_TILE_OVERSCAN_MM: float = 3.0
+_DEFAULT_TILE_CACHE_MB: int = 96
+
+
+class _TileCache:
+    """Rasterized content tiles with LRU eviction bounded by total bytes.
+
+    One entry per (zoom, page width, row) key holds the newest version drawn
+    for it, so an outdated tile stays available until its replacement lands.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = int(max_bytes)
+        self._tiles: OrderedDict[tuple, tuple[int, QtGui.QImage]] = OrderedDict()
+        self._bytes: int = 0
+
+    def get(self, key: tuple) -> tuple[int, QtGui.QImage] | None:
+        """Return (version, image) for `key`, or None."""
+        entry = self._tiles.get(key)
+        if entry is not None:
+            self._tiles.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, version: int, img: QtGui.QImage) -> None:
+        old = self._tiles.get(key)
+        if old is not None:
+            if old[0] > version:
+                return
+            del self._tiles[key]
+            self._bytes -= int(old[1].sizeInBytes())
+        self._tiles[key] = (int(version), img)
+        self._bytes += int(img.sizeInBytes())
+        # Never evict the newest tile: the current frame needs it.
+        while self._bytes > self.max_bytes and len(self._tiles) > 1:
+            _k, (_v, dropped) = self._tiles.popitem(last=False)
+            self._bytes -= int(dropped.sizeInBytes())
+
+    def clear(self) -> None:
+        self._tiles.clear()
+        self._bytes = 0
+
+
+def _render_content_tile(du: DrawUtil, row: int, w_px: int, px_per_mm: float, page_w_mm: float,
+                         dpr: float) -> QtGui.QImage:
+    """Rasterize tile `row` of the editor content held by `du`."""
+    row_h_mm = float(_TILE_H_PX) / max(1e-6, px_per_mm)
+    image, surface, _buf = make_image_surface(w_px, _TILE_H_PX)
+    ctx = cairo.Context(surface)
+    try:
+        ctx.set_antialias(cairo.ANTIALIAS_BEST)
+    except Exception:
+        print('CairoEditorWidget: Warning: failed to set antialiasing mode')
+    du.render_to_cairo(ctx, du.current_page_index(), px_per_mm, (0.0, row * row_h_mm, page_w_mm, row_h_mm),
+                       overscan_mm=_TILE_OVERSCAN_MM)
+    return finalize_image_surface(image, device_pixel_ratio=dpr)
+
+
+class EditorRenderEmitter(QtCore.QObject):
+    # (task key, [(row, QImage)])
+    rendered = QtCore.Signal(object, object)
+
+
+class EditorRenderTask(QtCore.QRunnable):
+    """Rasterize editor content tiles off the GUI thread.
+
+    `draw_util` must no longer be modified and must have been prepared with
+    DrawUtil.prepare_page, so the GUI thread can keep reading it meanwhile.
+    """
+
+    def __init__(self, draw_util: DrawUtil, rows: list[int], tile_base: tuple, version: int, w_px: int,
+                 px_per_mm: float, page_w_mm: float, dpr: float, emitter: EditorRenderEmitter):
+        super().__init__()
+        self.setAutoDelete(True)
+        self._du = draw_util
+        self._rows = list(rows)
+        self._w_px = w_px
+        self._px_per_mm = px_per_mm
+        self._page_w_mm = page_w_mm
+        self._dpr = dpr
+        self._emitter = emitter
+        self.key = (tile_base, int(version), tuple(self._rows))
+
+    def run(self) -> None:
+        images = []
+        try:
+            for row in self._rows:
+                images.append((row, _render_content_tile(self._du, row, self._w_px, self._px_per_mm,
+                                                         self._page_w_mm, self._dpr)))
+        except Exception as e:
+            print(f"Editor render error: {e}")
+        # Emit back to the UI thread, but skip if the emitter is gone (e.g., view closed)
+        try:
+            if self._emitter is not None:
+                self._emitter.rendered.emit(self.key, images)
+        except RuntimeError:
+            pass
 
 
 def _draw_editor_background(ctx: cairo.Context, w: int, h: int, color=(0.12, 0.12, 0.12)):
@@ -25,6 +149,9 @@ class CairoEditorWidget(QtWidgets.QWidget):
     scrollLogicalPxChanged = QtCore.Signal(int)
     # Signal: emitted when the mouse wheel scrolls inside the editor view
     scrollWheelUsed = QtCore.Signal()
+    # Re-rasterize outdated tiles on the thread pool; see module comment
+    render_in_background: bool = True
+
     def __init__(self, parent=None):
         super().__init__(parent)
         # Allow splitter to fully collapse this view
@@ -69,15 +196,21 @@ class CairoEditorWidget(QtWidgets.QWidget):
         # Track mouse button state to decide when overlay-only redraw is safe
         self._left_down: bool = False
         self._right_down: bool = False
-        # Quick overlay repaint hint for paintEvent
-        self._overlay_only_repaint: bool = False
-        # Cached static layers for current viewport
-        self._content_cache_image: QtGui.QImage | None = None
-        self._content_cache_key: tuple | None = None  # (px_per_mm, dpr, vis_w_px, vis_h_px, clip_x_mm, clip_y_mm, clip_w_mm, clip_h_mm)
+        # Content layer tiles (see module comment); the version changes with the model
+        self._content_version: int = 0
+        self._tiles = _TileCache(self._tile_cache_bytes_from_prefs())
+        # Tile rows (and cache base key) the content DrawUtil in self._du was built for
+        self._du_span: tuple | None = None
+        self._tiles_zoom: float = 0.0
+        # Background tile rendering: the running task and the newest request behind it
+        self._pool = QtCore.QThreadPool.globalInstance()
+        self._render_emitter = EditorRenderEmitter()
+        self._render_emitter.rendered.connect(self._on_tiles_rendered)
+        self._running_task_key: tuple | None = None
+        self._pending_task: EditorRenderTask | None = None
         # Debug logging toggle (env: PIANOSCRIPT_DEBUG_SCROLL=1)
         self._debug_scroll: bool = os.getenv('PIANOSCRIPT_DEBUG_SCROLL', '0') in ('1', 'true', 'True')
         self._last_debug_key: tuple | None = None
-        # Static viewport: no tiling/cache/renderer state
         self._last_cache_params: tuple[float, float, float] | None = None
         # Last hovered note id to avoid redundant status updates
         self._last_hover_note_id: int | None = None
@@ -85,23 +218,30 @@ class CairoEditorWidget(QtWidgets.QWidget):
     def set_editor(self, editor: Editor) -> None:
         self._editor = editor
 
+    def update(self, *args) -> None:
+        """Schedule a repaint after a possible model change (new content version)."""
+        self._invalidate_content()
+        super().update(*args)
+
+    def _update_view(self) -> None:
+        """Schedule a repaint that keeps the content tiles (scroll, guides, hover)."""
+        super().update()
+
+    def _invalidate_content(self) -> None:
+        self._content_version += 1
+
     def request_overlay_refresh(self) -> None:
         """Trigger an overlay-only repaint for guide updates (e.g., cursor changes).
 
-        Sets a hint to reuse cached content and redraw only guides on next paint.
+        Cached content tiles are reused; only guides are redrawn on next paint.
         """
-        try:
-            self._overlay_only_repaint = True
-        except Exception:
-            pass
-        self.update()
+        self._update_view()
 
     def force_full_redraw(self) -> None:
         """Invalidate cached content and request a full repaint from the model."""
         try:
-            self._content_cache_image = None
-            self._content_cache_key = None
-            self._overlay_only_repaint = False
+            self._du = None
+            self._du_span = None
         except Exception:
             pass
         self.update()
@@ -113,7 +253,7 @@ class CairoEditorWidget(QtWidgets.QWidget):
     def set_scroll_logical_px(self, value: int) -> None:
         """Set external logical pixel scroll offset and repaint."""
         self._scroll_logical_px = max(0, int(value))
-        self.update()
+        self._update_view()
 
     def paintEvent(self, ev: QtGui.QPaintEvent) -> None:
         # Use widget size as static viewport; do not rely on QScrollArea.
@@ -175,7 +315,6 @@ class CairoEditorWidget(QtWidgets.QWidget):
                 self._last_debug_key = dbg_key
                 print(f"[ScrollDbg] scroll_px={scroll_val_px} dpr={dpr:.3f} px_per_mm={px_per_mm:.6f} "
                       f"vp=({vp_w}x{vp_h}) vis=({vis_w_px}x{vis_h_px}) clip_y_mm={clip_y_mm:.3f} clip_h_mm={clip_h_mm:.3f}")
-        # Static viewport: tiling disabled and not used
 
         # Emit metrics so a container can configure an external scrollbar
         try:
@@ -207,9 +346,22 @@ class CairoEditorWidget(QtWidgets.QWidget):
         except Exception:
             pass
 
-        # Compute a stable cache key for the current content viewport
-        cache_key = (round(px_per_mm, 6), round(dpr, 3), vis_w_px, vis_h_px,
-                     round(clip_x_mm, 3), round(clip_y_mm, 3), round(clip_w_mm, 3), round(clip_h_mm, 3))
+        # Tile rows covering the viewport, in device px from the top of the content
+        scroll_dev_px = int(round(float(scroll_val_px) * dpr))
+        first_row = scroll_dev_px // _TILE_H_PX
+        last_row = (scroll_dev_px + vis_h_px - 1) // _TILE_H_PX
+        # The editor zoom moves all content: treat a change like a model change, so the
+        # old tiles keep showing (outdated) until the new ones are rasterized
+        zoom_mm_per_quarter = 0.0
+        try:
+            if self._editor is not None and self._editor.current_score() is not None:
+                zoom_mm_per_quarter = float(self._editor.current_score().editor.zoom_mm_per_quarter)
+        except Exception:
+            pass
+        if zoom_mm_per_quarter != self._tiles_zoom:
+            self._tiles_zoom = zoom_mm_per_quarter
+            self._invalidate_content()
+        tile_base = (round(px_per_mm, 6), round(dpr, 3), round(page_w_mm, 3), vis_w_px)
 
         painter = QtGui.QPainter(self)
         try:
@@ -222,70 +374,30 @@ class CairoEditorWidget(QtWidgets.QWidget):
             # Use a pure viewport clip rect (no bleed). Overscan applied only inside DrawUtil if needed.
             clip_mm = (clip_x_mm, clip_y_mm, clip_w_mm, clip_h_mm)
 
-            # Fast path: if only overlays changed (mouse move, no buttons), reuse cached content
-            fast_overlay = False
-            if self._overlay_only_repaint and self._content_cache_image is not None and self._content_cache_key == cache_key:
-                fast_overlay = True
-                # Draw cached content first
-                content_img = self._content_cache_image
-                content_img.setDevicePixelRatio(dpr)
-                painter.drawImage(QtCore.QRectF(0.0, 0.0, float(vp_w), float(vp_h)), content_img)
-
-                # Rebuild only guides layer and composite on top
-                du_guides = DrawUtil()
-                du_guides.set_current_page_size_mm(page_w_mm, page_h_mm)
-                if self._editor is not None:
-                    try:
-                        self._editor.draw_guides(du_guides)
-                    except Exception:
-                        pass
-                # Offscreen buffer for overlays
-                ov_img, ov_surf, _ov_buf = make_image_surface(vis_w_px, vis_h_px)
-                ov_ctx = cairo.Context(ov_surf)
-                try:
-                    ov_ctx.set_antialias(cairo.ANTIALIAS_BEST)
-                except Exception:
-                    pass
-                du_guides.render_to_cairo(ov_ctx, du_guides.current_page_index(), px_per_mm, clip_mm, overscan_mm=0.0)
-                ov_img_detached = finalize_image_surface(ov_img, device_pixel_ratio=dpr)
-                painter.drawImage(QtCore.QRectF(0.0, 0.0, float(vp_w), float(vp_h)), ov_img_detached)
-            else:
-                # Full path: rebuild content (without guides), cache it, then draw guides on top
-                du_content = DrawUtil()
-                du_content.set_current_page_size_mm(page_w_mm, page_h_mm)
-                if self._editor is not None:
-                    self._editor.draw_all(du_content)
-                # Rasterize content to cache image
-                c_img, c_surf, _c_buf = make_image_surface(vis_w_px, vis_h_px)
-                c_ctx = cairo.Context(c_surf)
-                try:
-                    c_ctx.set_antialias(cairo.ANTIALIAS_BEST)
-                except Exception:
-                    print('CairoEditorWidget.paintEvent: Warning: failed to set antialiasing mode')
-                du_content.render_to_cairo(c_ctx, du_content.current_page_index(), px_per_mm, clip_mm, overscan_mm=0.0)
-                c_img_detached = finalize_image_surface(c_img, device_pixel_ratio=dpr)
-                # Cache the content layer for overlay-only repaints
-                self._content_cache_image = c_img_detached
-                self._content_cache_key = cache_key
-                painter.drawImage(QtCore.QRectF(0.0, 0.0, float(vp_w), float(vp_h)), c_img_detached)
-
-                # Now render guides and composite
-                du_guides = DrawUtil()
-                du_guides.set_current_page_size_mm(page_w_mm, page_h_mm)
-                if self._editor is not None:
-                    try:
-                        self._editor.draw_guides(du_guides)
-                    except Exception:
-                        pass
-                g_img, g_surf, _g_buf = make_image_surface(vis_w_px, vis_h_px)
-                g_ctx = cairo.Context(g_surf)
+            # Content layer: composite cached tiles, rasterize the missing rows
+            for row, tile in self._content_tiles(tile_base, first_row, last_row, page_w_mm, page_h_mm,
+                                                 px_per_mm, clip_y_mm, clip_h_mm):
+                # Tiles sit on whole device pixels, so they are blitted without resampling
+                y_logical = float(row * _TILE_H_PX - scroll_dev_px) / dpr
+                painter.drawImage(QtCore.QPointF(0.0, y_logical), tile)
+
+            # Guides are rebuilt every frame and composited on top
+            du_guides = DrawUtil()
+            du_guides.set_current_page_size_mm(page_w_mm, page_h_mm)
+            if self._editor is not None:
                 try:
-                    g_ctx.set_antialias(cairo.ANTIALIAS_BEST)
+                    self._editor.draw_guides(du_guides)
                 except Exception:
                     pass
-                du_guides.render_to_cairo(g_ctx, du_guides.current_page_index(), px_per_mm, clip_mm, overscan_mm=0.0)
-                g_img_detached = finalize_image_surface(g_img, device_pixel_ratio=dpr)
-                painter.drawImage(QtCore.QRectF(0.0, 0.0, float(vp_w), float(vp_h)), g_img_detached)
+            g_img, g_surf, _g_buf = make_image_surface(vis_w_px, vis_h_px)
+            g_ctx = cairo.Context(g_surf)
+            try:
+                g_ctx.set_antialias(cairo.ANTIALIAS_BEST)
+            except Exception:
+                pass
+            du_guides.render_to_cairo(g_ctx, du_guides.current_page_index(), px_per_mm, clip_mm, overscan_mm=0.0)
+            g_img_detached = finalize_image_surface(g_img, device_pixel_ratio=dpr)
+            painter.drawImage(QtCore.QRectF(0.0, 0.0, float(vp_w), float(vp_h)), g_img_detached)
 
             # Optional viewport debug overlay: draw a red border around viewport
             if os.getenv('PIANOSCRIPT_DEBUG_VIEWPORT', '0') in ('1', 'true', 'True'):
@@ -296,8 +408,95 @@ class CairoEditorWidget(QtWidgets.QWidget):
                 painter.drawRect(QtCore.QRectF(0.5, 0.5, float(vp_w) - 1.0, float(vp_h) - 1.0))
         finally:
             painter.end()
-        # Reset the overlay-only hint after a paint pass
-        self._overlay_only_repaint = False
+
+    def _content_tiles(self, tile_base: tuple, first_row: int, last_row: int, page_w_mm: float,
+                       page_h_mm: float, px_per_mm: float, clip_y_mm: float, clip_h_mm: float):
+        """Return [(row, QImage)] for the content tiles first_row..last_row.
+
+        Editor.draw_all runs only when the rows (or the content version) differ
+        from the last pass. It is culled to the whole rows rather than the
+        viewport, so the note/text hit rectangles it registers cover everything
+        on screen until the next pass; the viewport is restored afterwards.
+        Outdated tiles are returned as they are and re-rasterized in the
+        background (see module comment).
+        """
+        version = self._content_version
+        tiles = []
+        outdated = []
+        missing = []
+        for row in range(first_row, last_row + 1):
+            entry = self._tiles.get(tile_base + (row,))
+            if entry is None:
+                missing.append(row)
+                tiles.append((row, None))
+                continue
+            if entry[0] != version:
+                outdated.append(row)
+            tiles.append((row, entry[1]))
+        span = (tile_base, version, first_row, last_row)
+        row_h_mm = float(_TILE_H_PX) / max(1e-6, px_per_mm)
+        if self._du is None or self._du_span != span:
+            du = DrawUtil()
+            du.set_current_page_size_mm(page_w_mm, page_h_mm)
+            if self._editor is not None:
+                try:
+                    self._editor.set_view_offset_mm(first_row * row_h_mm)
+                    self._editor.set_viewport_height_mm((last_row + 1 - first_row) * row_h_mm)
+                    self._editor.draw_all(du)
+                finally:
+                    self._editor.set_view_offset_mm(clip_y_mm)
+                    self._editor.set_viewport_height_mm(clip_h_mm)
+            # Build the lazy indices here: the DrawUtil may be shared with a render task
+            du.prepare_page()
+            self._du = du
+            self._du_span = span
+        du = self._du
+        w_px = int(tile_base[3])
+        dpr = float(tile_base[1])
+        if not self.render_in_background:
+            missing += outdated
+            outdated = []
+        if outdated:
+            self._request_tiles(EditorRenderTask(du, outdated, tile_base, version, w_px, px_per_mm,
+                                                 page_w_mm, dpr, self._render_emitter))
+        for i, (row, img) in enumerate(tiles):
+            if row not in missing:
+                continue
+            img = _render_content_tile(du, row, w_px, px_per_mm, page_w_mm, dpr)
+            self._tiles.put(tile_base + (row,), version, img)
+            tiles[i] = (row, img)
+        return tiles
+
+    def _request_tiles(self, task: EditorRenderTask) -> None:
+        """Start `task`, or queue it behind the running one (replacing any queued task)."""
+        if self._running_task_key == task.key:
+            return
+        if self._running_task_key is not None:
+            self._pending_task = task
+            return
+        self._running_task_key = task.key
+        self._pool.start(task)
+
+    @QtCore.Slot(object, object)
+    def _on_tiles_rendered(self, key: tuple, images: list) -> None:
+        tile_base, version, _rows = key
+        for row, img in images:
+            self._tiles.put(tile_base + (row,), version, img)
+        self._running_task_key = None
+        pending = self._pending_task
+        self._pending_task = None
+        # A queued task for an older version is dropped; the repaint below requests the current one
+        if pending is not None and pending.key[1] == self._content_version:
+            self._running_task_key = pending.key
+            self._pool.start(pending)
+        self._update_view()
+
+    def _tile_cache_bytes_from_prefs(self) -> int:
+        try:
+            mb = float(get_preferences().get('editor_tile_cache_mb', _DEFAULT_TILE_CACHE_MB))
+        except Exception:
+            mb = float(_DEFAULT_TILE_CACHE_MB)
+        return max(0, int(mb * 1024 * 1024))
 
     def apply_zoom_steps(self, steps: int) -> None:
         """Adjust zoom multiplicatively and preserve time-cursor anchoring."""
@@ -380,7 +579,7 @@ class CairoEditorWidget(QtWidgets.QWidget):
             self._scroll_logical_px = new_val
             self.scrollLogicalPxChanged.emit(new_val)
             self.scrollWheelUsed.emit()
-            self.update()
+            self._update_view()
         ev.accept()
 
     def mousePressEvent(self, ev: QtGui.QMouseEvent) -> None:
@@ -397,8 +596,7 @@ class CairoEditorWidget(QtWidgets.QWidget):
         except Exception:
             pass
         # On content changes, invalidate cached content
-        self._content_cache_image = None
-        self._content_cache_key = None
+        self._invalidate_content()
         if self._editor:
             if ev.button() == QtCore.Qt.MouseButton.LeftButton:
                 self._left_down = True
@@ -444,8 +642,9 @@ class CairoEditorWidget(QtWidgets.QWidget):
                 # Request repaint so shared guides render immediately
                 # Use overlay-only repaint if no buttons are pressed
                 if not (self._left_down or self._right_down):
-                    self._overlay_only_repaint = True
-                self.update()
+                    self._update_view()
+                else:
+                    self.update()
         super().mouseMoveEvent(ev)
 
     def mouseReleaseEvent(self, ev: QtGui.QMouseEvent) -> None:
@@ -458,8 +657,7 @@ class CairoEditorWidget(QtWidgets.QWidget):
         except Exception:
             pass
         # Content may have changed during drag; drop cache
-        self._content_cache_image = None
-        self._content_cache_key = None
+        self._invalidate_content()
         if self._editor:
             if ev.button() == QtCore.Qt.MouseButton.LeftButton:
                 self._left_down = False
@@ -504,8 +702,6 @@ class CairoEditorWidget(QtWidgets.QWidget):
                     hand = '<' if key == QtCore.Qt.Key_BracketLeft else '>'
                     if self._editor.set_selected_notes_hand(hand):
                         # Force full redraw (not overlay-only) so note styling updates immediately
-                        self._content_cache_image = None
-                        self._content_cache_key = None
                         self.update()
                         ev.accept()
                         return
@@ -651,8 +847,9 @@ class CairoEditorWidget(QtWidgets.QWidget):
         # Request repaint so shared guides render at the new position
         # Use overlay-only repaint when just moving the mouse (no buttons)
         if not (self._left_down or self._right_down):
-            self._overlay_only_repaint = True
-        self.update()
+            self._update_view()
+        else:
+            self.update()
         # Update status bar with note attributes if hovering a note rect
         try:
             self._update_hover_note_status(pos.x(), pos.y())
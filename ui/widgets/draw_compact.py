@@ -0,0 +1,285 @@
+from __future__ import annotations
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from ui.widgets.draw_pack import (KIND_LINE, KIND_OVAL, KIND_POLYLINE, KIND_RECT, KIND_TEXT,
+                                  _TEXT_BOLD, _TEXT_ITALIC, PrimitiveStore)
+from ui.widgets.draw_util import DrawUtil, Line, Oval, Polyline, Rect, Text
+
+# Compact DrawUtil backend
+# ------------------------
+# Problem solved: every add_* call kept a dataclass plus its Stroke/Fill,
+# tag list and hit-rect tuple alive, so an engraved score held hundreds of
+# thousands of small objects that dominated memory and garbage-collector
+# pauses. CompactDrawUtil stores each page in a PrimitiveStore (typed arrays
+# per primitive kind, interned colors, strokes, strings and tag sets); the
+# dataclass built by add_* is converted on append and dropped.
+#
+# `page.items` stays a sequence of Line/Rect/Oval/Polyline/Text instances:
+# thin views (two slots) over a store row, created on first access. Views
+# pass isinstance checks, so hit tests, tag queries and packing work as
+# before. Their geometry and style are read-only; strokes and fills are the
+# interned, shared objects. Tags can be edited through `tags` (the list it
+# returns writes back) or DrawUtil.add_tag/remove_tag.
+
+
+class _ViewTags(list):
+    """Tag list of a view; mutations are written back to the store."""
+
+    __slots__ = ('_view',)
+
+    def __init__(self, view: '_ItemView', tags: Iterable[str]) -> None:
+        super().__init__(tags)
+        self._view = view
+
+    def _sync(self) -> None:
+        self._view._store.set_tags(self._view._i, self)
+
+    def append(self, tag) -> None:
+        super().append(tag)
+        self._sync()
+
+    def extend(self, tags) -> None:
+        super().extend(tags)
+        self._sync()
+
+    def insert(self, index, tag) -> None:
+        super().insert(index, tag)
+        self._sync()
+
+    def remove(self, tag) -> None:
+        super().remove(tag)
+        self._sync()
+
+    def pop(self, index=-1):
+        tag = super().pop(index)
+        self._sync()
+        return tag
+
+    def clear(self) -> None:
+        super().clear()
+        self._sync()
+
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self._sync()
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._sync()
+
+    def __iadd__(self, tags):
+        super().extend(tags)
+        self._sync()
+        return self
+
+
+class _ItemView:
+    """Fields shared by all primitive kinds, read from store row `_i`."""
+
+    __slots__ = ('_store', '_i')
+
+    def __init__(self, store: PrimitiveStore, i: int) -> None:
+        self._store = store
+        self._i = i
+
+    @property
+    def _ref(self) -> int:
+        return self._store.item_ref[self._i]
+
+    @property
+    def id(self) -> int:
+        return int(self._store.item_id[self._i])
+
+    @property
+    def tags(self) -> List[str]:
+        store = self._store
+        return _ViewTags(self, store.tagsets[store.item_tags[self._i]])
+
+    @tags.setter
+    def tags(self, value: Iterable[str]) -> None:
+        self._store.set_tags(self._i, list(value or ()))
+
+    @property
+    def hit_rect_mm(self) -> Optional[Tuple[float, float, float, float]]:
+        hit = self._store.item_hit
+        k = 4 * self._i
+        hx = hit[k]
+        return None if hx != hx else (hx, hit[k + 1], hit[k + 2], hit[k + 3])
+
+    def _stroke_ref(self, refs) -> object:
+        s = refs[self._ref]
+        return self._store.strokes[s] if s >= 0 else None
+
+    def _fill_ref(self, refs) -> object:
+        f = refs[self._ref]
+        return self._store.fills[f] if f >= 0 else None
+
+
+class LineView(_ItemView, Line):
+    __slots__ = ()
+
+    x1_mm = property(lambda self: self._store.line_xy[4 * self._ref])
+    y1_mm = property(lambda self: self._store.line_xy[4 * self._ref + 1])
+    x2_mm = property(lambda self: self._store.line_xy[4 * self._ref + 2])
+    y2_mm = property(lambda self: self._store.line_xy[4 * self._ref + 3])
+    stroke = property(lambda self: self._stroke_ref(self._store.line_stroke))
+
+
+class _BoxView(_ItemView):
+    __slots__ = ()
+
+    x_mm = property(lambda self: self._store.box_xywh[4 * self._ref])
+    y_mm = property(lambda self: self._store.box_xywh[4 * self._ref + 1])
+    w_mm = property(lambda self: self._store.box_xywh[4 * self._ref + 2])
+    h_mm = property(lambda self: self._store.box_xywh[4 * self._ref + 3])
+    stroke = property(lambda self: self._stroke_ref(self._store.box_stroke))
+    fill = property(lambda self: self._fill_ref(self._store.box_fill))
+
+
+class RectView(_BoxView, Rect):
+    __slots__ = ()
+
+
+class OvalView(_BoxView, Oval):
+    __slots__ = ()
+
+
+class PolylineView(_ItemView, Polyline):
+    __slots__ = ()
+
+    points_mm = property(lambda self: self._store._points(self._ref))
+    closed = property(lambda self: bool(self._store.poly_closed[self._ref]))
+    stroke = property(lambda self: self._stroke_ref(self._store.poly_stroke))
+    fill = property(lambda self: self._fill_ref(self._store.poly_fill))
+
+
+class TextView(_ItemView, Text):
+    __slots__ = ()
+
+    x_mm = property(lambda self: self._store.text_num[4 * self._ref])
+    y_mm = property(lambda self: self._store.text_num[4 * self._ref + 1])
+    size_pt = property(lambda self: self._store.text_num[4 * self._ref + 2])
+    angle_deg = property(lambda self: self._store.text_num[4 * self._ref + 3])
+    text = property(lambda self: self._store.strings[self._store.text_str[self._ref]])
+    family = property(lambda self: self._store.strings[self._store.text_family[self._ref]])
+    italic = property(lambda self: bool(self._store.text_flags[self._ref] & _TEXT_ITALIC))
+    bold = property(lambda self: bool(self._store.text_flags[self._ref] & _TEXT_BOLD))
+    color = property(lambda self: self._store.colors[self._store.text_color[self._ref]])
+
+    @property
+    def anchor(self) -> Optional[str]:
+        idx = self._store.text_anchor[self._ref]
+        return None if idx < 0 else self._store.strings[idx]
+
+
+_VIEW_CLASSES = {
+    KIND_LINE: LineView,
+    KIND_RECT: RectView,
+    KIND_OVAL: OvalView,
+    KIND_POLYLINE: PolylineView,
+    KIND_TEXT: TextView,
+}
+
+
+class CompactItems:
+    """List-like `items` of a CompactPage.
+
+    Supports what DrawUtil and the engraver do with `page.items`: len,
+    indexing, slicing, iteration, append and extend. Appended objects are
+    copied into the store; the views that stand for them are created on
+    first access and then kept, so identity is stable.
+    """
+
+    __slots__ = ('store', '_views')
+
+    def __init__(self, store: PrimitiveStore) -> None:
+        self.store = store
+        self._views: List[Optional[_ItemView]] = [None] * len(store)
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def _view(self, i: int) -> _ItemView:
+        view = self._views[i]
+        if view is None:
+            store = self.store
+            view = _VIEW_CLASSES[store.item_kind[i]](store, i)
+            self._views[i] = view
+        return view
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._view(i) for i in range(*index.indices(len(self._views)))]
+        if index < 0:
+            index += len(self._views)
+        if not (0 <= index < len(self._views)):
+            raise IndexError("item index out of range")
+        return self._view(index)
+
+    def __iter__(self):
+        for i in range(len(self._views)):
+            yield self._view(i)
+
+    def append(self, item: object) -> None:
+        if self.store.add_item(item):
+            self._views.append(None)
+
+    def extend(self, items: Iterable[object]) -> None:
+        for item in items:
+            self.append(item)
+
+
+class CompactPage:
+    """Page whose primitives live in a PrimitiveStore; see module comment."""
+
+    def __init__(self, width_mm: float, height_mm: float) -> None:
+        self.width_mm = width_mm
+        self.height_mm = height_mm
+        self.store = PrimitiveStore()
+        self._items = CompactItems(self.store)
+        self._grid = None
+        self._layers = None
+        self._tags = None
+
+    @property
+    def items(self) -> CompactItems:
+        return self._items
+
+    @items.setter
+    def items(self, value: Iterable[object]) -> None:
+        """Rebuild the store from `value` (e.g. after delete_with_tags).
+
+        Views of this page are moved to their new rows instead of copied,
+        so references held by callers and tag indices stay valid.
+        """
+        old = self.store
+        store = PrimitiveStore()
+        views: List[Optional[_ItemView]] = []
+        for item in list(value):
+            if not store.add_item(item):
+                continue
+            if isinstance(item, _ItemView) and item._store is old:
+                item._store = store
+                item._i = len(views)
+                views.append(item)
+            else:
+                views.append(None)
+        self.store = store
+        self._items = CompactItems(store)
+        self._items._views = views
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def draw_into(self, du: DrawUtil, ctx, clip_rect_mm: Optional[Tuple[float, float, float, float]],
+                  layering: Sequence[str]) -> None:
+        """Draw straight from the arrays, like an unmaterialized PackedPage."""
+        self.store.draw_range(du, ctx, 0, len(self.store), clip_rect_mm, layering)
+
+
+class CompactDrawUtil(DrawUtil):
+    """DrawUtil whose pages keep primitives in typed arrays instead of objects."""
+
+    def new_page(self, width_mm: float, height_mm: float) -> None:
+        self._pages.append(CompactPage(width_mm, height_mm))
+        self._current_index = len(self._pages) - 1
@@ -0,0 +1,544 @@
+from __future__ import annotations
+from array import array
+from typing import List, Optional, Sequence, Tuple
+import json, math, struct, sys
+from multiprocessing import shared_memory
+
+from ui.widgets.draw_util import (DrawUtil, Fill, Line, Oval, Page, Polyline, Rect, Stroke, Text,
+                                  _PathBatch, _fill_visible, _shape_batch_key, _stroke_batch_key)
+
+# Packed page buffer
+# ------------------
+# Problem solved: pickling a DrawUtil with tens of thousands of dataclass
+# items is slow on both sides of the worker pipe. The packed form stores all
+# primitives of all pages in a handful of flat typed arrays plus small
+# interned tables (strings, tag sets, strokes, colors), so it can be written
+# into one shared-memory block and drawn straight from memoryviews.
+#
+# Buffer layout: header struct, JSON meta (tables, pages, section offsets),
+# then 8-byte aligned array sections in native byte order.
+
+_MAGIC = b'DUPK'
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sII')
+
+KIND_LINE = 0
+KIND_RECT = 1
+KIND_OVAL = 2
+KIND_POLYLINE = 3
+KIND_TEXT = 4
+
+_TEXT_ITALIC = 1
+_TEXT_BOLD = 2
+
+# name -> typecode, in buffer order
+_SECTIONS: Tuple[Tuple[str, str], ...] = (
+    ('item_kind', 'B'),
+    ('item_ref', 'i'),
+    ('item_tags', 'i'),
+    ('item_id', 'q'),
+    ('item_hit', 'd'),       # 4 per item; NaN x when the item has no hit rect
+    ('line_xy', 'd'),        # 4 per line
+    ('line_stroke', 'i'),
+    ('box_xywh', 'd'),       # 4 per rect/oval
+    ('box_stroke', 'i'),     # -1 = no stroke
+    ('box_fill', 'i'),       # -1 = no fill
+    ('poly_start', 'i'),     # offset into poly_pts (in points)
+    ('poly_count', 'i'),
+    ('poly_closed', 'B'),
+    ('poly_stroke', 'i'),
+    ('poly_fill', 'i'),
+    ('poly_pts', 'd'),       # x,y pairs
+    ('text_num', 'd'),       # x, y, size_pt, angle_deg per text
+    ('text_str', 'i'),
+    ('text_family', 'i'),
+    ('text_anchor', 'i'),    # -1 = no anchor
+    ('text_color', 'i'),
+    ('text_flags', 'B'),
+)
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class _Interner:
+    def __init__(self) -> None:
+        self.values: list = []
+        self._index: dict = {}
+
+    def get(self, value) -> int:
+        idx = self._index.get(value)
+        if idx is None:
+            idx = len(self.values)
+            self._index[value] = idx
+            self.values.append(value)
+        return idx
+
+
+class _PackedTables:
+    """Reading and drawing over the _SECTIONS arrays and their tables.
+
+    Shared by PackedDocument (read-only buffer) and PrimitiveStore (growable
+    arrays). Both expose every section as an attribute plus `strings`,
+    `tagsets` (tuples of tag strings), `colors`, `strokes` and `fills`.
+    """
+
+    def layer_lookup(self, layering: Sequence[str]) -> List[int]:
+        """Layer index per tag set, matching DrawUtil._item_layer_index."""
+        order = {name: i for i, name in reversed(list(enumerate(layering)))}
+        fallback = len(layering)
+        return [min((order.get(t, fallback) for t in tags), default=fallback) for tags in self.tagsets]
+
+    def materialize(self, i: int) -> object:
+        """Build the DrawUtil dataclass for packed item i."""
+        kind = self.item_kind[i]
+        ref = self.item_ref[i]
+        tags = list(self.tagsets[self.item_tags[i]])
+        item_id = int(self.item_id[i])
+        hx = self.item_hit[4 * i]
+        hit = None if hx != hx else (hx, self.item_hit[4 * i + 1], self.item_hit[4 * i + 2], self.item_hit[4 * i + 3])
+        if kind == KIND_LINE:
+            x1, y1, x2, y2 = self.line_xy[4 * ref:4 * ref + 4]
+            return Line(x1, y1, x2, y2, stroke=self._stroke_at(self.line_stroke[ref]),
+                        id=item_id, tags=tags, hit_rect_mm=hit)
+        if kind == KIND_RECT or kind == KIND_OVAL:
+            x, y, w, h = self.box_xywh[4 * ref:4 * ref + 4]
+            cls = Rect if kind == KIND_RECT else Oval
+            return cls(x, y, w, h, stroke=self._stroke_at(self.box_stroke[ref]),
+                       fill=self._fill_at(self.box_fill[ref]), id=item_id, tags=tags, hit_rect_mm=hit)
+        if kind == KIND_POLYLINE:
+            return Polyline(self._points(ref), closed=bool(self.poly_closed[ref]),
+                            stroke=self._stroke_at(self.poly_stroke[ref]),
+                            fill=self._fill_at(self.poly_fill[ref]), id=item_id, tags=tags, hit_rect_mm=hit)
+        x, y, size, angle = self.text_num[4 * ref:4 * ref + 4]
+        flags = self.text_flags[ref]
+        anchor_idx = self.text_anchor[ref]
+        return Text(x, y, self.strings[self.text_str[ref]], family=self.strings[self.text_family[ref]],
+                    size_pt=size, italic=bool(flags & _TEXT_ITALIC), bold=bool(flags & _TEXT_BOLD),
+                    color=self.colors[self.text_color[ref]],
+                    anchor=None if anchor_idx < 0 else self.strings[anchor_idx],
+                    angle_deg=angle, id=item_id, tags=tags, hit_rect_mm=hit)
+
+    def _stroke_at(self, idx: int) -> Optional[Stroke]:
+        if idx < 0:
+            return None
+        s = self.strokes[idx]
+        return Stroke(color=s.color, width_mm=s.width_mm,
+                      dash_pattern_mm=list(s.dash_pattern_mm) if s.dash_pattern_mm else None,
+                      dash_offset_mm=s.dash_offset_mm, line_cap=s.line_cap)
+
+    def _fill_at(self, idx: int) -> Optional[Fill]:
+        return None if idx < 0 else Fill(color=self.colors[idx])
+
+    def _points(self, ref: int) -> List[Tuple[float, float]]:
+        start = self.poly_start[ref]
+        count = self.poly_count[ref]
+        flat = self.poly_pts[2 * start:2 * (start + count)]
+        return list(zip(flat[0::2], flat[1::2]))
+
+    def draw_range(self, du: DrawUtil, ctx, start: int, count: int,
+                   clip_rect_mm: Optional[Tuple[float, float, float, float]],
+                   layering: Sequence[str]) -> None:
+        """Draw items start..start+count straight from the arrays, in layer order."""
+        indices = range(start, start + count)
+        hit = self.item_hit
+        if clip_rect_mm is not None:
+            cx, cy, cw, ch = clip_rect_mm
+            kept = []
+            for i in indices:
+                hx = hit[4 * i]
+                if hx != hx:
+                    kept.append(i)
+                    continue
+                hy = hit[4 * i + 1]
+                if not (hx + hit[4 * i + 2] < cx or cx + cw < hx or hy + hit[4 * i + 3] < cy or cy + ch < hy):
+                    kept.append(i)
+            indices = kept
+        layer_of = self.layer_lookup(layering)
+        item_tags = self.item_tags
+        # Bucket by layer; insertion order is kept inside a layer.
+        buckets: List[List[int]] = [[] for _ in range(len(layering) + 1)]
+        for i in indices:
+            buckets[layer_of[item_tags[i]]].append(i)
+        ordered = [i for bucket in buckets for i in bucket]
+
+        kinds = self.item_kind
+        refs = self.item_ref
+        strokes = self.strokes
+        fills = self.fills
+        # Merge same-style runs (see draw_util._PathBatch); keys are memoized
+        # per interned stroke/fill pair.
+        batch = _PathBatch(du, ctx) if du.batch_paths else None
+        shape_keys: dict = {}
+        for i in ordered:
+            kind = kinds[i]
+            ref = refs[i]
+            if kind == KIND_LINE:
+                k = 4 * ref
+                xy = self.line_xy
+                s = self.line_stroke[ref]
+                stroke = strokes[s] if s >= 0 else None
+                if batch is not None:
+                    key = shape_keys.get((kind, s))
+                    if key is None:
+                        key = shape_keys[(kind, s)] = _stroke_batch_key(stroke) or False
+                    if key and batch.line(xy[k], xy[k + 1], xy[k + 2], xy[k + 3], stroke, key):
+                        continue
+                    batch.flush()
+                du._draw_line_at(ctx, xy[k], xy[k + 1], xy[k + 2], xy[k + 3], stroke)
+            elif kind == KIND_RECT or kind == KIND_OVAL:
+                k = 4 * ref
+                b = self.box_xywh
+                s = self.box_stroke[ref]
+                f = self.box_fill[ref]
+                stroke = strokes[s] if s >= 0 else None
+                fill = fills[f] if f >= 0 else None
+                if batch is not None:
+                    if kind == KIND_RECT:
+                        key = shape_keys.get((kind, s, f))
+                        if key is None:
+                            key = _shape_batch_key(stroke, _fill_visible(fill), fill, True)
+                            key = shape_keys[(kind, s, f)] = False if key is None else key
+                        if key is not False and batch.rect(b[k], b[k + 1], b[k + 2], b[k + 3], stroke, fill, key):
+                            continue
+                    batch.flush()
+                draw = du._draw_rect_at if kind == KIND_RECT else du._draw_oval_at
+                draw(ctx, b[k], b[k + 1], b[k + 2], b[k + 3], stroke, fill)
+            elif kind == KIND_POLYLINE:
+                s = self.poly_stroke[ref]
+                f = self.poly_fill[ref]
+                stroke = strokes[s] if s >= 0 else None
+                fill = fills[f] if f >= 0 else None
+                closed = bool(self.poly_closed[ref])
+                if batch is not None:
+                    if batch.polyline(self._points(ref), closed, stroke, fill):
+                        continue
+                du._draw_polyline_at(ctx, self._points(ref), closed, stroke, fill)
+            elif kind == KIND_TEXT:
+                if batch is not None:
+                    batch.flush()
+                k = 4 * ref
+                num = self.text_num
+                flags = self.text_flags[ref]
+                anchor_idx = self.text_anchor[ref]
+                hx = hit[4 * i]
+                du._draw_text_at(ctx, num[k], num[k + 1], self.strings[self.text_str[ref]],
+                                 self.strings[self.text_family[ref]], num[k + 2],
+                                 bool(flags & _TEXT_ITALIC), bool(flags & _TEXT_BOLD),
+                                 self.colors[self.text_color[ref]],
+                                 None if anchor_idx < 0 else self.strings[anchor_idx], num[k + 3],
+                                 None if hx != hx else (hx, hit[4 * i + 1], hit[4 * i + 2], hit[4 * i + 3]))
+        if batch is not None:
+            batch.flush()
+
+
+class PrimitiveStore(_PackedTables):
+    """Growable struct-of-arrays storage for DrawUtil primitives.
+
+    Items are appended as rows of the _SECTIONS arrays; colors, strokes,
+    strings and tag sets are interned. The layout is the one of the packed
+    buffer, so a store can be drawn like a PackedDocument and packed without
+    converting items.
+    """
+
+    def __init__(self) -> None:
+        self._arrays = {name: array(code) for name, code in _SECTIONS}
+        for name, arr in self._arrays.items():
+            setattr(self, name, arr)
+        self._strings = _Interner()
+        self._tagsets = _Interner()
+        self._strokes = _Interner()
+        self._colors = _Interner()
+        self.strings: List[str] = self._strings.values
+        self.colors: List[Tuple[float, ...]] = self._colors.values
+        self.tagsets: List[Tuple[str, ...]] = []
+        self.strokes: List[Stroke] = []
+        self.fills: List[Fill] = []
+
+    def __len__(self) -> int:
+        return len(self.item_kind)
+
+    def _color(self, color) -> int:
+        idx = self._colors.get(tuple(float(c) for c in color))
+        if idx == len(self.fills):
+            self.fills.append(Fill(color=self.colors[idx]))
+        return idx
+
+    def _stroke(self, stroke: Optional[Stroke]) -> int:
+        if not stroke:
+            return -1
+        dash = stroke.dash_pattern_mm
+        key = (self._color(stroke.color), float(stroke.width_mm),
+               tuple(float(d) for d in dash) if dash else None,
+               float(stroke.dash_offset_mm), str(stroke.line_cap))
+        idx = self._strokes.get(key)
+        if idx == len(self.strokes):
+            c, w, d, o, cap = key
+            self.strokes.append(Stroke(color=self.colors[c], width_mm=w, dash_pattern_mm=(list(d) if d else None),
+                                       dash_offset_mm=o, line_cap=cap))
+        return idx
+
+    def _fill(self, fill: Optional[Fill]) -> int:
+        if not fill:
+            return -1
+        return self._color(fill.color)
+
+    def _tagset(self, tags) -> int:
+        key = tuple(self._strings.get(str(t)) for t in (tags or ()))
+        idx = self._tagsets.get(key)
+        if idx == len(self.tagsets):
+            self.tagsets.append(tuple(self.strings[i] for i in key))
+        return idx
+
+    def add_item(self, item: object) -> bool:
+        """Append one DrawUtil item; False for objects that are no primitive."""
+        a = self._arrays
+        if isinstance(item, Line):
+            kind = KIND_LINE
+            ref = len(a['line_stroke'])
+            a['line_xy'].extend((item.x1_mm, item.y1_mm, item.x2_mm, item.y2_mm))
+            a['line_stroke'].append(self._stroke(item.stroke))
+        elif isinstance(item, (Rect, Oval)):
+            kind = KIND_RECT if isinstance(item, Rect) else KIND_OVAL
+            ref = len(a['box_stroke'])
+            a['box_xywh'].extend((item.x_mm, item.y_mm, item.w_mm, item.h_mm))
+            a['box_stroke'].append(self._stroke(item.stroke))
+            a['box_fill'].append(self._fill(item.fill))
+        elif isinstance(item, Polyline):
+            kind = KIND_POLYLINE
+            ref = len(a['poly_start'])
+            pts = a['poly_pts']
+            a['poly_start'].append(len(pts) // 2)
+            a['poly_count'].append(len(item.points_mm))
+            for (x, y) in item.points_mm:
+                pts.append(x)
+                pts.append(y)
+            a['poly_closed'].append(1 if item.closed else 0)
+            a['poly_stroke'].append(self._stroke(item.stroke))
+            a['poly_fill'].append(self._fill(item.fill))
+        elif isinstance(item, Text):
+            kind = KIND_TEXT
+            ref = len(a['text_str'])
+            a['text_num'].extend((item.x_mm, item.y_mm, item.size_pt, float(item.angle_deg or 0.0)))
+            a['text_str'].append(self._strings.get(str(item.text)))
+            a['text_family'].append(self._strings.get(str(item.family)))
+            anchor = getattr(item, 'anchor', None)
+            a['text_anchor'].append(-1 if anchor is None else self._strings.get(str(anchor)))
+            a['text_color'].append(self._color(item.color))
+            a['text_flags'].append((_TEXT_ITALIC if item.italic else 0) | (_TEXT_BOLD if item.bold else 0))
+        else:
+            return False
+        a['item_kind'].append(kind)
+        a['item_ref'].append(ref)
+        a['item_tags'].append(self._tagset(getattr(item, 'tags', None)))
+        a['item_id'].append(int(getattr(item, 'id', 0) or 0))
+        rect = getattr(item, 'hit_rect_mm', None)
+        if rect is None:
+            a['item_hit'].extend((math.nan, 0.0, 0.0, 0.0))
+        else:
+            a['item_hit'].extend(rect)
+        return True
+
+    def set_tags(self, i: int, tags) -> None:
+        self.item_tags[i] = self._tagset(tags)
+
+
+class PackedBuilder:
+    """Collects DrawUtil pages into flat arrays; see module comment for the layout."""
+
+    def __init__(self, pages: Sequence[Page], current_index: int = -1) -> None:
+        self._pages: list = []
+        self._current_index = int(current_index)
+        store = getattr(pages[0], 'store', None) if len(pages) == 1 else None
+        if isinstance(store, PrimitiveStore):
+            # A single compact page already has the packed layout.
+            self._store = store
+            self._pages.append([float(pages[0].width_mm), float(pages[0].height_mm), 0, len(store)])
+        else:
+            self._store = PrimitiveStore()
+            for page in pages:
+                start = len(self._store)
+                for item in page.items:
+                    self._store.add_item(item)
+                self._pages.append([float(page.width_mm), float(page.height_mm), start,
+                                    len(self._store) - start])
+        self._arrays = self._store._arrays
+        self._meta_bytes, self._sections, self._data_size = self._layout()
+
+    def _layout(self):
+        sections = []
+        offset = 0
+        for name, code in _SECTIONS:
+            arr = self._arrays[name]
+            sections.append([name, code, offset, len(arr)])
+            offset = _align8(offset + len(arr) * arr.itemsize)
+        store = self._store
+        meta = {
+            'byteorder': sys.byteorder,
+            'pages': self._pages,
+            'current_index': self._current_index,
+            'strings': store._strings.values,
+            'tagsets': [list(t) for t in store._tagsets.values],
+            'strokes': [[c, w, list(d) if d else None, o, cap] for (c, w, d, o, cap) in store._strokes.values],
+            'colors': [list(c) for c in store._colors.values],
+            'sections': sections,
+            'data_size': offset,
+        }
+        return json.dumps(meta, separators=(',', ':')).encode('utf-8'), sections, offset
+
+    @property
+    def nbytes(self) -> int:
+        return self._data_offset() + self._data_size
+
+    def _data_offset(self) -> int:
+        return _align8(_HEADER.size + len(self._meta_bytes))
+
+    def write_into(self, buf) -> int:
+        """Write the packed buffer into a writable buffer of at least `nbytes`."""
+        mv = memoryview(buf).cast('B')
+        head = _HEADER.pack(_MAGIC, _FORMAT_VERSION, len(self._meta_bytes))
+        mv[:_HEADER.size] = head
+        mv[_HEADER.size:_HEADER.size + len(self._meta_bytes)] = self._meta_bytes
+        base = self._data_offset()
+        for name, _code, offset, _count in self._sections:
+            raw = self._arrays[name].tobytes()
+            if raw:
+                mv[base + offset:base + offset + len(raw)] = raw
+        n = self.nbytes
+        mv.release()
+        return n
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(self.nbytes)
+        self.write_into(out)
+        return bytes(out)
+
+
+def pack_pages(pages: Sequence[Page], current_index: int = -1) -> bytes:
+    """Pack DrawUtil pages into a single bytes buffer."""
+    return PackedBuilder(pages, current_index).to_bytes()
+
+
+def pack_to_shared_memory(pages: Sequence[Page], current_index: int = -1) -> shared_memory.SharedMemory:
+    """Pack DrawUtil pages directly into a new shared-memory block.
+
+    The caller keeps the returned handle open until the receiver has
+    attached; the receiver owns unlinking (see PackedDocument.attach_shared).
+    """
+    builder = PackedBuilder(pages, current_index)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, builder.nbytes))
+    builder.write_into(shm.buf)
+    return shm
+
+
+class PackedDocument(_PackedTables):
+    """Read-only view over a packed buffer."""
+
+    def __init__(self, buffer) -> None:
+        self._views: list = []
+        mv = memoryview(buffer).cast('B')
+        self._views.append(mv)
+        magic, version, meta_len = _HEADER.unpack_from(mv, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            self.close()
+            raise ValueError('Not a packed DrawUtil buffer (or unsupported version)')
+        meta = json.loads(bytes(mv[_HEADER.size:_HEADER.size + meta_len]).decode('utf-8'))
+        if meta.get('byteorder') != sys.byteorder:
+            self.close()
+            raise ValueError('Packed DrawUtil buffer has foreign byte order')
+        base = _align8(_HEADER.size + meta_len)
+        for name, code, offset, count in meta['sections']:
+            size = array(code).itemsize
+            view = mv[base + offset:base + offset + count * size].cast(code)
+            self._views.append(view)
+            setattr(self, name, view)
+        self.strings: List[str] = list(meta['strings'])
+        self.tagsets: List[Tuple[str, ...]] = [tuple(self.strings[i] for i in t) for t in meta['tagsets']]
+        self.colors: List[Tuple[float, ...]] = [tuple(c) for c in meta['colors']]
+        self.strokes: List[Stroke] = [
+            Stroke(color=self.colors[c], width_mm=w, dash_pattern_mm=(list(d) if d else None),
+                   dash_offset_mm=o, line_cap=cap)
+            for (c, w, d, o, cap) in meta['strokes']
+        ]
+        self.fills: List[Fill] = [Fill(color=c) for c in self.colors]
+        self.current_index: int = int(meta.get('current_index', -1))
+        self.pages: List[PackedPage] = [
+            PackedPage(self, float(w), float(h), int(start), int(count))
+            for (w, h, start, count) in meta['pages']
+        ]
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'PackedDocument':
+        return cls(data)
+
+    @classmethod
+    def attach_shared(cls, name: str) -> 'PackedDocument':
+        """Read a block written by pack_to_shared_memory and release it.
+
+        Problem solved: the block must be freed exactly once, also when the
+        result turns out to be stale. Copying it out is a single memcpy, after
+        which the segment is closed and unlinked right away and the document
+        has no ties to the worker's memory.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            data = bytes(shm.buf)
+        finally:
+            shm.close()
+            try:
+                shm.unlink()
+            except Exception:
+                pass
+        return cls(data)
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            try:
+                view.release()
+            except Exception:
+                pass
+        self._views = []
+
+
+class PackedPage:
+    """Page backed by a PackedDocument.
+
+    Drawing reads the flat arrays directly. Code that needs item objects
+    (hit tests, tag queries, edits) gets them through `items`, which
+    materializes the page once; from then on the page behaves like a
+    regular Page and draws from its items.
+    """
+
+    def __init__(self, doc: PackedDocument, width_mm: float, height_mm: float, start: int, count: int) -> None:
+        self.doc = doc
+        self.width_mm = width_mm
+        self.height_mm = height_mm
+        self._start = start
+        self._count = count
+        self._items: Optional[List[object]] = None
+        self._grid = None
+        self._layers = None
+        self._tags = None
+
+    @property
+    def items(self) -> List[object]:
+        if self._items is None:
+            doc = self.doc
+            self._items = [doc.materialize(i) for i in range(self._start, self._start + self._count)]
+        return self._items
+
+    @items.setter
+    def items(self, value: List[object]) -> None:
+        self._items = list(value)
+
+    def __len__(self) -> int:
+        return self._count if self._items is None else len(self._items)
+
+    def draw_into(self, du: DrawUtil, ctx, clip_rect_mm: Optional[Tuple[float, float, float, float]],
+                  layering: Sequence[str]) -> None:
+        """Draw this page in layer order; mirrors DrawUtil._iter_items_in_editor_order."""
+        if self._items is not None:
+            du._draw_items(ctx, du._iter_items_in_editor_order(self, clip_rect_mm, layering))
+            return
+        self.doc.draw_range(du, ctx, self._start, self._count, clip_rect_mm, layering)
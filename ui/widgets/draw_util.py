@@ -1,9 +1,8 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Callable, Iterable, List, Optional, Sequence, Tuple
-import os, math
+import bisect, os, math
 import cairo
-from PySide6 import QtGui
 from utils.CONSTANT import EDITOR_LAYERING
 
 MM_PER_INCH = 25.4
@@ -85,6 +84,302 @@ class Page:
     width_mm: float
     height_mm: float
     items: List[object] = field(default_factory=list)
+    # Spatial index over the items' hit rects; built on demand by DrawUtil.
+    _grid: Optional["_SpatialGrid"] = field(default=None, init=False, repr=False, compare=False)
+    # Items grouped by layer for the last layering drawn; see _LayerBuckets.
+    _layers: Optional["_LayerBuckets"] = field(default=None, init=False, repr=False, compare=False)
+    # Tag -> items lookup; built by the first tag query, see _TagIndex.
+    _tags: Optional["_TagIndex"] = field(default=None, init=False, repr=False, compare=False)
+
+
+# ---- Spatial index ----
+
+# Grid cell edge in mm; a notehead or stem spans one or two cells.
+_GRID_CELL_MM = 8.0
+# Items covering more cells than this (page backgrounds, long lines) are not
+# bucketed; every query tests them directly.
+_GRID_MAX_ITEM_CELLS = 64
+
+
+class _SpatialGrid:
+    """Uniform grid over the hit rects of one page's items.
+
+    Problem solved: clip culling and hit tests scanned every item of a page,
+    so each repaint and click cost time linear in the primitive count. The
+    grid maps cells to item indices; a query only visits the cells it
+    overlaps and returns candidates in insertion order, so callers keep
+    their exact rect tests and ordering.
+
+    Cells live in a dict, so a tall editor page costs only what it holds.
+    The grid follows `page.items` by identity and length: appended items are
+    bucketed on the next query, a replaced or shortened list (deletes) makes
+    it start over. Items without a hit rect are returned by every query.
+    """
+
+    __slots__ = ('items', 'count', 'built', 'cells', 'unbounded')
+
+    def __init__(self, items: List[object]) -> None:
+        self.items = items
+        self.count = 0
+        self.built = False
+        self.cells: dict[tuple[int, int], List[int]] = {}
+        self.unbounded: List[int] = []
+
+    def matches(self, items: List[object]) -> bool:
+        return items is self.items and len(items) >= self.count
+
+    def update(self) -> None:
+        """Bucket the items appended since the last update."""
+        items = self.items
+        end = len(items)
+        if self.built and self.count == end:
+            return
+        cells = self.cells
+        unbounded = self.unbounded
+        inv = 1.0 / _GRID_CELL_MM
+        floor = math.floor
+        for idx in range(self.count, end):
+            rect = getattr(items[idx], "hit_rect_mm", None)
+            if rect is None:
+                unbounded.append(idx)
+                continue
+            try:
+                x, y, w, h = rect
+                cx0 = floor(x * inv)
+                cy0 = floor(y * inv)
+                cx1 = floor((x + w) * inv)
+                cy1 = floor((y + h) * inv)
+            except (ValueError, OverflowError):
+                unbounded.append(idx)
+                continue
+            if cx1 < cx0 or cy1 < cy0 or (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > _GRID_MAX_ITEM_CELLS:
+                unbounded.append(idx)
+                continue
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket is None:
+                        cells[(cx, cy)] = [idx]
+                    else:
+                        bucket.append(idx)
+        self.count = end
+        self.built = True
+
+    def candidates(self, rect_mm: Tuple[float, float, float, float]) -> List[int]:
+        """Sorted indices of items that may intersect rect_mm."""
+        x, y, w, h = rect_mm
+        inv = 1.0 / _GRID_CELL_MM
+        cx0 = math.floor(x * inv)
+        cy0 = math.floor(y * inv)
+        cx1 = math.floor((x + w) * inv)
+        cy1 = math.floor((y + h) * inv)
+        found = set(self.unbounded)
+        cells = self.cells
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(cells):
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket is not None:
+                        found.update(bucket)
+        else:
+            for (cx, cy), bucket in cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    found.update(bucket)
+        return sorted(found)
+
+
+class _LayerBuckets:
+    """A page's items grouped by layer index for one layering.
+
+    Problem solved: every render sorted all items of the page by layer,
+    resolving each tag with `layering.index`. Items are bucketed once, in
+    insertion order, with the layer of each tag combination memoized; a full
+    draw is the buckets concatenated and a culled draw distributes its few
+    indices over the buckets. No comparison sort is involved and the order
+    equals the former (layer, insertion index) sort.
+
+    Like _SpatialGrid it follows `page.items` by identity and length. Tag
+    edits through DrawUtil.add_tag/remove_tag drop the buckets.
+    """
+
+    __slots__ = ('items', 'count', 'layering', 'rank', 'memo', 'buckets', 'layer_of')
+
+    def __init__(self, items: List[object], layering: Tuple[str, ...]) -> None:
+        self.items = items
+        self.count = 0
+        self.layering = layering
+        self.rank: dict[str, int] = {}
+        for i, name in enumerate(layering):
+            self.rank.setdefault(name, i)
+        self.memo: dict[tuple, int] = {}
+        self.buckets: List[List[object]] = [[] for _ in range(len(layering) + 1)]
+        self.layer_of: List[int] = []
+
+    def matches(self, items: List[object], layering: Tuple[str, ...]) -> bool:
+        return items is self.items and len(items) >= self.count and layering == self.layering
+
+    def update(self) -> None:
+        """Bucket the items appended since the last update."""
+        items = self.items
+        end = len(items)
+        if self.count == end:
+            return
+        rank = self.rank
+        memo = self.memo
+        buckets = self.buckets
+        layer_of = self.layer_of
+        fallback = len(self.layering)
+        for idx in range(self.count, end):
+            item = items[idx]
+            key = tuple(getattr(item, "tags", ()) or ())
+            layer = memo.get(key)
+            if layer is None:
+                layer = min((rank.get(t, fallback) for t in key), default=fallback)
+                memo[key] = layer
+            buckets[layer].append(item)
+            layer_of.append(layer)
+        self.count = end
+
+    def ordered(self, indices: Optional[Iterable[int]] = None) -> Iterable[object]:
+        """Items in drawing order; only `indices` (ascending) when given."""
+        if indices is None:
+            for bucket in self.buckets:
+                yield from bucket
+            return
+        items = self.items
+        layer_of = self.layer_of
+        picked: List[List[object]] = [[] for _ in self.buckets]
+        for idx in indices:
+            picked[layer_of[idx]].append(items[idx])
+        for bucket in picked:
+            yield from bucket
+
+
+class _TagIndex:
+    """Tag -> items lookup for one page.
+
+    Problem solved: find_with_tag, find_all and delete_with_tags scanned every
+    item and built a tag set per item. Every item gets a sequence number that
+    only grows, so page order is seq order. The index keeps, per tag, the
+    seqs and items carrying it. Queries and bulk deletes then touch only the
+    matching items.
+
+    Like _SpatialGrid it follows `page.items` by identity and length:
+    appended items are indexed on the next query, a list replaced behind its
+    back is indexed again. DrawUtil.add_tag/remove_tag and delete_with_tags
+    keep it current.
+    """
+
+    __slots__ = ('items', 'count', 'seqs', 'next_seq', 'by_tag', 'seq_of')
+
+    # seq_of value for an object that occurs more than once on the page.
+    _SHARED = -1
+
+    def __init__(self, items: List[object]) -> None:
+        self.items = items
+        self.count = 0
+        self.seqs: List[int] = []
+        self.next_seq = 0
+        self.by_tag: dict[str, dict[int, object]] = {}
+        self.seq_of: dict[int, int] = {}
+
+    def matches(self, items: List[object]) -> bool:
+        return items is self.items and len(items) >= self.count
+
+    def update(self) -> None:
+        """Index the items appended since the last update."""
+        items = self.items
+        end = len(items)
+        if self.count == end:
+            return
+        by_tag = self.by_tag
+        seq_of = self.seq_of
+        seqs = self.seqs
+        seq = self.next_seq
+        for idx in range(self.count, end):
+            item = items[idx]
+            seqs.append(seq)
+            key = id(item)
+            seq_of[key] = self._SHARED if key in seq_of else seq
+            for tag in getattr(item, "tags", ()) or ():
+                bucket = by_tag.get(tag)
+                if bucket is None:
+                    by_tag[tag] = {seq: item}
+                else:
+                    bucket[seq] = item
+            seq += 1
+        self.next_seq = seq
+        self.count = end
+
+    def tag_added(self, item: object, tag: str) -> bool:
+        """Record a tag added to `item`; False if the item is unknown here."""
+        seq = self.seq_of.get(id(item))
+        if seq is None or seq == self._SHARED:
+            return seq is None
+        self.by_tag.setdefault(tag, {})[seq] = item
+        return True
+
+    def tag_removed(self, item: object, tag: str) -> bool:
+        """Record a tag removed from `item`; False if the item is unknown here."""
+        seq = self.seq_of.get(id(item))
+        if seq is None or seq == self._SHARED:
+            return seq is None
+        bucket = self.by_tag.get(tag)
+        if bucket is not None:
+            bucket.pop(seq, None)
+            if not bucket:
+                del self.by_tag[tag]
+        return True
+
+    def match(self, tags: Iterable[str], match_all: bool) -> List[int]:
+        """Sorted seqs of the items with any (or all) of `tags`."""
+        buckets = [self.by_tag.get(t) or {} for t in set(tags)]
+        if not buckets:
+            return []
+        if match_all:
+            buckets.sort(key=len)
+            first, rest = buckets[0], buckets[1:]
+            return sorted(seq for seq in first if all(seq in b for b in rest))
+        found: set[int] = set()
+        for b in buckets:
+            found.update(b)
+        return sorted(found)
+
+    def items_for(self, seqs: Iterable[int]) -> List[object]:
+        items = self.items
+        all_seqs = self.seqs
+        return [items[bisect.bisect_left(all_seqs, seq)] for seq in seqs]
+
+    def remove(self, seqs: List[int]) -> List[object]:
+        """Drop the items with the given sorted seqs; return the new item list."""
+        items = self.items
+        all_seqs = self.seqs
+        kept_items: List[object] = []
+        kept_seqs: List[int] = []
+        prev = 0
+        for seq in seqs:
+            pos = bisect.bisect_left(all_seqs, seq)
+            item = items[pos]
+            for tag in getattr(item, "tags", ()) or ():
+                bucket = self.by_tag.get(tag)
+                if bucket is not None:
+                    bucket.pop(seq, None)
+                    if not bucket:
+                        del self.by_tag[tag]
+            if self.seq_of.get(id(item)) == seq:
+                del self.seq_of[id(item)]
+            kept_items.extend(items[prev:pos])
+            kept_seqs.extend(all_seqs[prev:pos])
+            prev = pos + 1
+        kept_items.extend(items[prev:])
+        kept_seqs.extend(all_seqs[prev:])
+        self.seqs = kept_seqs
+        return kept_items
+
+    def adopt(self, items: List[object]) -> None:
+        """Follow the list that replaced the old one after remove()."""
+        self.items = items
+        self.count = len(items)
 
 
 # ---- Text item ----
@@ -110,7 +405,125 @@ class Text:
     hit_rect_mm: Optional[Tuple[float, float, float, float]] = None  # (x,y,w,h)
 
 
+# ---- Batched painting ----
+
+def _stroke_batch_key(stroke: Optional[Stroke]):
+    """Paint key of a stroke that may share a path with others, else None."""
+    if not stroke or stroke.dash_pattern_mm:
+        return None
+    color = tuple(stroke.color)
+    if color[3] < 1.0:
+        return None
+    return ('stroke', color, stroke.width_mm, stroke.line_cap)
+
+
+def _fill_visible(fill: Optional[Fill]) -> bool:
+    return bool(fill) and fill.color[3] > 0
+
+
+def _shape_batch_key(stroke: Optional[Stroke], fill_visible: bool, fill: Optional[Fill], fillable: bool):
+    """Paint key of a rectangle or polyline; () when it paints nothing, None when it can't be merged."""
+    if fill_visible:
+        if stroke or not fillable:
+            return None
+        color = tuple(fill.color)
+        return ('fill', color) if color[3] >= 1.0 else None
+    if not stroke:
+        return ()
+    return _stroke_batch_key(stroke)
+
+
+class _PathBatch:
+    """Merges consecutive primitives with one paint state into a single path.
+
+    Problem solved: every line and rectangle set color, width, join, cap and
+    dash and then stroked on its own, although stave, grid and bar lines
+    share a handful of styles. A run of items with the same key is added to
+    one path and painted with one stroke() or fill().
+
+    Only opaque, undashed strokes and opaque fills of rectangles are merged.
+    For those, painting the union looks the same as painting one by one.
+    Translucent paint would no longer double up where items overlap. Filled
+    polygons could cancel each other's winding inside a shared path. Items
+    are never reordered: anything that can't join the current run flushes
+    it first.
+    """
+
+    __slots__ = ('du', 'ctx', 'key', 'stroke', 'fill')
+
+    def __init__(self, du: 'DrawUtil', ctx: cairo.Context) -> None:
+        self.du = du
+        self.ctx = ctx
+        self.key = None
+        self.stroke: Optional[Stroke] = None
+        self.fill: Optional[Fill] = None
+
+    def _join(self, key, stroke: Optional[Stroke], fill: Optional[Fill]) -> None:
+        if key != self.key:
+            self.flush()
+            self.key = key
+            self.stroke = stroke
+            self.fill = fill
+            self.ctx.new_path()
+
+    def flush(self) -> None:
+        if self.key is None:
+            return
+        ctx = self.ctx
+        if self.key[0] == 'fill':
+            ctx.set_source_rgba(*self.fill.color)
+            ctx.fill()
+        else:
+            self.du._apply_stroke(ctx, self.stroke)
+            ctx.stroke()
+        self.key = None
+
+    def line(self, x1_mm: float, y1_mm: float, x2_mm: float, y2_mm: float, stroke: Stroke, key=None) -> bool:
+        """Add a line to the run; False (after flushing) if it must be drawn alone."""
+        if key is None:
+            key = _stroke_batch_key(stroke)
+            if key is None:
+                self.flush()
+                return False
+        self._join(key, stroke, None)
+        self.ctx.move_to(x1_mm, y1_mm)
+        self.ctx.line_to(x2_mm, y2_mm)
+        return True
+
+    def rect(self, x_mm: float, y_mm: float, w_mm: float, h_mm: float,
+             stroke: Optional[Stroke], fill: Optional[Fill], key=None) -> bool:
+        if key is None:
+            key = _shape_batch_key(stroke, _fill_visible(fill), fill, True)
+            if key is None:
+                self.flush()
+                return False
+        if key:
+            self._join(key, stroke, fill)
+            self.ctx.rectangle(x_mm, y_mm, w_mm, h_mm)
+        return True
+
+    def polyline(self, pts: Sequence[Tuple[float, float]], closed: bool,
+                 stroke: Optional[Stroke], fill: Optional[Fill], key=None) -> bool:
+        if key is None:
+            key = _shape_batch_key(stroke, closed and _fill_visible(fill), fill, False)
+            if key is None:
+                self.flush()
+                return False
+        if key and pts:
+            self._join(key, stroke, fill)
+            ctx = self.ctx
+            ctx.move_to(pts[0][0], pts[0][1])
+            for (x, y) in pts[1:]:
+                ctx.line_to(x, y)
+            if closed:
+                ctx.close_path()
+        return True
+
+
 class DrawUtil:
+    # Merge same-style runs while drawing (see _PathBatch); off draws item by item.
+    batch_paths: bool = True
+
     def __init__(self) -> None:
         self._pages: List[Page] = []
         self._current_index: int = -1
@@ -373,13 +786,15 @@ class DrawUtil:
     def render_to_cairo(self, ctx: cairo.Context, page_index: int, px_per_mm: float,
                         clip_rect_mm: Optional[Tuple[float, float, float, float]] = None,
                         overscan_mm: float = 0.0,
-                        layering: Optional[Sequence[str]] = None) -> None:
+                        layering: Optional[Sequence[str]] = None,
+                        antialias: Optional[int] = None) -> None:
         if page_index < 0 or page_index >= len(self._pages):
             return
         page = self._pages[page_index]
         ctx.save()
-        # Prefer highest quality to keep text and thin lines smooth across scales
-        ctx.set_antialias(cairo.ANTIALIAS_BEST)
+        # Prefer highest quality to keep text and thin lines smooth across scales;
+        # callers may trade it for speed (e.g. low-resolution previews)
+        ctx.set_antialias(cairo.ANTIALIAS_BEST if antialias is None else antialias)
         ctx.scale(px_per_mm, px_per_mm)
         # Static viewport: translate to the clip origin only; do not apply Cairo clipping.
         # Determine viewport origin and size in mm and translate to anchor at (0,0)
@@ -399,23 +814,99 @@ class DrawUtil:
         # Do not auto-fill a white background; honor caller-supplied background
         # (e.g., explicit rectangle item or widget painter).
 
+        # Culling uses hit rects, which leave out stroke widths and glyph overhang:
+        # overscan_mm widens the culling rect (not the origin) so items just
+        # outside the clip still paint their visible part.
+        cull_rect_mm = clip_rect_mm
+        if clip_rect_mm is not None and overscan_mm > 0.0:
+            o = float(overscan_mm)
+            cull_rect_mm = (x_o - o, y_o - o, vp_w_mm + 2.0 * o, vp_h_mm + 2.0 * o)
+
         layering_list = list(layering) if layering is not None else list(EDITOR_LAYERING)
-        for item in self._iter_items_in_editor_order(page, clip_rect_mm, layering_list):
+        self._draw_page_items(ctx, page, cull_rect_mm, layering_list)
+        ctx.restore()
+
+    def prepare_page(self, page_index: Optional[int] = None,
+                     layering: Optional[Sequence[str]] = None) -> None:
+        """Build the page's lazy layer and culling indices now.
+
+        Rendering only reads them afterwards, so a page that is no longer
+        modified can then be rendered from several threads at once.
+        """
+        if page_index is None:
+            page_index = self._current_index
+        if page_index < 0 or page_index >= len(self._pages):
+            return
+        page = self._pages[page_index]
+        if getattr(page, 'draw_into', None) is not None:
+            return
+        self._layer_buckets(page, list(layering) if layering is not None else list(EDITOR_LAYERING))
+        self._spatial_grid(page)
+
+    def _draw_page_items(self, ctx: cairo.Context, page: Page,
+                         clip_rect_mm: Optional[Tuple[float, float, float, float]],
+                         layering: Sequence[str]) -> None:
+        """Draw all (optionally culled) items of a page in layer order.
+
+        Pages that know how to draw themselves (e.g. packed pages received
+        from the engraver worker) provide a `draw_into` method.
+        """
+        draw_into = getattr(page, 'draw_into', None)
+        if draw_into is not None:
+            draw_into(self, ctx, clip_rect_mm, layering)
+            return
+        self._draw_items(ctx, self._iter_items_in_editor_order(page, clip_rect_mm, layering))
+
+    def _draw_items(self, ctx: cairo.Context, items: Iterable[object]) -> None:
+        """Draw items in the given order, merging same-style runs (see _PathBatch)."""
+        if not self.batch_paths:
+            for item in items:
+                self._draw_item(ctx, item)
+            return
+        batch = _PathBatch(self, ctx)
+        for item in items:
             if isinstance(item, Line):
-                # Draw lines without trimming; rely on culling by hit-rect only.
-                self._draw_line(ctx, item)
+                if batch.line(item.x1_mm, item.y1_mm, item.x2_mm, item.y2_mm, item.stroke):
+                    continue
             elif isinstance(item, Rect):
-                self._draw_rect(ctx, item)
-            elif isinstance(item, Oval):
-                self._draw_oval(ctx, item)
+                if batch.rect(item.x_mm, item.y_mm, item.w_mm, item.h_mm, item.stroke, item.fill):
+                    continue
             elif isinstance(item, Polyline):
-                self._draw_polyline(ctx, item)
-            elif isinstance(item, Text):
-                self._draw_text(ctx, item)
-        ctx.restore()
+                if batch.polyline(item.points_mm, item.closed, item.stroke, item.fill):
+                    continue
+            else:
+                batch.flush()
+            self._draw_item(ctx, item)
+        batch.flush()
+
+    def _draw_item(self, ctx: cairo.Context, item: object) -> None:
+        if isinstance(item, Line):
+            # Draw lines without trimming; rely on culling by hit-rect only.
+            self._draw_line(ctx, item)
+        elif isinstance(item, Rect):
+            self._draw_rect(ctx, item)
+        elif isinstance(item, Oval):
+            self._draw_oval(ctx, item)
+        elif isinstance(item, Polyline):
+            self._draw_polyline(ctx, item)
+        elif isinstance(item, Text):
+            self._draw_text(ctx, item)
 
     # ---- Tag system (tkinter-style) ----
 
+    def _tag_index(self, page: Page) -> Optional[_TagIndex]:
+        """Return the page's up-to-date tag index."""
+        items = page.items
+        index = getattr(page, "_tags", None)
+        if index is None or not index.matches(items):
+            index = _TagIndex(items)
+            try:
+                page._tags = index
+            except Exception:
+                return None
+        index.update()
+        return index
+
     def find_with_tag(self, tag: str, page_index: Optional[int] = None) -> List[object]:
         """Return all items on the page that have the given tag."""
         if page_index is None:
@@ -423,7 +914,10 @@ class DrawUtil:
         if page_index < 0 or page_index >= len(self._pages):
             return []
         page = self._pages[page_index]
-        return [it for it in page.items if tag in getattr(it, "tags", [])]
+        index = self._tag_index(page)
+        if index is None:
+            return [it for it in page.items if tag in getattr(it, "tags", [])]
+        return index.items_for(index.match([tag], False))
 
     def find_all(self, tags: Iterable[str], match_all: bool = False, page_index: Optional[int] = None) -> List[object]:
         """Find items that match one or all of the provided tags.
@@ -439,6 +933,9 @@ class DrawUtil:
         if page_index < 0 or page_index >= len(self._pages):
             return []
         page = self._pages[page_index]
+        index = self._tag_index(page)
+        if index is not None:
+            return index.items_for(index.match(tag_set, match_all))
         if match_all:
             return [it for it in page.items if tag_set.issubset(set(getattr(it, "tags", [])))]
         else:
@@ -457,7 +954,18 @@ class DrawUtil:
             return 0
         page = self._pages[page_index]
         before = len(page.items)
-        if match_all:
+        index = self._tag_index(page)
+        if index is not None:
+            if match_all and not tag_set:
+                # Every item carries all of no tags.
+                doomed = list(index.seqs)
+            else:
+                doomed = index.match(tag_set, match_all)
+            if not doomed:
+                return 0
+            page.items = index.remove(doomed)
+            index.adopt(page.items)
+        elif match_all:
             page.items = [it for it in page.items if not tag_set.issubset(set(getattr(it, "tags", [])))]
         else:
             page.items = [it for it in page.items if not set(getattr(it, "tags", [])).intersection(tag_set)]
@@ -468,12 +976,34 @@ class DrawUtil:
         tags = getattr(item, "tags", None)
         if tags is not None and tag not in tags:
             tags.append(tag)
+            self._tags_changed(item, tag, added=True)
 
     def remove_tag(self, item: object, tag: str) -> None:
         """Remove a tag from an item if present."""
         tags = getattr(item, "tags", None)
         if tags is not None and tag in tags:
             tags.remove(tag)
+            if tag not in tags:
+                self._tags_changed(item, tag, added=False)
+
+    def _tags_changed(self, item: object, tag: str, added: bool) -> None:
+        """Update tag indices and forget layer buckets after a tag edit."""
+        for page in self._pages:
+            index = getattr(page, "_tags", None)
+            if index is None:
+                continue
+            ok = index.tag_added(item, tag) if added else index.tag_removed(item, tag)
+            if not ok:
+                page._tags = None
+        self._drop_layer_buckets()
+
+    def _drop_layer_buckets(self) -> None:
+        """Forget layer buckets after a tag edit; they are rebuilt on the next draw."""
+        for page in self._pages:
+            try:
+                page._layers = None
+            except Exception:
+                pass
 
     # ---- Drawing order based on tags ----
 
@@ -499,25 +1029,58 @@ class DrawUtil:
         bx, by, bw, bh = b
         return not (ax + aw < bx or bx + bw < ax or ay + ah < by or by + bh < ay)
 
+    def _spatial_grid(self, page: Page, build: bool = True) -> Optional[_SpatialGrid]:
+        """Return the page's up-to-date spatial grid.
+
+        With build=False a grid that was never filled is only registered and
+        None is returned: the editor rebuilds its DrawUtil every frame and
+        renders it once, where filling a grid costs more than one linear
+        scan. The second query on the same items fills it.
+        """
+        items = page.items
+        grid = getattr(page, "_grid", None)
+        if grid is None or not grid.matches(items):
+            grid = _SpatialGrid(items)
+            try:
+                page._grid = grid
+            except Exception:
+                return None
+            if not build:
+                return None
+        grid.update()
+        return grid
+
+    def _layer_buckets(self, page: Page, layering: Sequence[str]) -> _LayerBuckets:
+        """Return the page's up-to-date layer buckets for `layering`."""
+        items = page.items
+        layering = tuple(layering)
+        buckets = getattr(page, "_layers", None)
+        if buckets is None or not buckets.matches(items, layering):
+            buckets = _LayerBuckets(items, layering)
+            try:
+                page._layers = buckets
+            except Exception:
+                pass
+        buckets.update()
+        return buckets
+
     def _iter_items_in_editor_order(self, page: Page, clip_rect_mm: Optional[Tuple[float, float, float, float]] = None,
                                     layering: Sequence[str] = tuple(EDITOR_LAYERING)):
-        # Stable sort: by layer index, then by insertion order
-        with_index = list(enumerate(page.items))
-        # Optional culling by clip rect
-        if clip_rect_mm is not None:
-            culled = []
-            for idx, it in with_index:
-                rect = getattr(it, "hit_rect_mm", None)
-                if rect is None:
-                    # If no rect, keep (e.g., text without metrics) — rely on Cairo clip
-                    culled.append((idx, it))
-                else:
-                    if self._rect_intersects_rect(rect, clip_rect_mm):
-                        culled.append((idx, it))
-            with_index = culled
-        with_index.sort(key=lambda pair: (self._item_layer_index(pair[1], layering), pair[0]))
-        for _i, item in with_index:
-            yield item
+        # By layer index, then by insertion order
+        buckets = self._layer_buckets(page, layering)
+        if clip_rect_mm is None:
+            yield from buckets.ordered()
+            return
+        # Culling by clip rect
+        items = page.items
+        grid = self._spatial_grid(page, build=False)
+        culled = []
+        for idx in (range(len(items)) if grid is None else grid.candidates(clip_rect_mm)):
+            rect = getattr(items[idx], "hit_rect_mm", None)
+            # If no rect, keep (e.g., text without metrics) — rely on Cairo clip
+            if rect is None or self._rect_intersects_rect(rect, clip_rect_mm):
+                culled.append(idx)
+        yield from buckets.ordered(culled)
 
     # ---- Hit detection ----
 
@@ -535,8 +1098,12 @@ class DrawUtil:
         if page_index < 0 or page_index >= len(self._pages):
             return None
         page = self._pages[page_index]
+        items = page.items
+        grid = self._spatial_grid(page)
+        indices = range(len(items)) if grid is None else grid.candidates((x_mm, y_mm, 0.0, 0.0))
         candidates = []
-        for item in page.items:
+        for idx in indices:
+            item = items[idx]
             rect = getattr(item, "hit_rect_mm", None)
             if rect is None:
                 continue
@@ -556,8 +1123,12 @@ class DrawUtil:
         if page_index < 0 or page_index >= len(self._pages):
             return []
         page = self._pages[page_index]
+        items = page.items
+        grid = self._spatial_grid(page)
+        indices = range(len(items)) if grid is None else grid.candidates((x_mm, y_mm, 0.0, 0.0))
         out = []
-        for item in page.items:
+        for idx in indices:
+            item = items[idx]
             rect = getattr(item, "hit_rect_mm", None)
             if rect is None:
                 continue
@@ -576,44 +1147,16 @@ class DrawUtil:
     ) -> None:
         if not self._pages:
             return
-        surface: Optional[cairo.PDFSurface] = None
-        ctx: Optional[cairo.Context] = None
+        writer = PdfPageWriter(self, path, layering)
         total_pages = len(self._pages)
         for i, page in enumerate(self._pages):
-            width_pt = page.width_mm * PT_PER_MM
-            height_pt = page.height_mm * PT_PER_MM
-            if i == 0:
-                surface = cairo.PDFSurface(path, width_pt, height_pt)
-            else:
-                surface.set_size(width_pt, height_pt)
-            ctx = cairo.Context(surface)
-            ctx.save()
-            ctx.scale(PT_PER_MM, PT_PER_MM)
-            ctx.set_source_rgb(1, 1, 1)
-            ctx.rectangle(0, 0, page.width_mm, page.height_mm)
-            ctx.fill()
-            layering_list = list(layering) if layering is not None else list(EDITOR_LAYERING)
-            for item in self._iter_items_in_editor_order(page, None, layering_list):
-                if isinstance(item, Line):
-                    self._draw_line(ctx, item)
-                elif isinstance(item, Rect):
-                    self._draw_rect(ctx, item)
-                elif isinstance(item, Oval):
-                    self._draw_oval(ctx, item)
-                elif isinstance(item, Polyline):
-                    self._draw_polyline(ctx, item)
-                elif isinstance(item, Text):
-                    self._draw_text(ctx, item)
-            ctx.restore()
+            writer.add_page(page)
             if progress_cb is not None:
                 try:
                     progress_cb(i + 1, total_pages)
                 except Exception:
                     pass
-            if i < (len(self._pages) - 1):
-                surface.show_page()
-        if surface is not None:
-            surface.finish()
+        writer.close()
 
     def _apply_stroke(self, ctx: cairo.Context, stroke: Stroke):
         ctx.set_source_rgba(*stroke.color)
@@ -635,89 +1178,56 @@ class DrawUtil:
             ctx.set_source_rgba(*fill.color)
             ctx.fill_preserve()
 
-    def _clip_line_to_viewport(self, x1: float, y1: float, x2: float, y2: float, vp_w: float, vp_h: float):
-        """Liang-Barsky line clipping. Returns None if fully outside, else endpoints in viewport space."""
-        dx = x2 - x1
-        dy = y2 - y1
-        p = [-dx, dx, -dy, dy]
-        q = [x1, vp_w - x1, y1, vp_h - y1]
-        u1 = 0.0
-        u2 = 1.0
-        for pi, qi in zip(p, q):
-            if pi == 0.0:
-                if qi < 0.0:
-                    return None
-            else:
-                t = qi / pi
-                if pi < 0.0:
-                    if t > u2:
-                        return None
-                    if t > u1:
-                        u1 = t
-                else:  # pi > 0
-                    if t < u1:
-                        return None
-                    if t < u2:
-                        u2 = t
-        cx1 = x1 + u1 * dx
-        cy1 = y1 + u1 * dy
-        cx2 = x1 + u2 * dx
-        cy2 = y1 + u2 * dy
-        return (cx1, cy1, cx2, cy2)
-
-    def _draw_line_clipped(self, ctx: cairo.Context, line: Line, x_o: float, y_o: float, vp_w_mm: float, vp_h_mm: float):
-        # Transform line endpoints into viewport space (after translation by -x_o, -y_o)
-        x1 = line.x1_mm - x_o
-        y1 = line.y1_mm - y_o
-        x2 = line.x2_mm - x_o
-        y2 = line.y2_mm - y_o
-        clipped = self._clip_line_to_viewport(x1, y1, x2, y2, vp_w_mm, vp_h_mm)
-        if clipped is None:
-            return
-        cx1, cy1, cx2, cy2 = clipped
-        self._apply_stroke(ctx, line.stroke)
-        ctx.move_to(cx1, cy1)
-        ctx.line_to(cx2, cy2)
-        ctx.stroke()
-
     def _draw_line(self, ctx: cairo.Context, line: Line):
-        self._apply_stroke(ctx, line.stroke)
-        ctx.move_to(line.x1_mm, line.y1_mm)
-        ctx.line_to(line.x2_mm, line.y2_mm)
+        self._draw_line_at(ctx, line.x1_mm, line.y1_mm, line.x2_mm, line.y2_mm, line.stroke)
+
+    def _draw_line_at(self, ctx: cairo.Context, x1_mm: float, y1_mm: float, x2_mm: float, y2_mm: float,
+                      stroke: Stroke):
+        self._apply_stroke(ctx, stroke)
+        ctx.move_to(x1_mm, y1_mm)
+        ctx.line_to(x2_mm, y2_mm)
         ctx.stroke()
 
     def _draw_rect(self, ctx: cairo.Context, r: Rect):
+        self._draw_rect_at(ctx, r.x_mm, r.y_mm, r.w_mm, r.h_mm, r.stroke, r.fill)
+
+    def _draw_rect_at(self, ctx: cairo.Context, x_mm: float, y_mm: float, w_mm: float, h_mm: float,
+                      stroke: Optional[Stroke], fill: Optional[Fill]):
         ctx.new_path()
-        ctx.rectangle(r.x_mm, r.y_mm, r.w_mm, r.h_mm)
-        if r.fill:
-            self._apply_fill(ctx, r.fill)
-        if r.stroke:
-            self._apply_stroke(ctx, r.stroke)
+        ctx.rectangle(x_mm, y_mm, w_mm, h_mm)
+        if fill:
+            self._apply_fill(ctx, fill)
+        if stroke:
+            self._apply_stroke(ctx, stroke)
             ctx.stroke()
         else:
             ctx.new_path()
 
     def _draw_oval(self, ctx: cairo.Context, o: Oval):
-        cx = o.x_mm + o.w_mm / 2.0
-        cy = o.y_mm + o.h_mm / 2.0
-        rx = max(0.0, o.w_mm / 2.0)
-        ry = max(0.0, o.h_mm / 2.0)
+        self._draw_oval_at(ctx, o.x_mm, o.y_mm, o.w_mm, o.h_mm, o.stroke, o.fill)
+
+    def _draw_oval_at(self, ctx: cairo.Context, x_mm: float, y_mm: float, w_mm: float, h_mm: float,
+                      stroke: Optional[Stroke], fill: Optional[Fill]):
+        cx = x_mm + w_mm / 2.0
+        cy = y_mm + h_mm / 2.0
+        rx = max(0.0, w_mm / 2.0)
+        ry = max(0.0, h_mm / 2.0)
         ctx.save()
         ctx.translate(cx, cy)
         if rx > 0 and ry > 0:
             ctx.scale(rx, ry)
             ctx.new_path()
             ctx.arc(0, 0, 1.0, 0, 2*3.1415926535)
-            if o.fill:
-                self._apply_fill(ctx, o.fill)
-            if o.stroke:
+            if fill:
+                self._apply_fill(ctx, fill)
+            if stroke:
                 scale = max(rx, ry)
                 adj = Stroke(
-                    color=o.stroke.color,
-                    width_mm=o.stroke.width_mm / scale if scale > 0 else o.stroke.width_mm,
-                    dash_pattern_mm=o.stroke.dash_pattern_mm,
-                    dash_offset_mm=o.stroke.dash_offset_mm,
-                    line_cap=o.stroke.line_cap,
+                    color=stroke.color,
+                    width_mm=stroke.width_mm / scale if scale > 0 else stroke.width_mm,
+                    dash_pattern_mm=stroke.dash_pattern_mm,
+                    dash_offset_mm=stroke.dash_offset_mm,
+                    line_cap=stroke.line_cap,
                 )
                 self._apply_stroke(ctx, adj)
                 ctx.stroke()
@@ -728,71 +1238,81 @@ class DrawUtil:
             ctx.restore()
 
     def _draw_polyline(self, ctx: cairo.Context, pl: Polyline):
-        pts = pl.points_mm
+        self._draw_polyline_at(ctx, pl.points_mm, pl.closed, pl.stroke, pl.fill)
+
+    def _draw_polyline_at(self, ctx: cairo.Context, pts: Sequence[Tuple[float, float]], closed: bool,
+                          stroke: Optional[Stroke], fill: Optional[Fill]):
         if not pts:
             return
         ctx.new_path()
         ctx.move_to(pts[0][0], pts[0][1])
         for (x, y) in pts[1:]:
             ctx.line_to(x, y)
-        if pl.closed:
+        if closed:
             ctx.close_path()
-        if pl.fill and pl.closed:
-            self._apply_fill(ctx, pl.fill)
-        if pl.stroke:
-            self._apply_stroke(ctx, pl.stroke)
+        if fill and closed:
+            self._apply_fill(ctx, fill)
+        if stroke:
+            self._apply_stroke(ctx, stroke)
             ctx.stroke()
         else:
             ctx.new_path()
 
     def _draw_text(self, ctx: cairo.Context, t: Text):
+        self._draw_text_at(ctx, t.x_mm, t.y_mm, t.text, t.family, t.size_pt, t.italic, t.bold, t.color,
+                           getattr(t, 'anchor', None), float(getattr(t, 'angle_deg', 0.0) or 0.0),
+                           getattr(t, 'hit_rect_mm', None))
+
+    def _draw_text_at(self, ctx: cairo.Context, x_mm: float, y_mm: float, text: str,
+                      family: str, size_pt: float, italic: bool, bold: bool, color: Color,
+                      anchor: str | None, angle_deg: float,
+                      hit_rect_mm: Optional[Tuple[float, float, float, float]]):
         # Cairo toy text: render via text_path + fill to avoid any implicit stroke
         # and ensure a single-color raster without edge bleed.
-        slant = cairo.FONT_SLANT_ITALIC if t.italic else cairo.FONT_SLANT_NORMAL
-        weight = cairo.FONT_WEIGHT_BOLD if t.bold else cairo.FONT_WEIGHT_NORMAL
+        slant = cairo.FONT_SLANT_ITALIC if italic else cairo.FONT_SLANT_NORMAL
+        weight = cairo.FONT_WEIGHT_BOLD if bold else cairo.FONT_WEIGHT_NORMAL
         ctx.save()
-        angle = float(getattr(t, 'angle_deg', 0.0) or 0.0)
-        xb_mm, yb_mm, w_mm, h_mm = self._get_text_extents_mm(t.text, t.family, t.size_pt, t.italic, t.bold)
-        anchor = getattr(t, 'anchor', None)
+        angle = angle_deg
+        xb_mm, yb_mm, w_mm, h_mm = self._get_text_extents_mm(text, family, size_pt, italic, bold)
         # Compute rotation pivot based on anchor
-        ax = t.x_mm + xb_mm + w_mm * 0.5
-        ay = t.y_mm + yb_mm + h_mm * 0.5
+        ax = x_mm + xb_mm + w_mm * 0.5
+        ay = y_mm + yb_mm + h_mm * 0.5
         if anchor == 'n':
-            ay = t.y_mm + yb_mm
+            ay = y_mm + yb_mm
         elif anchor == 's':
-            ay = t.y_mm + yb_mm + h_mm
+            ay = y_mm + yb_mm + h_mm
         elif anchor == 'w':
-            ax = t.x_mm + xb_mm
+            ax = x_mm + xb_mm
         elif anchor == 'e':
-            ax = t.x_mm + xb_mm + w_mm
+            ax = x_mm + xb_mm + w_mm
         elif anchor == 'nw':
-            ax = t.x_mm + xb_mm
-            ay = t.y_mm + yb_mm
+            ax = x_mm + xb_mm
+            ay = y_mm + yb_mm
         elif anchor == 'ne':
-            ax = t.x_mm + xb_mm + w_mm
-            ay = t.y_mm + yb_mm
+            ax = x_mm + xb_mm + w_mm
+            ay = y_mm + yb_mm
         elif anchor == 'sw':
-            ax = t.x_mm + xb_mm
-            ay = t.y_mm + yb_mm + h_mm
+            ax = x_mm + xb_mm
+            ay = y_mm + yb_mm + h_mm
         elif anchor == 'se':
-            ax = t.x_mm + xb_mm + w_mm
-            ay = t.y_mm + yb_mm + h_mm
+            ax = x_mm + xb_mm + w_mm
+            ay = y_mm + yb_mm + h_mm
 
         # Rotate around pivot, then draw at stored position
         ctx.translate(ax, ay)
         if angle:
             ctx.rotate(angle * math.pi / 180.0)
         ctx.translate(-ax, -ay)
-        ctx.select_font_face(t.family, slant, weight)
-        ctx.set_font_size(t.size_pt / PT_PER_MM)
-        ctx.move_to(t.x_mm, t.y_mm)
-        ctx.text_path(t.text)
-        ctx.set_source_rgba(*t.color)
+        ctx.select_font_face(family, slant, weight)
+        ctx.set_font_size(size_pt / PT_PER_MM)
+        ctx.move_to(x_mm, y_mm)
+        ctx.text_path(text)
+        ctx.set_source_rgba(*color)
         ctx.fill()
         ctx.restore()
         # Optional debug: draw text bounds and anchor point
         if os.getenv('PIANOSCRIPT_DEBUG_TEXT_BOUNDS', '0') in ('1', 'true', 'True'):
-            rect = getattr(t, 'hit_rect_mm', None)
+            rect = hit_rect_mm
             if rect is not None:
                 rx, ry, rw, rh = rect
                 ctx.save()
@@ -803,21 +1323,21 @@ class DrawUtil:
                 # Anchor marker
                 ax = rx + rw / 2.0
                 ay = ry + rh / 2.0
-                if t.anchor == 'w':
+                if anchor == 'w':
                     ax = rx
-                elif t.anchor == 'e':
+                elif anchor == 'e':
                     ax = rx + rw
-                elif t.anchor == 'n':
+                elif anchor == 'n':
                     ay = ry
-                elif t.anchor == 's':
+                elif anchor == 's':
                     ay = ry + rh
-                elif t.anchor == 'nw':
+                elif anchor == 'nw':
                     ax = rx; ay = ry
-                elif t.anchor == 'ne':
+                elif anchor == 'ne':
                     ax = rx + rw; ay = ry
-                elif t.anchor == 'sw':
+                elif anchor == 'sw':
                     ax = rx; ay = ry + rh
-                elif t.anchor == 'se':
+                elif anchor == 'se':
                     ax = rx + rw; ay = ry + rh
                 # draw cross
                 ctx.set_source_rgba(0.2, 0.8, 0.2, 0.9)
@@ -891,22 +1411,39 @@ class DrawUtil:
         return (x_bearing_mm, y_bearing_mm, width_mm, height_mm)
 
 
-def make_image_surface(width_px: int, height_px: int):
-    """Create a QImage + cairo surface pair for rasterizing DrawUtil content."""
-    width = max(1, int(width_px))
-    height = max(1, int(height_px))
-    stride = width * 4
-    buf = bytearray(height * stride)
-    surface = cairo.ImageSurface.create_for_data(buf, cairo.FORMAT_ARGB32, width, height, stride)
-    image = QtGui.QImage(buf, width, height, stride, QtGui.QImage.Format.Format_ARGB32_Premultiplied)
-    return image, surface, buf
-
-
-def finalize_image_surface(image: QtGui.QImage, device_pixel_ratio: float = 1.0) -> QtGui.QImage:
-    """Detach a rasterized QImage from its temporary buffer and free the buffer."""
-    if image is None:
-        raise ValueError("finalize_image_surface() requires a valid QImage")
-    final = image.copy()
-    final.setDevicePixelRatio(float(device_pixel_ratio))
-    image.swap(QtGui.QImage())
-    return final
+class PdfPageWriter:
+    """Append pages to one PDF file as they become available.
+
+    Problem solved: an export can stream pages in order (e.g. from worker
+    processes) instead of holding every page in a DrawUtil first.
+    """
+
+    def __init__(self, draw_util: DrawUtil, path: str, layering: Optional[Sequence[str]] = None) -> None:
+        self._du = draw_util
+        self._path = path
+        self._layering = list(layering) if layering is not None else list(EDITOR_LAYERING)
+        self._surface: Optional[cairo.PDFSurface] = None
+        self.page_count: int = 0
+
+    def add_page(self, page: Page) -> None:
+        width_pt = page.width_mm * PT_PER_MM
+        height_pt = page.height_mm * PT_PER_MM
+        if self._surface is None:
+            self._surface = cairo.PDFSurface(self._path, width_pt, height_pt)
+        else:
+            self._surface.show_page()
+            self._surface.set_size(width_pt, height_pt)
+        ctx = cairo.Context(self._surface)
+        ctx.save()
+        ctx.scale(PT_PER_MM, PT_PER_MM)
+        ctx.set_source_rgb(1, 1, 1)
+        ctx.rectangle(0, 0, page.width_mm, page.height_mm)
+        ctx.fill()
+        self._du._draw_page_items(ctx, page, None, self._layering)
+        ctx.restore()
+        self.page_count += 1
+
+    def close(self) -> None:
+        if self._surface is not None:
+            self._surface.finish()
+            self._surface = None
@@ -0,0 +1,25 @@
+"""Qt adapters for DrawUtil rasterization; draw_util itself only needs cairo."""
+from __future__ import annotations
+import cairo
+from PySide6 import QtGui
+
+
+def make_image_surface(width_px: int, height_px: int):
+    """Create a QImage + cairo surface pair for rasterizing DrawUtil content."""
+    width = max(1, int(width_px))
+    height = max(1, int(height_px))
+    stride = width * 4
+    buf = bytearray(height * stride)
+    surface = cairo.ImageSurface.create_for_data(buf, cairo.FORMAT_ARGB32, width, height, stride)
+    image = QtGui.QImage(buf, width, height, stride, QtGui.QImage.Format.Format_ARGB32_Premultiplied)
+    return image, surface, buf
+
+
+def finalize_image_surface(image: QtGui.QImage, device_pixel_ratio: float = 1.0) -> QtGui.QImage:
+    """Detach a rasterized QImage from its temporary buffer and free the buffer."""
+    if image is None:
+        raise ValueError("finalize_image_surface() requires a valid QImage")
+    final = image.copy()
+    final.setDevicePixelRatio(float(device_pixel_ratio))
+    image.swap(QtGui.QImage())
+    return final
@@ -1,19 +1,98 @@
 from __future__ import annotations
 from PySide6 import QtCore, QtGui, QtWidgets
 import cairo
-from ui.widgets.draw_util import DrawUtil, make_image_surface, finalize_image_surface
+import weakref
+from collections import OrderedDict
+from ui.widgets.draw_util import DrawUtil
+from ui.widgets.draw_util_qt import make_image_surface, finalize_image_surface
 from ui.style import Style
 from utils.CONSTANT import ENGRAVER_LAYERING
 from engraver.engraver import do_engrave
+from settings_manager import get_preferences
 
+# Rendered-page cache
+# -------------------
+# Problem solved: every page turn, resize settle and engrave rasterized the
+# page again, so flipping back and forth waited for Cairo each time. Page
+# images are kept in an LRU keyed by (page index, px_per_mm bucket, dpr,
+# engrave version) and bounded by the print_view_cache_mb preference. The
+# engrave version identifies the page object in the DrawUtil: the engraver
+# swaps in a new page whenever it draws one, so a re-engraved page never
+# matches an old image. On a miss the image of the nearest cached zoom of the
+# same page is shown, scaled to the width, until the precise render arrives.
+_DEFAULT_PAGE_CACHE_MB: int = 128
+# px_per_mm steps that count as the same zoom (well below one device px per page width)
+_ZOOM_BUCKETS_PER_PX_PER_MM: int = 1000
+
+
+# Progressive rendering
+# ---------------------
+# Problem solved: on large monitors a full-resolution page render takes long
+# enough that the view sat blank or stale after every engrave. When there is
+# no image of the page to show meanwhile, RenderTask first renders a preview
+# at _PREVIEW_SCALE with fast antialiasing and emits it, then the full image;
+# DrawUtilView cross-fades from one to the next. Small renders skip it.
+_PREVIEW_SCALE: float = 0.25
+_PREVIEW_MIN_PIXELS: int = 1_000_000
+
+
+def _zoom_bucket(px_per_mm: float) -> int:
+    return int(round(float(px_per_mm) * _ZOOM_BUCKETS_PER_PX_PER_MM))
+
+
+class _PageImageCache:
+    """Rendered page images with LRU eviction bounded by total bytes."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = int(max_bytes)
+        self._images: OrderedDict[tuple, QtGui.QImage] = OrderedDict()
+        self._bytes: int = 0
+
+    def get(self, key: tuple) -> QtGui.QImage | None:
+        img = self._images.get(key)
+        if img is not None:
+            self._images.move_to_end(key)
+        return img
+
+    def nearest(self, key: tuple) -> QtGui.QImage | None:
+        """Image of the same page, dpr and version whose zoom bucket is closest to `key`'s."""
+        page_index, bucket, dpr, version = key
+        best = None
+        best_dist = None
+        for (p, b, d, v), img in self._images.items():
+            if p != page_index or d != dpr or v != version:
+                continue
+            dist = abs(b - bucket)
+            if best_dist is None or dist < best_dist:
+                best, best_dist = img, dist
+        return best
+
+    def put(self, key: tuple, img: QtGui.QImage) -> None:
+        if self.max_bytes <= 0:
+            return
+        old = self._images.pop(key, None)
+        if old is not None:
+            self._bytes -= int(old.sizeInBytes())
+        self._images[key] = img
+        self._bytes += int(img.sizeInBytes())
+        # Never evict the newest image: it is the one on screen.
+        while self._bytes > self.max_bytes and len(self._images) > 1:
+            _k, dropped = self._images.popitem(last=False)
+            self._bytes -= int(dropped.sizeInBytes())
+
+    def clear(self) -> None:
+        self._images.clear()
+        self._bytes = 0
 
 
 class RenderEmitter(QtCore.QObject):
-    rendered = QtCore.Signal(QtGui.QImage, int)
+    # (image, page index, page cache key or None)
+    rendered = QtCore.Signal(QtGui.QImage, int, object)
+    preview_rendered = QtCore.Signal(QtGui.QImage, int, object)
 
 
 class RenderTask(QtCore.QRunnable):
-    def __init__(self, draw_util: DrawUtil, w_px: int, h_px: int, px_per_mm: float, dpr: float, page_index: int, emitter: RenderEmitter, score: dict | None = None, perform_engrave: bool = False):
+    def __init__(self, draw_util: DrawUtil, w_px: int, h_px: int, px_per_mm: float, dpr: float, page_index: int, emitter: RenderEmitter, score: dict | None = None, perform_engrave: bool = False, cache_key: tuple | None = None, preview: bool = False):
         super().__init__()
         self.setAutoDelete(True)
         self._du = draw_util
@@ -25,6 +104,8 @@ class RenderTask(QtCore.QRunnable):
         self._emitter = emitter
         self._score = score
         self._perform_engrave = perform_engrave
+        self._cache_key = cache_key
+        self._preview = preview
 
     def run(self) -> None:
         # Optionally run engraving to update DrawUtil from score before rendering.
@@ -34,6 +115,8 @@ class RenderTask(QtCore.QRunnable):
             except Exception as e:
                 # Fail engraving silently for now; could emit an error signal if desired.
                 print(f"Engrave error: {e}")
+        if self._preview:
+            self._render_preview()
         image, surface, _buf = make_image_surface(self._w_px, self._h_px)
         ctx = cairo.Context(surface)
         self._du.render_to_cairo(ctx, self._page_index, self._px_per_mm, layering=ENGRAVER_LAYERING)
@@ -42,13 +125,36 @@ class RenderTask(QtCore.QRunnable):
         # Emit back to the UI thread, but skip if the emitter is gone (e.g., view closed)
         try:
             if self._emitter is not None:
-                self._emitter.rendered.emit(final, self._page_index)
+                self._emitter.rendered.emit(final, self._page_index, self._cache_key)
         except RuntimeError:
             # Emitter already deleted; ignore
             pass
 
+    def _render_preview(self) -> None:
+        """Render and emit the low-resolution pass (see Progressive rendering above)."""
+        w_px = max(1, int(self._w_px * _PREVIEW_SCALE))
+        h_px = max(1, int(self._h_px * _PREVIEW_SCALE))
+        try:
+            image, surface, _buf = make_image_surface(w_px, h_px)
+            ctx = cairo.Context(surface)
+            self._du.render_to_cairo(ctx, self._page_index, self._px_per_mm * _PREVIEW_SCALE,
+                                     layering=ENGRAVER_LAYERING, antialias=cairo.ANTIALIAS_FAST)
+            # The lower device pixel ratio gives the preview the logical size of the full image
+            final = finalize_image_surface(image, device_pixel_ratio=self._dpr * _PREVIEW_SCALE)
+        except Exception as e:
+            print(f"Preview render error: {e}")
+            return
+        try:
+            if self._emitter is not None:
+                self._emitter.preview_rendered.emit(final, self._page_index, self._cache_key)
+        except RuntimeError:
+            pass
+
 
 class DrawUtilView(QtWidgets.QWidget):
+    # Show a low-resolution pass before each full render; see module comment
+    progressive_render: bool = True
+
     def __init__(self, draw_util: DrawUtil, parent=None):
         super().__init__(parent)
         self._du = draw_util
@@ -64,6 +170,7 @@ class DrawUtilView(QtWidgets.QWidget):
         self._pool = QtCore.QThreadPool.globalInstance()
         self._emitter = RenderEmitter()
         self._emitter.rendered.connect(self._on_rendered)
+        self._emitter.preview_rendered.connect(self._on_preview_rendered)
         # Allow splitter to fully collapse this view
         self.setMinimumWidth(0)
         self._last_px_per_mm: float = 1.0  # device px per mm
@@ -81,6 +188,12 @@ class DrawUtilView(QtWidgets.QWidget):
         self._resize_timer.setInterval(180)
         self._resize_timer.timeout.connect(self._on_resize_settle)
         self._suppress_fade_once: bool = False
+        # Rendered pages (see module comment); _image_provisional marks a nearest-zoom stand-in
+        self._page_cache = _PageImageCache(self._page_cache_bytes_from_prefs())
+        self._page_versions: dict[int, tuple[weakref.ref, int]] = {}
+        self._next_page_version: int = 0
+        self._image_key: tuple | None = None
+        self._image_provisional: bool = False
         # Apply a dedicated background color for DrawUtil views
         try:
             color = Style.get_named_qcolor('draw_util')
@@ -97,6 +210,9 @@ class DrawUtilView(QtWidgets.QWidget):
         self._scroll_px = 0.0
         if request_render:
             self.request_render()
+        else:
+            # Show a cached image right away; the render request that follows is then a cache hit
+            self._show_cached_page()
 
     def set_page_turn_callbacks(self, prev_cb, next_cb) -> None:
         self._page_prev_cb = prev_cb
@@ -105,27 +221,95 @@ class DrawUtilView(QtWidgets.QWidget):
     def sizeHint(self) -> QtCore.QSize:
         return QtCore.QSize(600, 800)
 
-    @QtCore.Slot()
-    def request_render(self):
+    def _render_params(self) -> tuple | None:
+        """Return (w_px, h_px, px_per_mm, dpr, cache key) for the current page, or None."""
         w = max(1, self.width())
         dpr = float(self.devicePixelRatioF())
         page_count = self._du.page_count()
         if page_count <= 0:
-            return
+            return None
         if self._page_index >= page_count:
             self._page_index = max(0, page_count - 1)
         page_w_mm, page_h_mm = self._du.current_page_size_mm()
         if page_w_mm <= 0 or page_h_mm <= 0:
-            return
+            return None
         px_per_mm = (w * dpr) / page_w_mm
         h_px = int(page_h_mm * px_per_mm)
         w_px = int(w * dpr)
+        key = None
+        try:
+            page = self._du._pages[self._page_index]
+            key = (int(self._page_index), _zoom_bucket(px_per_mm), round(dpr, 3), self._page_version(page))
+        except Exception:
+            key = None
+        return w_px, h_px, px_per_mm, dpr, key
+
+    def _page_version(self, page: object) -> int:
+        """Engrave version of `page`: a number that changes when the page object is replaced."""
+        pid = id(page)
+        entry = self._page_versions.get(pid)
+        if entry is not None and entry[0]() is page:
+            return entry[1]
+        self._next_page_version += 1
+        versions = self._page_versions
+
+        def _forget(ref, pid=pid) -> None:
+            if versions.get(pid, (None, 0))[0] is ref:
+                versions.pop(pid, None)
+
+        self._page_versions[pid] = (weakref.ref(page, _forget), self._next_page_version)
+        return self._next_page_version
+
+    def _show_cached_page(self) -> bool:
+        """Show the cached image of the current page at the current size; True on a hit."""
+        params = self._render_params()
+        if params is None or params[4] is None:
+            return False
+        key = params[4]
+        img = self._page_cache.get(key)
+        if img is None:
+            return False
+        if key != self._image_key or self._image_provisional:
+            self._store_metrics(params[1], params[2], params[3])
+            self._set_image(img, key, provisional=False)
+        return True
+
+    def _store_metrics(self, h_px: int, px_per_mm: float, dpr: float) -> None:
         # Store metrics for hit-testing
         self._last_px_per_mm = px_per_mm
-        self._last_widget_px_per_mm = (w) / page_w_mm
+        self._last_widget_px_per_mm = px_per_mm / dpr
         self._last_dpr = dpr
         self._last_h_px = h_px
-        task = RenderTask(self._du, w_px, h_px, px_per_mm, dpr, self._page_index, self._emitter, self._score, False)
+
+    def _is_current_version(self, key: tuple) -> bool:
+        try:
+            return self._page_version(self._du._pages[key[0]]) == key[3]
+        except Exception:
+            return False
+
+    @QtCore.Slot()
+    def request_render(self):
+        params = self._render_params()
+        if params is None:
+            return
+        w_px, h_px, px_per_mm, dpr, key = params
+        self._store_metrics(h_px, px_per_mm, dpr)
+        if key is not None:
+            cached = self._page_cache.get(key)
+            if cached is not None:
+                if key != self._image_key or self._image_provisional:
+                    self._set_image(cached, key, provisional=False)
+                return
+            # Until the precise render arrives, show the nearest cached zoom of this page
+            near = self._page_cache.nearest(key)
+            if near is not None:
+                self._set_image(near, key, provisional=True)
+        # A low-resolution pass first, unless an image of this page and engrave is already up
+        showing_page = (key is not None and self._image_key is not None
+                        and self._image_key[0] == key[0] and self._image_key[3] == key[3])
+        preview = self.progressive_render and not showing_page and w_px * h_px >= _PREVIEW_MIN_PIXELS
+        task = RenderTask(self._du, w_px, h_px, px_per_mm, dpr, self._page_index, self._emitter, self._score, False,
+                          cache_key=key, preview=preview)
         self._pool.start(task)
 
     def _on_resize_settle(self) -> None:
@@ -160,8 +344,9 @@ class DrawUtilView(QtWidgets.QWidget):
                 painter.setOpacity(opacity)
                 img_w = img.width() / img.devicePixelRatio()
                 img_h = img.height() / img.devicePixelRatio()
-                # During resize, scale current image to widget width to avoid re-engraving per frame
-                if self._resizing and img_w > 0:
+                # During resize, scale current image to widget width to avoid re-engraving per frame;
+                # a provisional (nearest cached zoom) image is scaled the same way
+                if (self._resizing or self._image_provisional) and img_w > 0:
                     scale = float(self.width()) / float(img_w)
                 else:
                     scale = 1.0
@@ -174,6 +359,8 @@ class DrawUtilView(QtWidgets.QWidget):
                     max_scroll = max(0, tgt_h - self.height())
                     self._scroll_px = max(0.0, min(float(max_scroll), float(self._scroll_px)))
                     y = -int(round(self._scroll_px))
+                # Previews and scaled images are resampled; keep them smooth
+                painter.setRenderHint(QtGui.QPainter.RenderHint.SmoothPixmapTransform, True)
                 painter.drawImage(QtCore.QRect(x, y, tgt_w, tgt_h), img)
                 painter.restore()
 
@@ -244,16 +431,53 @@ class DrawUtilView(QtWidgets.QWidget):
             w_mm = float(layout.get('page_width_mm', 0.0) or 0.0)
             h_mm = float(layout.get('page_height_mm', 0.0) or 0.0)
             if w_mm > 0 and h_mm > 0:
+                if (w_mm, h_mm) != tuple(self._du.current_page_size_mm()):
+                    # The page is resized in place, so its engrave version does not change
+                    self._page_cache.clear()
                 self._du.set_current_page_size_mm(w_mm, h_mm)
                 # Trigger rerender with new dimensions
                 self.request_render()
         except Exception:
             pass
 
-    @QtCore.Slot(QtGui.QImage, int)
-    def _on_rendered(self, image: QtGui.QImage, page_index: int):
+    @QtCore.Slot(QtGui.QImage, int, object)
+    def _on_rendered(self, image: QtGui.QImage, page_index: int, cache_key: tuple | None = None):
+        # Keep renders of other pages too (e.g. after a quick flip) unless the page was replaced since
+        if cache_key is not None and self._is_current_version(cache_key):
+            self._page_cache.put(cache_key, image)
+        if page_index != self._page_index:
+            return
+        precise = True
+        if cache_key is not None:
+            params = self._render_params()
+            current_key = params[4] if params is not None else None
+            if current_key is not None and cache_key != current_key:
+                # Outdated size or engrave: keep a precise image, otherwise show this one scaled
+                if self._image_key == current_key and not self._image_provisional:
+                    return
+                precise = False
+        self._set_image(image, cache_key, provisional=not precise)
+
+    @QtCore.Slot(QtGui.QImage, int, object)
+    def _on_preview_rendered(self, image: QtGui.QImage, page_index: int, cache_key: tuple | None = None):
         if page_index != self._page_index:
             return
+        params = self._render_params()
+        current_key = params[4] if params is not None else None
+        if cache_key != current_key:
+            return
+        # The full render (or a cache hit) may already be up
+        if self._image_key == current_key and not self._image_provisional:
+            return
+        self._set_image(image, cache_key, provisional=True)
+
+    def _set_image(self, image: QtGui.QImage, key: tuple | None, provisional: bool) -> None:
+        """Show `image` (cross-fading from the previous one); provisional images are scaled to the width."""
+        self._image_key = key
+        self._image_provisional = bool(provisional)
+        if image is self._image:
+            self.update()
+            return
         if self._suppress_fade_once:
             self._prev_image = None
             self._fade_progress = 1.0
@@ -282,6 +506,13 @@ class DrawUtilView(QtWidgets.QWidget):
             self._prev_image = None
         self.update()
 
+    def _page_cache_bytes_from_prefs(self) -> int:
+        try:
+            mb = float(get_preferences().get('print_view_cache_mb', _DEFAULT_PAGE_CACHE_MB))
+        except Exception:
+            mb = float(_DEFAULT_PAGE_CACHE_MB)
+        return max(0, int(mb * 1024 * 1024))
+
     def closeEvent(self, ev: QtGui.QCloseEvent) -> None:
         # No persistent threads; nothing special to stop.
         super().closeEvent(ev)
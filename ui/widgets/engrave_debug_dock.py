@@ -0,0 +1,59 @@
+from __future__ import annotations
+from PySide6 import QtCore, QtWidgets
+
+# Display order and labels of the phases reported in Analysis._phase_ms.
+PHASE_LABELS: list[tuple[str, str]] = [
+    ('normalize', "Note normalization"),
+    ('line_building', "Line building"),
+    ('page_packing', "Page packing"),
+    ('draw', "Drawing (total)"),
+    ('beam_grouping', "  Beam grouping"),
+    ('measure_numbers', "  Measure-number collisions"),
+    ('emission', "  Primitive emission"),
+]
+
+
+class EngraveDebugDock(QtWidgets.QDockWidget):
+    """Shows phase timings and primitive counts of the last engrave."""
+
+    def __init__(self, parent=None):
+        super().__init__("Engrave Debug", parent)
+        self.setObjectName("EngraveDebugDock")
+        self.setAllowedAreas(QtCore.Qt.DockWidgetArea.LeftDockWidgetArea | QtCore.Qt.DockWidgetArea.RightDockWidgetArea)
+        self.tree = QtWidgets.QTreeWidget(self)
+        self.tree.setColumnCount(2)
+        self.tree.setHeaderLabels(["Phase", "Value"])
+        self.tree.setRootIsDecorated(False)
+        self.tree.setFocusPolicy(QtCore.Qt.FocusPolicy.NoFocus)
+        self.setWidget(self.tree)
+
+    def update_analysis(self, analysis, throttle: dict | None = None) -> None:
+        self.tree.clear()
+
+        def _row(label: str, value: str) -> None:
+            item = QtWidgets.QTreeWidgetItem([label, value])
+            item.setTextAlignment(1, QtCore.Qt.AlignmentFlag.AlignRight)
+            self.tree.addTopLevelItem(item)
+
+        if throttle:
+            avg_ms = throttle.get('avg_engrave_ms')
+            _row("Engrave interval", f"{int(throttle.get('interval_ms', 0))} ms ({throttle.get('mode', '')})")
+            _row("Average engrave", "n/a" if avg_ms is None else f"{avg_ms:.1f} ms")
+        if analysis is None:
+            return
+        phase_ms = dict(getattr(analysis, '_phase_ms', {}) or {})
+        counts = dict(getattr(analysis, '_primitive_counts', {}) or {})
+
+        for key, label in PHASE_LABELS:
+            if key in phase_ms:
+                _row(label, f"{phase_ms[key]:.1f} ms")
+        layout_ms = sum(phase_ms.get(k, 0.0) for k in ('normalize', 'line_building', 'page_packing'))
+        if phase_ms:
+            _row("Total", f"{layout_ms + phase_ms.get('draw', 0.0):.1f} ms")
+        _row("Lines rebuilt / reused",
+             f"{int(getattr(analysis, '_lines_rebuilt', 0) or 0)} / {int(getattr(analysis, '_lines_reused', 0) or 0)}")
+        for kind in sorted(counts):
+            _row(f"{kind} primitives", str(int(counts[kind])))
+        if counts:
+            _row("All primitives", str(sum(int(v) for v in counts.values())))
+        self.tree.resizeColumnToContents(0)